@@ -6,7 +6,7 @@ from flask_jwt_extended import JWTManager
 
 # Import config
 from config.env import Config
-from config.db import db, init_db
+from config.db import db, init_db, rebuild_search_index, rebuild_attribute_index
 
 # Import routes
 from routes.sync import sync_bp
@@ -15,6 +15,18 @@ from routes.data import data_bp
 
 # Import middlewares
 from middlewares.error_handler import register_error_handlers
+from middlewares.compression import register_compression, compression_stats
+from middlewares.rate_limit import register_rate_limit, rate_limit_stats
+
+# Import services
+from services.change_log_service import ChangeLogService
+from services.idempotency_service import IdempotencyService
+from services.data_cache_service import data_cache
+from services.principal_cache_service import principal_cache
+from services.password_service import password_service
+from services.token_revocation_service import token_revocation
+from services.blob_service import BlobService
+from utils.blob_store import blob_store
 
 # Import utils
 from utils.logger import logger
@@ -31,6 +43,11 @@ def create_app():
     db.init_app(app)
     jwt = JWTManager(app)
     
+    # Token đã thu hồi (logout, xóa tài khoản): tra trong bộ nhớ, không query database
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return token_revocation.is_revoked(jwt_payload)
+    
     # Initialize SocketIO with threading mode (compatible with Python 3.13)
     socketio = SocketIO(
         app, 
@@ -38,6 +55,9 @@ def create_app():
         async_mode='threading'  # Changed from 'eventlet' to 'threading'
     )
     
+    # Pool hash mật khẩu: fork worker trước khi app tạo các thread nền
+    password_service.start()
+    
     # Initialize database
     with app.app_context():
         init_db()
@@ -53,7 +73,14 @@ def create_app():
         return jsonify({
             'message': 'Backend API is running',
             'status': 'OK',
-            'framework': 'Flask + Python'
+            'framework': 'Flask + Python',
+            'compression': compression_stats.to_dict(),
+            'data_cache': data_cache.stats(),
+            'auth_cache': principal_cache.stats(),
+            'password_pool': password_service.stats(),
+            'token_revocation': token_revocation.stats(),
+            'rate_limit': rate_limit_stats(),
+            'blob_store': blob_store.stats()
         })
     @app.route('/favicon.ico')
     def favicon():
@@ -68,12 +95,58 @@ def create_app():
     def handle_disconnect():
         logger.info(f'Client disconnected')
     
+    # CLI: flask --app app rebuild-search-index
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Index lại toàn bộ dữ liệu cho tìm kiếm full-text"""
+        count = rebuild_search_index()
+        print(f"Search index rebuilt: {count} rows")
+    
+    # CLI: flask --app app rebuild-attribute-index
+    @app.cli.command('rebuild-attribute-index')
+    def rebuild_attribute_index_command():
+        """Index lại toàn bộ thuộc tính JSON (where[path]=value)"""
+        count = rebuild_attribute_index()
+        print(f"Attribute index rebuilt: {count} values")
+    
+    # CLI: flask --app app externalize-content (chuyển content lớn đã có ra blob store)
+    @app.cli.command('externalize-content')
+    def externalize_content_command():
+        """Chuyển content lớn hơn CONTENT_BLOB_THRESHOLD của dữ liệu cũ ra blob store"""
+        count = BlobService().externalize_existing()
+        print(f"Externalized content: {count} rows")
+    
+    # CLI: flask --app app gc-blobs
+    @app.cli.command('gc-blobs')
+    def gc_blobs_command():
+        """Xóa các blob không còn được tham chiếu"""
+        result = BlobService().collect_garbage()
+        print(f"Blob GC: {result['removed']} removed, {result['freed_bytes']} bytes freed")
+    
     # Register error handlers
     register_error_handlers(app)
     
+    # Nén response theo Accept-Encoding
+    register_compression(app)
+    
+    # Giới hạn tần suất request (token bucket theo user / IP và theo route)
+    register_rate_limit(app)
+    
     # Store socketio instance in app for use in other modules
     app.socketio = socketio
     
+    # Background compaction cho change log (delta sync)
+    ChangeLogService().start_compaction_worker(app)
+    
+    # Background dọn idempotency key hết hạn
+    IdempotencyService().start_cleanup_worker(app)
+    
+    # Background dọn blob content không còn được tham chiếu
+    BlobService().start_gc_worker(app)
+    
+    # Nạp danh sách token bị thu hồi và đồng bộ với các process khác
+    token_revocation.start_sync_worker(app)
+    
     return app, socketio
 
 # Create app instance
@@ -4,6 +4,7 @@ from sqlalchemy import event, text
 from sqlalchemy.engine import Engine
 import sqlite3
 import os
+from utils.blob_store import resolve_json_sql
 from utils.logger import logger
 
 # Khởi tạo SQLAlchemy instance
@@ -20,13 +21,138 @@ def init_db():
         db.create_all()
         logger.info("✅ Database tables created successfully")
         
+        # Cập nhật schema cho database đã tồn tại
+        run_migrations()
+        
         # Tạo dữ liệu mẫu nếu cần
         create_sample_data()
         
+        # Khởi tạo bảng thống kê cho database đã có dữ liệu
+        ensure_user_stats()
+        
     except Exception as e:
         logger.error(f"❌ Error initializing database: {str(e)}")
         raise
 
+# Các cột được thêm sau khi bảng đã tồn tại: table -> [(column, DDL)]
+SCHEMA_COLUMNS = {
+    'app_data': [
+        ('content_hash', 'VARCHAR(64)'),
+    ],
+}
+
+def get_schema_columns():
+    """SCHEMA_COLUMNS cùng các cột generated (biểu thức khai báo trong model)"""
+    from models.AppData import AppData
+    
+    schema_columns = {table: list(columns) for table, columns in SCHEMA_COLUMNS.items()}
+    schema_columns['app_data'].append(
+        ('content_blob', f"VARCHAR(64) GENERATED ALWAYS AS ({AppData.CONTENT_BLOB_EXPRESSION}) VIRTUAL")
+    )
+    return schema_columns
+
+def run_migrations():
+    """Áp dụng thay đổi schema (thêm cột, index) cho database SQLite đã tồn tại"""
+    try:
+        with db.engine.begin() as conn:
+            for table, columns in get_schema_columns().items():
+                # table_xinfo liệt kê cả cột generated (table_info thì không)
+                existing = {row[1] for row in conn.execute(text(f"PRAGMA table_xinfo({table})"))}
+                for column, ddl in columns:
+                    if column not in existing:
+                        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+                        logger.info(f"✅ Migration: added column {table}.{column}")
+        
+        create_missing_indexes()
+        backfill_content_hashes()
+        ensure_search_index()
+        ensure_attribute_index()
+        
+    except Exception as e:
+        logger.error(f"❌ Error running migrations: {str(e)}")
+        raise
+
+def create_missing_indexes():
+    """Tạo các index khai báo trong model nhưng chưa có trong database
+
+    create_all() không thêm index vào bảng đã tồn tại. Sau khi tạo index mới
+    thì chạy ANALYZE để query planner có thống kê cho index đó.
+    """
+    created = []
+    with db.engine.begin() as conn:
+        existing = {
+            row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))
+        }
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(bind=conn)
+                    created.append(index.name)
+                    logger.info(f"✅ Migration: created index {index.name} on {table.name}")
+        
+        if created:
+            conn.execute(text("ANALYZE"))
+    return created
+
+def ensure_search_index():
+    """Tạo index full-text (FTS5) cho app_data nếu chưa có"""
+    from services.search_service import SearchService
+    SearchService().ensure_index()
+
+def rebuild_search_index():
+    """Index lại toàn bộ app_data vào bảng FTS5"""
+    try:
+        from services.search_service import SearchService
+        return SearchService().rebuild()
+    except Exception as e:
+        logger.error(f"❌ Error rebuilding search index: {str(e)}")
+        raise
+
+def ensure_attribute_index():
+    """Tạo trigger index thuộc tính JSON và đồng bộ các path với DATA_INDEXED_PATHS"""
+    from services.attribute_index_service import AttributeIndexService
+    AttributeIndexService().ensure_index()
+
+def rebuild_attribute_index():
+    """Index lại toàn bộ thuộc tính JSON của app_data"""
+    try:
+        from services.attribute_index_service import AttributeIndexService
+        return AttributeIndexService().rebuild()
+    except Exception as e:
+        logger.error(f"❌ Error rebuilding attribute index: {str(e)}")
+        raise
+
+def backfill_content_hashes(chunk_size=500):
+    """Tính content_hash cho các dòng cũ chưa có hash"""
+    from models.AppData import AppData
+    from sqlalchemy import select, bindparam
+    
+    table = AppData.__table__
+    statement = table.update()\
+                     .where(table.c.id == bindparam('_id'))\
+                     .values(content_hash=bindparam('content_hash'))
+    
+    total = 0
+    while True:
+        rows = db.session.execute(
+            select(table.c.id, table.c.type, table.c.title, table.c.content)
+            .where(table.c.content_hash.is_(None))
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        
+        db.session.execute(statement, [
+            {'_id': row.id, 'content_hash': AppData.compute_hash(row.type, row.title, row.content)}
+            for row in rows
+        ])
+        db.session.commit()
+        total += len(rows)
+    
+    if total:
+        logger.info(f"✅ Migration: computed content_hash for {total} rows")
+    return total
+
 def create_sample_data():
     """Tạo dữ liệu mẫu cho development"""
     from config.env import is_development
@@ -37,7 +163,7 @@ def create_sample_data():
     try:
         from models.User import User
         from models.AppData import AppData
-        import bcrypt
+        from services.password_service import password_service
         
         # Kiểm tra xem đã có dữ liệu chưa
         if User.query.first():
@@ -45,7 +171,7 @@ def create_sample_data():
             return
         
         # Tạo admin user
-        admin_password = bcrypt.hashpw('admin123'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        admin_password = password_service.hash('admin123')
         admin_user = User(
             username='admin',
             email='admin@example.com',
@@ -54,7 +180,7 @@ def create_sample_data():
         admin_user.save()
         
         # Tạo test user
-        test_password = bcrypt.hashpw('test123'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        test_password = password_service.hash('test123')
         test_user = User(
             username='testuser',
             email='test@example.com',
@@ -97,6 +223,36 @@ def create_sample_data():
     except Exception as e:
         logger.error(f"❌ Error creating sample data: {str(e)}")
 
+def ensure_user_stats():
+    """Tính thống kê user lần đầu nếu bảng thống kê còn trống"""
+    try:
+        from models.AppData import AppData
+        from models.UserStats import UserStats
+        
+        if UserStats.query.first() or not AppData.query.first():
+            return
+        
+        rebuild_user_stats()
+        
+    except Exception as e:
+        logger.error(f"❌ Error initializing user stats: {str(e)}")
+
+def rebuild_user_stats(user_id=None):
+    """Tính lại bảng thống kê user bằng GROUP BY trên app_data (sửa dữ liệu lệch)"""
+    try:
+        from models.UserStats import UserStats
+        
+        row_count = UserStats.rebuild(user_id)
+        db.session.commit()
+        
+        logger.info(f"✅ User stats rebuilt: {row_count} rows")
+        return row_count
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"❌ Error rebuilding user stats: {str(e)}")
+        return 0
+
 def configure_sqlite():
     """Cấu hình đặc biệt cho SQLite"""
     
@@ -122,6 +278,9 @@ def configure_sqlite():
             cursor.execute("PRAGMA temp_store=MEMORY")
             
             cursor.close()
+            
+            # Trigger index thuộc tính JSON đọc content nằm trong blob store
+            dbapi_connection.create_function('blob_json', 1, resolve_json_sql, deterministic=True)
 
 def backup_database(backup_path=None):
     """Backup SQLite database"""
@@ -272,7 +431,9 @@ def cleanup_old_data(days=30):
     try:
         from datetime import datetime, timedelta
         from models.AppData import AppData
+        from services.change_log_service import ChangeLogService
         
+        change_log = ChangeLogService()
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         
         # Query old data
@@ -280,6 +441,7 @@ def cleanup_old_data(days=30):
         
         deleted_count = 0
         for item in old_data:
+            change_log.record_deleted(item.user_id, item.id, item.type)
             db.session.delete(item)
             deleted_count += 1
         
@@ -316,11 +478,128 @@ def optimize_database():
         logger.error(f"❌ Database optimization failed: {str(e)}")
         return False
 
+def explain_query_plan(statement, params=()):
+    """Lấy EXPLAIN QUERY PLAN (danh sách dòng detail) của một câu select / ORM query / SQL đã compile"""
+    if isinstance(statement, str):
+        sql = statement
+    else:
+        if hasattr(statement, 'statement'):
+            # ORM Query
+            statement = statement.statement
+        compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+        sql = str(compiled)
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    
+    result = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params)
+    return [row[-1] for row in result]
+
+def capture_select_statements(function):
+    """Gọi function và trả về các câu SELECT (sql, params) mà nó thực sự gửi tới database"""
+    statements = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, tuple(parameters or ())))
+    
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        result = function()
+        if hasattr(result, '__next__'):
+            # Finder dạng generator chỉ query khi được duyệt
+            list(result)
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    return statements
+
+def get_query_plan_checks():
+    """Các access path cần kiểm tra: (tên, hàm gọi finder thật, index bắt buộc)
+
+    Plan được lấy từ chính các câu lệnh mà finder gửi đi (capture_select_statements),
+    nên thay đổi trong finder cũng được kiểm tra.
+    """
+    from datetime import datetime
+    from models.AppData import AppData
+    from models.ChangeLog import ChangeLog
+    
+    since = datetime(2000, 1, 1)
+    position = (since, 1)
+    where = (('phone', ('0900000000',)), ('features', ('vip', 'sms')))
+    ids = [1, 2, 3]
+    # Tra theo danh sách ID: rowid lookup (primary key hoặc (user_id, rowid) trên ix_app_data_user_id)
+    by_rowid = 'rowid=?'
+    
+    def execute(statement):
+        return lambda: db.session.execute(statement).all()
+    
+    return [
+        ('AppData.find_by_user_id', lambda: AppData.find_by_user_id(1), 'ix_app_data_user_created'),
+        ('AppData.find_by_user_and_type', lambda: AppData.find_by_user_and_type(1, 'note'), 'ix_app_data_user_type_created'),
+        ('AppData.find_by_user_since', lambda: AppData.find_by_user_since(1, since), 'ix_app_data_user_updated'),
+        ('AppData.list_statement', execute(AppData.list_statement(1).limit(20)), 'ix_app_data_user_created'),
+        ('AppData.list_statement(summary)', execute(AppData.list_statement(1, fields=AppData.SUMMARY_FIELDS).limit(20)), 'ix_app_data_user_created'),
+        ('AppData.list_statement(type)', execute(AppData.list_statement(1, 'note').limit(20)), 'ix_app_data_user_type_created'),
+        ('AppData.list_statement(where)', execute(AppData.list_statement(1, 'customer', where=where).limit(20)), 'ix_app_data_attributes_lookup'),
+        ('AppData.count_statement(where)', execute(AppData.count_statement(1, 'customer', where)), 'ix_app_data_attributes_lookup'),
+        ('AppData.find_user_page(after)', lambda: AppData.find_user_page(1, 10, after=position), 'ix_app_data_user_created'),
+        ('AppData.find_user_page(before)', lambda: AppData.find_user_page(1, 10, before=position), 'ix_app_data_user_created'),
+        ('AppData.find_user_page(type, after)', lambda: AppData.find_user_page(1, 10, after=position, data_type='note'), 'ix_app_data_user_type_created'),
+        ('AppData.find_user_page(where, after)', lambda: AppData.find_user_page(1, 10, after=position, data_type='customer', where=where), 'ix_app_data_attributes_lookup'),
+        ('AppData.find_user_rows_after', lambda: AppData.find_user_rows_after(1, 0, 100), 'ix_app_data_user_id'),
+        ('AppData.iter_user_rows', lambda: AppData.iter_user_rows(1, 100), 'ix_app_data_user_id'),
+        ('AppData.iter_rows_by_ids', lambda: AppData.iter_rows_by_ids(1, ids), by_rowid),
+        ('AppData.find_by_ids', lambda: AppData.find_by_ids(ids), by_rowid),
+        ('AppData.find_versions', lambda: AppData.find_versions(1, ids), by_rowid),
+        ('AppData.find_types', lambda: AppData.find_types(1, ids), by_rowid),
+        ('ChangeLog.get_latest', lambda: ChangeLog.get_latest(1), 'ix_app_data_changes_user_seq'),
+        ('ChangeLog.get_latest_seq', lambda: ChangeLog.get_latest_seq(1), 'ix_app_data_changes_user_seq'),
+        ('ChangeLog.find_since', lambda: ChangeLog.find_since(1, 0, limit=100), 'ix_app_data_changes_user_seq'),
+    ]
+
+def verify_query_plans(raise_on_failure=False):
+    """Kiểm tra query plan của các finder: phải dùng index mong đợi, không full scan, không sort tạm
+
+    Dùng khi thay đổi query hoặc index (ví dụ chạy trong `flask shell`) để
+    phát hiện sớm việc quay lại full scan / USE TEMP B-TREE.
+    """
+    results = []
+    for name, finder, expected_index in get_query_plan_checks():
+        statements = capture_select_statements(finder)
+        plan = []
+        for sql, params in statements:
+            plan.extend(explain_query_plan(sql, params))
+        
+        problems = []
+        if not statements:
+            problems.append("finder không gửi câu SELECT nào")
+        for detail in plan:
+            if detail.startswith('SCAN ') and ' USING ' not in detail:
+                problems.append(f"full scan: {detail}")
+            if 'TEMP B-TREE' in detail:
+                problems.append(f"temp sort: {detail}")
+        if statements and not any(expected_index in detail for detail in plan):
+            problems.append(f"không dùng index {expected_index}")
+        
+        results.append({'name': name, 'plan': plan, 'ok': not problems, 'problems': problems})
+        if problems:
+            logger.warning(f"Query plan regression in {name}: {'; '.join(problems)} | plan: {plan}")
+    
+    failed = [result['name'] for result in results if not result['ok']]
+    if failed and raise_on_failure:
+        raise AssertionError(f"Query plan regression: {', '.join(failed)}")
+    
+    logger.info(f"Query plan check: {len(results) - len(failed)}/{len(results)} OK")
+    return results
+
 # Configure SQLite on import
 configure_sqlite()
 
 # Export functions
 __all__ = [
     'db', 'init_db', 'backup_database', 'restore_database', 
-    'get_database_info', 'check_database_health', 'cleanup_old_data', 'optimize_database'
+    'get_database_info', 'check_database_health', 'cleanup_old_data', 'optimize_database',
+    'rebuild_user_stats', 'run_migrations', 'create_missing_indexes',
+    'ensure_search_index', 'rebuild_search_index',
+    'ensure_attribute_index', 'rebuild_attribute_index',
+    'explain_query_plan', 'verify_query_plans'
 ]
\ No newline at end of file
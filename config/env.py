@@ -23,6 +23,16 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-change-in-production'
     JWT_ACCESS_TOKEN_EXPIRES = int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRES', 86400))  # 24 hours
     JWT_ALGORITHM = 'HS256'
+    JWT_REFRESH_TOKEN_EXPIRES = int(os.environ.get('JWT_REFRESH_TOKEN_EXPIRES', 30 * 86400))  # 30 days
+    
+    # Chế độ stateless: access token ngắn hạn mang sẵn claims (id, username, role),
+    # token_required không đọc database; gia hạn bằng refresh token xoay vòng
+    AUTH_STATELESS = os.environ.get('AUTH_STATELESS', 'False').lower() == 'true'
+    AUTH_STATELESS_ACCESS_EXPIRES = int(os.environ.get('AUTH_STATELESS_ACCESS_EXPIRES', 900))  # seconds
+    
+    # Thu hồi token (logout / xóa tài khoản), đồng bộ giữa các process qua database
+    TOKEN_REVOCATION_SYNC_INTERVAL = float(os.environ.get('TOKEN_REVOCATION_SYNC_INTERVAL', 5))  # seconds, 0 = tắt
+    TOKEN_REVOCATION_PURGE_INTERVAL = int(os.environ.get('TOKEN_REVOCATION_PURGE_INTERVAL', 3600))  # seconds
     
     # CORS configuration
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
@@ -43,7 +53,18 @@ class Config:
     
     # Rate limiting
     RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
-    RATE_LIMIT_DEFAULT = os.environ.get('RATE_LIMIT_DEFAULT', '100 per hour')
+    RATE_LIMIT_DEFAULT = os.environ.get('RATE_LIMIT_DEFAULT', '100 per hour')  # mỗi user (hoặc IP nếu chưa đăng nhập)
+    # Ghi đè theo user id: '1=10000 per hour; 7=50 per minute'
+    RATE_LIMIT_USERS = os.environ.get('RATE_LIMIT_USERS', '')
+    # Giới hạn thêm theo route ('[METHOD ]path prefix=limit', phân cách bằng ';')
+    RATE_LIMIT_ROUTES = os.environ.get(
+        'RATE_LIMIT_ROUTES',
+        'POST /api/user/login=10 per minute; POST /api/user/register=5 per minute; POST /api/user/refresh=30 per minute'
+    )
+    # memory (mỗi process) | sqlite:///rate_limit.db (dùng chung giữa các worker process)
+    RATE_LIMIT_STORAGE = os.environ.get('RATE_LIMIT_STORAGE', 'memory')
+    # Lấy IP client từ X-Forwarded-For (chỉ bật khi chạy sau reverse proxy tin cậy)
+    RATE_LIMIT_TRUST_PROXY = os.environ.get('RATE_LIMIT_TRUST_PROXY', 'False').lower() == 'true'
     
     # File upload (nếu cần)
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
@@ -59,6 +80,61 @@ class Config:
     # Sync configuration
     SYNC_BATCH_SIZE = int(os.environ.get('SYNC_BATCH_SIZE', 100))
     SYNC_TIMEOUT = int(os.environ.get('SYNC_TIMEOUT', 30))  # seconds
+    SYNC_STREAM_CHUNK_SIZE = int(os.environ.get('SYNC_STREAM_CHUNK_SIZE', 500))  # rows / chunk khi stream NDJSON
+    
+    DATA_PAGE_MAX_SIZE = int(os.environ.get('DATA_PAGE_MAX_SIZE', 100))  # per_page tối đa của GET /api/data
+    DATA_BATCH_MAX_ITEMS = int(os.environ.get('DATA_BATCH_MAX_ITEMS', 1000))  # item tối đa của /api/data/batch
+    # JSON path trong content được index để lọc bằng where[path]=value ('<type>.<path>', cách nhau dấu phẩy)
+    DATA_INDEXED_PATHS = os.environ.get(
+        'DATA_INDEXED_PATHS',
+        'customer.name,customer.phone,customer.features,service.group,service.price'
+    )
+    
+    # Snapshot cho force sync (nén gzip trên đĩa)
+    SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', 'snapshots')
+    SNAPSHOT_COMPRESSION_LEVEL = int(os.environ.get('SNAPSHOT_COMPRESSION_LEVEL', 6))
+    
+    # Blob store cho content lớn của AppData (content-addressed, loại trùng)
+    CONTENT_BLOB_DIR = os.environ.get('CONTENT_BLOB_DIR', 'blobs')
+    CONTENT_BLOB_THRESHOLD = int(os.environ.get('CONTENT_BLOB_THRESHOLD', 64 * 1024))  # bytes, 0 = tắt
+    CONTENT_BLOB_GC_INTERVAL = int(os.environ.get('CONTENT_BLOB_GC_INTERVAL', 3600))  # seconds, 0 = tắt
+    CONTENT_BLOB_GC_GRACE = int(os.environ.get('CONTENT_BLOB_GC_GRACE', 3600))  # seconds, giữ blob mới ghi
+    
+    # Change log (delta sync)
+    CHANGE_LOG_RETENTION_DAYS = int(os.environ.get('CHANGE_LOG_RETENTION_DAYS', 30))  # giữ tombstone
+    CHANGE_LOG_COMPACT_INTERVAL = int(os.environ.get('CHANGE_LOG_COMPACT_INTERVAL', 3600))  # seconds, 0 = tắt
+    
+    # Cache đọc AppData theo user (memory | none)
+    DATA_CACHE_ENABLED = os.environ.get('DATA_CACHE_ENABLED', 'True').lower() == 'true'
+    DATA_CACHE_BACKEND = os.environ.get('DATA_CACHE_BACKEND', 'memory')
+    DATA_CACHE_TTL = int(os.environ.get('DATA_CACHE_TTL', 60))  # seconds
+    DATA_CACHE_MAX_ENTRIES = int(os.environ.get('DATA_CACHE_MAX_ENTRIES', 10000))
+    DATA_CACHE_MAX_BYTES = int(os.environ.get('DATA_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    DATA_CACHE_MAX_ENTRY_BYTES = int(os.environ.get('DATA_CACHE_MAX_ENTRY_BYTES', 1024 * 1024))
+    
+    # Hash mật khẩu bcrypt trên pool riêng (workers = 0: hash ngay trên thread request)
+    PASSWORD_BCRYPT_ROUNDS = int(os.environ.get('PASSWORD_BCRYPT_ROUNDS', 12))
+    PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR', 'process')  # process | thread
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', 16))  # việc chờ tối đa, vượt => 503
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5))  # seconds chờ kết quả
+    
+    # Cache thông tin user đã xác thực trong token_required (0 TTL = không hết hạn)
+    AUTH_CACHE_ENABLED = os.environ.get('AUTH_CACHE_ENABLED', 'True').lower() == 'true'
+    AUTH_CACHE_TTL = int(os.environ.get('AUTH_CACHE_TTL', 300))  # seconds
+    AUTH_CACHE_MAX_ENTRIES = int(os.environ.get('AUTH_CACHE_MAX_ENTRIES', 10000))
+    
+    # Idempotency key cho các thao tác ghi
+    IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 86400))  # seconds
+    IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 60))  # seconds giữ chỗ khi đang xử lý
+    IDEMPOTENCY_CLEANUP_INTERVAL = int(os.environ.get('IDEMPOTENCY_CLEANUP_INTERVAL', 3600))  # seconds, 0 = tắt
+    
+    # Nén response (gzip/deflate, brotli nếu đã cài)
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'True').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 500))  # bytes
+    COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))  # gzip/deflate 1-9
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))  # 0-11
+    COMPRESSION_STREAMING = os.environ.get('COMPRESSION_STREAMING', 'True').lower() == 'true'
     
     # Security headers
     SECURITY_HEADERS = {
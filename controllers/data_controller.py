@@ -1,62 +1,92 @@
 # Xử lý logic nghiệp vụ cho dữ liệu app
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, send_file
+from sqlalchemy import select, type_coerce, Text
 from models.AppData import AppData
+from models.UserStats import UserStats
 from config.db import db
+from config.env import Config
+from services.change_log_service import ChangeLogService
+from services.bulk_data_service import BulkDataService
+from services.data_cache_service import data_cache
+from services.search_service import SearchService
+from services.attribute_index_service import AttributeIndexService
 from utils.response_wrapper import ResponseWrapper
 from utils.logger import logger
+from utils.json_patch import JsonPatchError, patch_json_text, normalize_patch_type
+from utils.cursor import encode_cursor, decode_cursor
+from utils.serializer import format_datetime
+from utils.blob_store import blob_store, parse_marker
 from datetime import datetime
 
 class DataController:
+    # Các field trả về khi client yêu cầu fields=full
+    FULL_FIELDS = ('id', 'type', 'title', 'content', 'created_at', 'updated_at')
+
     def __init__(self):
         self.response = ResponseWrapper()
+        self.change_log = ChangeLogService()
+        self.bulk_service = BulkDataService()
+        self.search_service = SearchService()
+        self.attribute_index = AttributeIndexService()
 
     def get_all_data(self, current_user):
-        """Lấy tất cả dữ liệu của user"""
+        """Lấy tất cả dữ liệu của user
+        
+        Mặc định phân trang theo page/per_page. Khi có tham số after/before
+        (hoặc pagination=cursor) thì dùng keyset cursor theo (created_at, id):
+        mỗi trang tốn chi phí như trang đầu và không cần COUNT(*).
+        
+        Tham số where[path]=value (cần type) lọc theo các JSON path đã
+        khai báo trong DATA_INDEXED_PATHS, qua index app_data_attributes.
+        """
         try:
             # Lấy query parameters
-            page = request.args.get('page', 1, type=int)
             per_page = request.args.get('per_page', 10, type=int)
+            per_page = max(1, min(per_page, Config.DATA_PAGE_MAX_SIZE))
             data_type = request.args.get('type')
             
-            # Query cơ bản
-            query = AppData.query.filter_by(user_id=current_user.id)
-            
-            # Filter theo type nếu có
-            if data_type:
-                query = query.filter_by(type=data_type)
-            
-            # Order by created_at desc
-            query = query.order_by(AppData.created_at.desc())
-            
-            # Pagination
-            paginated_data = query.paginate(
-                page=page, 
-                per_page=per_page, 
-                error_out=False
-            )
-            
-            # Serialize data
-            data_list = []
-            for item in paginated_data.items:
-                data_list.append({
-                    'id': item.id,
-                    'type': item.type,
-                    'title': item.title,
-                    'content': item.content,
-                    'created_at': item.created_at.isoformat() if item.created_at else None,
-                    'updated_at': item.updated_at.isoformat() if item.updated_at else None
-                })
-            
-            return self.response.success(
-                data={
-                    'items': data_list,
+            try:
+                fields = self._parse_fields()
+                where = self.attribute_index.parse_where(request.args, data_type)
+            except ValueError as e:
+                return self.response.error(message=str(e))
+            
+            if ('after' in request.args or 'before' in request.args
+                    or request.args.get('pagination') == 'cursor'):
+                return self._get_data_page_by_cursor(current_user, per_page, data_type, fields, where)
+            
+            page = max(request.args.get('page', 1, type=int), 1)
+            
+            def load():
+                # Query theo user (+ type), order by created_at desc (không hydrate ORM)
+                # Chỉ select các cột được yêu cầu (mặc định không đọc content)
+                query = AppData.list_statement(current_user.id, data_type, fields, where)
+                
+                # Pagination: tổng số lấy từ bộ đếm thay vì COUNT(*)
+                rows = db.session.execute(
+                    query.limit(per_page).offset((page - 1) * per_page)
+                ).all()
+                total = self._count_items(current_user.id, data_type, where)
+                
+                return {
+                    'items': self._serialize_rows(rows, fields),
                     'pagination': {
                         'page': page,
                         'per_page': per_page,
-                        'total': paginated_data.total,
-                        'pages': paginated_data.pages
+                        'total': total,
+                        'pages': (total + per_page - 1) // per_page
                     }
-                },
+                }
+            
+            data = data_cache.get_or_load(
+                current_user.id,
+                ('list', data_type, page, per_page, fields, where),
+                load,
+                data_cache.list_tags(data_type)
+            )
+            
+            return self.response.success(
+                data=data,
                 message="Lấy dữ liệu thành công"
             )
             
@@ -67,29 +97,149 @@ class DataController:
                 error=str(e)
             )
 
+    def _get_data_page_by_cursor(self, current_user, per_page, data_type, fields, where=()):
+        """Phân trang keyset theo cursor after/before"""
+        try:
+            after = self._parse_page_cursor(request.args.get('after'))
+            before = self._parse_page_cursor(request.args.get('before'))
+        except ValueError as e:
+            return self.response.error(message=str(e))
+        
+        if after is not None and before is not None:
+            return self.response.error(message="Chỉ dùng một trong hai tham số after hoặc before")
+        
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
+        
+        def load():
+            rows, has_more = AppData.find_user_page(
+                current_user.id,
+                per_page,
+                after=after,
+                before=before,
+                data_type=data_type,
+                fields=fields,
+                where=where
+            )
+            
+            # Đi tới (after / trang đầu): has_more = còn trang sau
+            # Đi lùi (before): has_more = còn trang trước
+            if before is not None:
+                has_next, has_prev = True, has_more
+            else:
+                has_next, has_prev = has_more, after is not None
+            
+            pagination = {
+                'per_page': per_page,
+                'next_cursor': self._make_page_cursor(rows[-1]) if rows and has_next else None,
+                'prev_cursor': self._make_page_cursor(rows[0]) if rows and has_prev else None,
+                'has_next': has_next,
+                'has_prev': has_prev
+            }
+            
+            # Tổng số là tùy chọn, đọc từ bộ đếm thống kê
+            if include_total:
+                pagination['total'] = self._count_items(current_user.id, data_type, where)
+            
+            return {
+                'items': self._serialize_rows(rows, fields),
+                'pagination': pagination
+            }
+        
+        data = data_cache.get_or_load(
+            current_user.id,
+            ('page', data_type, after, before, per_page, include_total, fields, where),
+            load,
+            data_cache.list_tags(data_type)
+        )
+        
+        return self.response.success(
+            data=data,
+            message="Lấy dữ liệu thành công"
+        )
+
+    @staticmethod
+    def _count_items(user_id, data_type, where):
+        """Tổng số item: bộ đếm UserStats, hoặc COUNT trên index khi có where"""
+        if where:
+            return db.session.execute(AppData.count_statement(user_id, data_type, where)).scalar()
+        return UserStats.get_item_count(user_id, data_type)
+
+    @staticmethod
+    def _make_page_cursor(row):
+        """Cursor opaque từ vị trí (created_at, id) của một row"""
+        return encode_cursor({'c': format_datetime(row.created_at), 'i': row.id})
+
+    @staticmethod
+    def _parse_page_cursor(cursor):
+        """Giải mã cursor phân trang thành (created_at, id); None nếu không có"""
+        if not cursor:
+            return None
+        payload = decode_cursor(cursor)
+        try:
+            return datetime.fromisoformat(payload['c']), int(payload['i'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Cursor không hợp lệ")
+
+    @staticmethod
+    def _parse_fields():
+        """Đọc tham số fields= của danh sách
+        
+        Không có / 'summary' => projection rút gọn (không có content),
+        'full' / '*' => đầy đủ như trước, hoặc danh sách field cách nhau bởi dấu phẩy.
+        """
+        value = request.args.get('fields', 'summary').strip()
+        if value in ('', 'summary'):
+            return AppData.SUMMARY_FIELDS
+        if value in ('full', '*'):
+            return DataController.FULL_FIELDS
+        
+        # id luôn được trả về để client định danh item
+        fields = tuple(dict.fromkeys(['id'] + [name.strip() for name in value.split(',') if name.strip()]))
+        unknown = [name for name in fields if name not in AppData.FIELDS]
+        if unknown:
+            raise ValueError(f"Field không hợp lệ: {', '.join(unknown)}")
+        return fields
+
+    @staticmethod
+    def _serialize_row(row, fields=None):
+        """Serialize row (select từ AppData.columns_for(fields)) theo các field được chọn"""
+        return AppData.serializer_for(fields, fields or DataController.FULL_FIELDS).serialize(row)
+
+    @staticmethod
+    def _serialize_rows(rows, fields=None):
+        """Serialize danh sách row, dùng chung một RowSerializer"""
+        return AppData.serializer_for(fields, fields or DataController.FULL_FIELDS).serialize_all(rows)
+
     def get_data_by_id(self, current_user, data_id):
         """Lấy dữ liệu theo ID"""
         try:
-            data_item = AppData.query.filter_by(
-                id=data_id, 
-                user_id=current_user.id
-            ).first()
+            def load():
+                # Core select, không hydrate ORM object
+                row = db.session.execute(
+                    select(*AppData.columns_for(self.FULL_FIELDS))
+                    .where(AppData.id == data_id, AppData.user_id == current_user.id)
+                ).first()
+                
+                if row is None:
+                    return None
+                
+                return self._serialize_row(row, self.FULL_FIELDS)
+            
+            data = data_cache.get_or_load(
+                current_user.id,
+                ('item', data_id),
+                load,
+                data_cache.item_tags(data_id)
+            )
             
-            if not data_item:
+            if data is None:
                 return self.response.error(
                     message="Không tìm thấy dữ liệu",
                     status_code=404
                 )
             
             return self.response.success(
-                data={
-                    'id': data_item.id,
-                    'type': data_item.type,
-                    'title': data_item.title,
-                    'content': data_item.content,
-                    'created_at': data_item.created_at.isoformat() if data_item.created_at else None,
-                    'updated_at': data_item.updated_at.isoformat() if data_item.updated_at else None
-                },
+                data=data,
                 message="Lấy dữ liệu thành công"
             )
             
@@ -100,6 +250,62 @@ class DataController:
                 error=str(e)
             )
 
+    def get_data_content(self, current_user, data_id):
+        """Trả về content gốc của item (không bọc JSON)
+        
+        Content nằm trong blob store được gửi thẳng từ file bằng send_file
+        (sendfile / wsgi.file_wrapper, không copy qua Python), ETag là hash blob.
+        """
+        try:
+            # Đọc giá trị thô của cột (tham chiếu blob chưa được resolve)
+            row = db.session.execute(
+                select(type_coerce(AppData.content, Text).label('content'))
+                .where(AppData.id == data_id, AppData.user_id == current_user.id)
+            ).first()
+            
+            if row is None:
+                return self.response.error(
+                    message="Không tìm thấy dữ liệu",
+                    status_code=404
+                )
+            
+            reference = parse_marker(row.content)
+            if reference is None:
+                return current_app.response_class(row.content, mimetype=self._content_mimetype(row.content[:1]))
+            
+            digest, length = reference
+            path = blob_store.path(digest)
+            with open(path, 'rb') as blob_file:
+                first = blob_file.read(1).decode('utf-8', 'ignore')
+            
+            return send_file(
+                path,
+                mimetype=self._content_mimetype(first),
+                etag=digest,
+                conditional=True,
+                max_age=0
+            )
+            
+        except FileNotFoundError:
+            logger.error(f"Blob content missing for data {data_id}")
+            return self.response.error(
+                message="Không đọc được nội dung dữ liệu",
+                status_code=500
+            )
+        except Exception as e:
+            logger.error(f"Get data content error: {str(e)}")
+            return self.response.error(
+                message="Lỗi khi lấy nội dung dữ liệu",
+                error=str(e)
+            )
+
+    @staticmethod
+    def _content_mimetype(first_char):
+        """Content JSON (object / mảng) hay text thường"""
+        if first_char in ('{', '['):
+            return 'application/json'
+        return 'text/plain'
+
     def create_data(self, current_user):
         """Tạo dữ liệu mới"""
         try:
@@ -119,6 +325,8 @@ class DataController:
             )
             
             db.session.add(new_data)
+            db.session.flush()
+            self.change_log.record_created(current_user.id, new_data.id, new_data.type)
             db.session.commit()
             
             # Emit realtime update
@@ -142,7 +350,8 @@ class DataController:
                     'type': new_data.type,
                     'title': new_data.title,
                     'content': new_data.content,
-                    'created_at': new_data.created_at.isoformat()
+                    'created_at': new_data.created_at.isoformat(),
+                    'content_hash': new_data.content_hash
                 },
                 message="Tạo dữ liệu thành công"
             )
@@ -173,6 +382,8 @@ class DataController:
             if not update_data:
                 return self.response.error(message="Không có dữ liệu để cập nhật")
             
+            previous_type = data_item.type
+            
             # Cập nhật các field
             if 'type' in update_data:
                 data_item.type = update_data['type']
@@ -183,6 +394,7 @@ class DataController:
             
             data_item.updated_at = datetime.utcnow()
             
+            self.change_log.record_updated(current_user.id, data_item.id, data_item.type, previous_type)
             db.session.commit()
             
             # Emit realtime update
@@ -206,7 +418,8 @@ class DataController:
                     'type': data_item.type,
                     'title': data_item.title,
                     'content': data_item.content,
-                    'updated_at': data_item.updated_at.isoformat()
+                    'updated_at': data_item.updated_at.isoformat(),
+                    'content_hash': data_item.content_hash
                 },
                 message="Cập nhật dữ liệu thành công"
             )
@@ -219,6 +432,104 @@ class DataController:
                 error=str(e)
             )
 
+    def patch_data(self, current_user, data_id):
+        """Cập nhật một phần content bằng JSON Patch (RFC 6902) / Merge Patch (RFC 7386)
+        
+        Body là patch (Content-Type application/json-patch+json hoặc
+        application/merge-patch+json), hoặc {'patch': ..., 'patch_type': ..., 'base_hash': ...}.
+        Version gốc lấy từ header If-Match hoặc base_hash.
+        """
+        try:
+            data_item = AppData.query.filter_by(
+                id=data_id, 
+                user_id=current_user.id
+            ).first()
+            
+            if not data_item:
+                return self.response.error(
+                    message="Không tìm thấy dữ liệu",
+                    status_code=404
+                )
+            
+            payload = request.get_json(silent=True)
+            if payload is None:
+                return self.response.error(message="Không có patch để áp dụng")
+            
+            if request.mimetype in ('application/json-patch+json', 'application/merge-patch+json'):
+                patch = payload
+                patch_type = normalize_patch_type(request.mimetype)
+                base_hash = None
+            elif isinstance(payload, dict) and 'patch' in payload:
+                patch = payload['patch']
+                patch_type = normalize_patch_type(payload.get('patch_type'))
+                base_hash = payload.get('base_hash')
+            else:
+                return self.response.error(message="Patch không hợp lệ")
+            
+            # Kiểm tra version gốc mà client dùng để tạo patch
+            if_match = [etag for etag in request.if_match]
+            if if_match:
+                base_hash = if_match[0]
+            if base_hash and base_hash != data_item.content_hash:
+                return self.response.conflict(
+                    message="Dữ liệu đã bị thay đổi, vui lòng đồng bộ lại",
+                    error={'current_hash': data_item.content_hash}
+                )
+            
+            base_hash = data_item.content_hash
+            data_item.content = patch_json_text(data_item.content, patch, patch_type)
+            data_item.updated_at = datetime.utcnow()
+            
+            db.session.flush()
+            self.change_log.record_updated(current_user.id, data_item.id, data_item.type)
+            db.session.commit()
+            
+            # Emit realtime update: chỉ gửi patch, không gửi toàn bộ content
+            if current_app.socketio:
+                current_app.socketio.emit(
+                    'data_patched',
+                    {
+                        'id': data_item.id,
+                        'type': data_item.type,
+                        'title': data_item.title,
+                        'user_id': current_user.id,
+                        'patch': patch,
+                        'patch_type': patch_type,
+                        'base_hash': base_hash,
+                        'content_hash': data_item.content_hash
+                    },
+                    room=f"user_{current_user.id}"
+                )
+            
+            logger.info(f"Data patched by user {current_user.id}: {data_id} ({patch_type})")
+            
+            return self.response.success(
+                data={
+                    'id': data_item.id,
+                    'type': data_item.type,
+                    'title': data_item.title,
+                    'content_hash': data_item.content_hash,
+                    'updated_at': data_item.updated_at.isoformat()
+                },
+                message="Cập nhật dữ liệu thành công"
+            )
+            
+        except JsonPatchError as e:
+            db.session.rollback()
+            logger.warning(f"Invalid patch for data {data_id}: {str(e)}")
+            return self.response.error(
+                message="Patch không hợp lệ",
+                error=str(e),
+                status_code=422
+            )
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Patch data error: {str(e)}")
+            return self.response.error(
+                message="Lỗi khi cập nhật dữ liệu",
+                error=str(e)
+            )
+
     def delete_data(self, current_user, data_id):
         """Xóa dữ liệu"""
         try:
@@ -233,6 +544,7 @@ class DataController:
                     status_code=404
                 )
             
+            self.change_log.record_deleted(current_user.id, data_item.id, data_item.type)
             db.session.delete(data_item)
             db.session.commit()
             
@@ -261,24 +573,233 @@ class DataController:
                 error=str(e)
             )
 
+    def batch_create(self, current_user):
+        """Tạo nhiều dữ liệu trong một transaction"""
+        return self._batch_write(current_user, 'create')
+
+    def batch_update(self, current_user):
+        """Cập nhật nhiều dữ liệu trong một transaction"""
+        return self._batch_write(current_user, 'update')
+
+    def _batch_write(self, current_user, mode):
+        """Xử lý chung cho batch create / update"""
+        try:
+            data = request.get_json(silent=True) or {}
+            items = data.get('items') if isinstance(data, dict) else None
+            
+            error = self._validate_batch(items, 'items') or self._validate_atomic(data)
+            if error:
+                return error
+            
+            result = self.bulk_service.write_batch(
+                current_user.id,
+                items,
+                mode,
+                atomic=data.get('atomic', False)
+            )
+            
+            if not result['applied']:
+                return self.response.error(
+                    message="Có item không hợp lệ, không có thay đổi nào được ghi",
+                    error={'results': result['results']},
+                    status_code=422
+                )
+            
+            self._emit_batch_event(
+                current_user.id,
+                created=result['created'],
+                updated=result['updated'],
+                patches=result['patched']
+            )
+            
+            logger.info(
+                f"Batch {mode} by user {current_user.id}: "
+                f"{len(result['created']) + len(result['updated'])} written, {len(result['errors'])} errors"
+            )
+            
+            return self.response.success(
+                data={
+                    'results': result['results'],
+                    'created_count': len(result['created']),
+                    'updated_count': len(result['updated']),
+                    'error_count': len(result['errors'])
+                },
+                message="Xử lý dữ liệu hàng loạt thành công"
+            )
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Batch {mode} error: {str(e)}")
+            return self.response.error(
+                message="Lỗi khi xử lý dữ liệu hàng loạt",
+                error=str(e)
+            )
+
+    def batch_delete(self, current_user):
+        """Xóa nhiều dữ liệu trong một transaction"""
+        try:
+            data = request.get_json(silent=True) or {}
+            ids = data.get('ids') if isinstance(data, dict) else None
+            
+            error = self._validate_batch(ids, 'ids') or self._validate_atomic(data)
+            if error:
+                return error
+            
+            result = self.bulk_service.delete_batch(
+                current_user.id,
+                ids,
+                atomic=data.get('atomic', False)
+            )
+            
+            if not result['applied']:
+                return self.response.error(
+                    message="Có item không hợp lệ, không có thay đổi nào được ghi",
+                    error={'results': result['results']},
+                    status_code=422
+                )
+            
+            self._emit_batch_event(current_user.id, deleted=result['deleted'])
+            
+            logger.info(f"Batch delete by user {current_user.id}: {len(result['deleted'])} deleted, {len(result['errors'])} errors")
+            
+            return self.response.success(
+                data={
+                    'results': result['results'],
+                    'deleted_count': len(result['deleted']),
+                    'error_count': len(result['errors'])
+                },
+                message="Xóa dữ liệu hàng loạt thành công"
+            )
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Batch delete error: {str(e)}")
+            return self.response.error(
+                message="Lỗi khi xóa dữ liệu hàng loạt",
+                error=str(e)
+            )
+
+    def _validate_batch(self, values, field):
+        """Kiểm tra danh sách của batch request, trả về response lỗi hoặc None"""
+        if not isinstance(values, list) or not values:
+            return self.response.error(message=f"Thiếu danh sách '{field}'")
+        
+        if len(values) > Config.DATA_BATCH_MAX_ITEMS:
+            return self.response.error(
+                message=f"Tối đa {Config.DATA_BATCH_MAX_ITEMS} item mỗi batch",
+                status_code=413
+            )
+        return None
+
+    def _validate_atomic(self, data):
+        """Chỉ chấp nhận 'atomic' là JSON boolean (chuỗi "false" không được coi là True)"""
+        if not isinstance(data.get('atomic', False), bool):
+            return self.response.error(message="'atomic' phải là true hoặc false")
+        return None
+
+    def _emit_batch_event(self, user_id, created=(), updated=(), patches=(), deleted=()):
+        """Gửi một event realtime duy nhất cho cả batch"""
+        if not current_app.socketio or not (created or updated or deleted):
+            return
+        
+        patched_ids = {patch['id'] for patch in patches}
+        
+        def summary(item):
+            return {'id': item['id'], 'type': item['type'], 'title': item['title']}
+        
+        current_app.socketio.emit(
+            'data_batch',
+            {
+                'user_id': user_id,
+                'created': [summary(item) for item in created],
+                'updated': [summary(item) for item in updated if item['id'] not in patched_ids],
+                'patches': list(patches),
+                'deleted': list(deleted),
+                'timestamp': datetime.utcnow().isoformat()
+            },
+            room=f"user_{user_id}"
+        )
+
+    def search_data(self, current_user):
+        """Tìm kiếm full-text trong title / content của user (không phân biệt dấu, theo prefix)"""
+        try:
+            query = request.args.get('q', '').strip()
+            if not query:
+                return self.response.error(message="Thiếu từ khóa tìm kiếm (q)")
+            
+            data_type = request.args.get('type')
+            page = max(request.args.get('page', 1, type=int), 1)
+            per_page = request.args.get('per_page', 20, type=int)
+            per_page = max(1, min(per_page, Config.DATA_PAGE_MAX_SIZE))
+            
+            try:
+                fields = self._parse_fields()
+            except ValueError as e:
+                return self.response.error(message=str(e))
+            
+            def load():
+                rows, has_more = self.search_service.search(
+                    current_user.id,
+                    query,
+                    data_type=data_type,
+                    limit=per_page,
+                    offset=(page - 1) * per_page,
+                    fields=fields
+                )
+                
+                items = []
+                for row in rows:
+                    item = self._serialize_row(row, fields)
+                    item['score'] = round(-row.score, 4)
+                    items.append(item)
+                
+                return {
+                    'items': items,
+                    'pagination': {
+                        'page': page,
+                        'per_page': per_page,
+                        'has_next': has_more,
+                        'has_prev': page > 1
+                    }
+                }
+            
+            data = data_cache.get_or_load(
+                current_user.id,
+                ('search', query, data_type, page, per_page, fields),
+                load,
+                data_cache.list_tags(data_type)
+            )
+            
+            return self.response.success(
+                data=data,
+                message="Tìm kiếm dữ liệu thành công"
+            )
+            
+        except Exception as e:
+            logger.error(f"Search data error: {str(e)}")
+            return self.response.error(
+                message="Lỗi khi tìm kiếm dữ liệu",
+                error=str(e)
+            )
+
     def get_data_by_type(self, current_user, data_type):
         """Lấy dữ liệu theo loại"""
         try:
-            data_items = AppData.query.filter_by(
-                user_id=current_user.id,
-                type=data_type
-            ).order_by(AppData.created_at.desc()).all()
-            
-            data_list = []
-            for item in data_items:
-                data_list.append({
-                    'id': item.id,
-                    'type': item.type,
-                    'title': item.title,
-                    'content': item.content,
-                    'created_at': item.created_at.isoformat() if item.created_at else None,
-                    'updated_at': item.updated_at.isoformat() if item.updated_at else None
-                })
+            try:
+                fields = self._parse_fields()
+            except ValueError as e:
+                return self.response.error(message=str(e))
+            
+            def load():
+                rows = db.session.execute(AppData.list_statement(current_user.id, data_type, fields)).all()
+                return self._serialize_rows(rows, fields)
+            
+            data_list = data_cache.get_or_load(
+                current_user.id,
+                ('type', data_type, fields),
+                load,
+                data_cache.list_tags(data_type)
+            )
             
             return self.response.success(
                 data=data_list,
@@ -290,4 +811,30 @@ class DataController:
             return self.response.error(
                 message="Lỗi khi lấy dữ liệu theo loại",
                 error=str(e)
-            )
\ No newline at end of file
+            )
+
+    def export_data(self, current_user):
+        """Xuất toàn bộ dữ liệu của user dạng NDJSON (streaming)"""
+        try:
+            chunk_size = Config.SYNC_STREAM_CHUNK_SIZE
+            
+            def generate():
+                count = 0
+                for rows in AppData.iter_user_rows(current_user.id, chunk_size):
+                    count += len(rows)
+                    yield [AppData.row_to_sync_dict(row) for row in rows]
+                logger.info(f"Data exported by user {current_user.id}: {count} items")
+            
+            filename = f"export_user_{current_user.id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.ndjson"
+            
+            return self.response.stream_ndjson(
+                generate(),
+                headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+            )
+            
+        except Exception as e:
+            logger.error(f"Export data error: {str(e)}")
+            return self.response.error(
+                message="Lỗi khi xuất dữ liệu",
+                error=str(e)
+            )
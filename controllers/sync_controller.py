@@ -1,5 +1,5 @@
 # Xử lý logic nghiệp vụ cho đồng bộ realtime
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, Response, send_file, url_for
 from services.sync_service import SyncService
 from utils.response_wrapper import ResponseWrapper
 from utils.logger import logger
@@ -12,13 +12,30 @@ class SyncController:
     def get_sync_data(self, current_user):
         """Lấy dữ liệu đồng bộ của user"""
         try:
-            # Lấy timestamp từ query params (nếu có)
+            # Lấy cursor (ưu tiên) hoặc timestamp từ query params (nếu có)
+            cursor = request.args.get('cursor')
             last_sync = request.args.get('last_sync')
             
+            # Client yêu cầu streaming NDJSON => đọc theo chunk, ghi dần
+            if self._wants_ndjson():
+                logger.info(f"User {current_user.id} requested streaming sync data")
+                return self.response.stream_ndjson(
+                    self.sync_service.iter_user_sync_stream(
+                        user_id=current_user.id,
+                        last_sync=last_sync,
+                        cursor=cursor
+                    )
+                )
+            
+            # Số item tối đa mỗi trang (bị giới hạn bởi SYNC_BATCH_SIZE)
+            limit = request.args.get('limit', type=int)
+            
             # Gọi service để lấy data
             sync_data = self.sync_service.get_user_sync_data(
                 user_id=current_user.id,
-                last_sync=last_sync
+                last_sync=last_sync,
+                cursor=cursor,
+                limit=limit
             )
             
             logger.info(f"User {current_user.id} requested sync data")
@@ -50,13 +67,18 @@ class SyncController:
                 sync_data=sync_payload
             )
             
-            # Phát broadcast đến các client khác
+            # Phát broadcast đến các client khác (item cập nhật bằng patch chỉ gửi diff)
             if current_app.socketio:
+                patched = {item['id']: item for item in result['patched']}
                 current_app.socketio.emit(
                     'data_updated',
                     {
                         'user_id': current_user.id,
-                        'data': result['updated_data'],
+                        'data': [
+                            item for item in result['updated_data']
+                            if item['id'] not in patched
+                        ],
+                        'patches': result['patched'],
                         'timestamp': result['timestamp']
                     },
                     room=f"user_{current_user.id}"
@@ -98,6 +120,7 @@ class SyncController:
         try:
             # Thực hiện force sync
             result = self.sync_service.force_full_sync(current_user.id)
+            result['snapshot']['url'] = url_for('sync.get_snapshot')
             
             # Broadcast thông báo force sync
             if current_app.socketio:
@@ -122,4 +145,79 @@ class SyncController:
             return self.response.error(
                 message="Lỗi khi thực hiện đồng bộ bắt buộc",
                 error=str(e)
-            )
\ No newline at end of file
+            )
+
+    def check_conflicts(self, current_user):
+        """Kiểm tra xung đột cho nhiều item trong một request"""
+        try:
+            payload = request.get_json()
+            
+            if not payload or not isinstance(payload.get('data'), list):
+                return self.response.error(message="Dữ liệu kiểm tra xung đột không hợp lệ")
+            
+            result = self.sync_service.get_sync_conflicts(
+                user_id=current_user.id,
+                client_data=payload['data']
+            )
+            
+            logger.info(f"User {current_user.id} checked {result['checked_count']} items for conflicts: {result['conflict_count']} found")
+            
+            return self.response.success(
+                data=result,
+                message="Kiểm tra xung đột thành công"
+            )
+            
+        except Exception as e:
+            logger.error(f"Error checking conflicts: {str(e)}")
+            return self.response.error(
+                message="Lỗi khi kiểm tra xung đột",
+                error=str(e)
+            )
+
+    def get_snapshot(self, current_user):
+        """Tải snapshot toàn bộ dữ liệu (gzip, có ETag theo content hash)"""
+        try:
+            snapshot_service = self.sync_service.snapshot_service
+            meta = snapshot_service.get_snapshot(current_user.id)
+            
+            headers = {
+                'ETag': f'"{meta["hash"]}"',
+                'X-Snapshot-Version': str(meta['version']),
+                'X-Sync-Cursor': self.sync_service.change_log.make_cursor(meta['version']),
+                'Cache-Control': 'private, no-cache',
+                'Vary': 'Accept-Encoding'
+            }
+            
+            # Client đã có đúng snapshot này
+            if meta['hash'] in request.if_none_match:
+                return Response(status=304, headers=headers)
+            
+            logger.info(f"User {current_user.id} downloaded snapshot v{meta['version']}")
+            
+            # Gửi thẳng file gzip nếu client hỗ trợ, không cần giải nén
+            if 'gzip' in request.accept_encodings:
+                response = send_file(
+                    snapshot_service.get_snapshot_path(meta),
+                    mimetype='application/json',
+                    conditional=False,
+                    etag=False
+                )
+                response.headers['Content-Encoding'] = 'gzip'
+                response.headers.update(headers)
+                return response
+            
+            response = Response(snapshot_service.iter_uncompressed(meta), mimetype='application/json')
+            response.headers.update(headers)
+            return response
+            
+        except Exception as e:
+            logger.error(f"Error getting snapshot: {str(e)}")
+            return self.response.error(
+                message="Lỗi khi lấy snapshot dữ liệu",
+                error=str(e)
+            )
+
+    def _wants_ndjson(self):
+        """Kiểm tra client có yêu cầu application/x-ndjson không"""
+        best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+        return best == 'application/x-ndjson'
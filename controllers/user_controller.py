@@ -1,11 +1,17 @@
 # Xử lý logic nghiệp vụ cho người dùng
 from flask import request, jsonify
-from flask_jwt_extended import create_access_token, get_jwt_identity, get_jwt
+from flask_jwt_extended import create_access_token, create_refresh_token, decode_token, get_jwt_identity, get_jwt
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import ExpiredSignatureError, InvalidTokenError
 from models.User import User
 from config.db import db
+from config.env import Config
 from utils.response_wrapper import ResponseWrapper
 from utils.logger import logger
-import bcrypt
+from services.principal_cache_service import principal_cache
+from services.password_service import password_service, PasswordPoolBusyError
+from services.token_revocation_service import token_revocation
+from datetime import timedelta
 
 class UserController:
     def __init__(self):
@@ -33,11 +39,8 @@ class UserController:
             if User.query.filter_by(email=email).first():
                 return self.response.error(message="Email đã được sử dụng")
             
-            # Hash password
-            hashed_password = bcrypt.hashpw(
-                password.encode('utf-8'), 
-                bcrypt.gensalt()
-            ).decode('utf-8')
+            # Hash password (trên pool hash riêng)
+            hashed_password = password_service.hash(password)
             
             # Tạo user mới
             new_user = User(
@@ -60,6 +63,9 @@ class UserController:
                 message="Đăng ký thành công"
             )
             
+        except PasswordPoolBusyError as e:
+            db.session.rollback()
+            return self._busy_response(e)
         except Exception as e:
             db.session.rollback()
             logger.error(f"Registration error: {str(e)}")
@@ -87,18 +93,22 @@ class UserController:
             if not user:
                 return self.response.error(message="Tài khoản không tồn tại")
             
-            # Verify password
-            if not bcrypt.checkpw(password.encode('utf-8'), user.password.encode('utf-8')):
+            # Verify password (trên pool hash riêng)
+            if not password_service.verify(password, user.password):
                 return self.response.error(message="Mật khẩu không đúng")
             
-            # Tạo JWT token
-            access_token = create_access_token(identity=user.id)
+            # Hash cũ (cost khác cấu hình) được hash lại khi đã có mật khẩu gốc
+            if password_service.needs_rehash(user.password):
+                self._rehash_password(user, password)
+            
+            # Tạo JWT token (kèm refresh token ở chế độ stateless)
+            tokens = self._issue_tokens(user)
             
             logger.info(f"User logged in: {username}")
             
             return self.response.success(
                 data={
-                    'access_token': access_token,
+                    **tokens,
                     'user': {
                         'id': user.id,
                         'username': user.username,
@@ -108,6 +118,8 @@ class UserController:
                 message="Đăng nhập thành công"
             )
             
+        except PasswordPoolBusyError as e:
+            return self._busy_response(e)
         except Exception as e:
             logger.error(f"Login error: {str(e)}")
             return self.response.error(
@@ -118,6 +130,12 @@ class UserController:
     def get_profile(self, current_user):
         """Lấy thông tin profile"""
         try:
+            # Principal dựng từ claims (stateless) không có email / created_at
+            if current_user.email is None:
+                current_user = principal_cache.get(current_user.id)
+                if not current_user:
+                    return self.response.error(message="Người dùng không tồn tại", status_code=404)
+            
             return self.response.success(
                 data={
                     'id': current_user.id,
@@ -143,35 +161,40 @@ class UserController:
             if not data:
                 return self.response.error(message="Không có dữ liệu để cập nhật")
             
+            # current_user là principal trong cache, cần bản ghi ORM để cập nhật
+            user = User.find_by_id(current_user.id)
+            if not user:
+                return self.response.error(message="Người dùng không tồn tại", status_code=404)
+            
             # Cập nhật các field được phép
             if 'email' in data:
                 # Kiểm tra email đã tồn tại
                 existing_user = User.query.filter_by(email=data['email']).first()
-                if existing_user and existing_user.id != current_user.id:
+                if existing_user and existing_user.id != user.id:
                     return self.response.error(message="Email đã được sử dụng")
-                current_user.email = data['email']
+                user.email = data['email']
             
             if 'password' in data:
                 # Hash password mới
-                hashed_password = bcrypt.hashpw(
-                    data['password'].encode('utf-8'), 
-                    bcrypt.gensalt()
-                ).decode('utf-8')
-                current_user.password = hashed_password
+                user.password = password_service.hash(data['password'])
             
             db.session.commit()
+            principal_cache.invalidate(user.id)
             
-            logger.info(f"User profile updated: {current_user.username}")
+            logger.info(f"User profile updated: {user.username}")
             
             return self.response.success(
                 data={
-                    'id': current_user.id,
-                    'username': current_user.username,
-                    'email': current_user.email
+                    'id': user.id,
+                    'username': user.username,
+                    'email': user.email
                 },
                 message="Cập nhật profile thành công"
             )
             
+        except PasswordPoolBusyError as e:
+            db.session.rollback()
+            return self._busy_response(e)
         except Exception as e:
             db.session.rollback()
             logger.error(f"Update profile error: {str(e)}")
@@ -180,11 +203,56 @@ class UserController:
                 error=str(e)
             )
 
+    def refresh(self, current_user):
+        """Đổi refresh token lấy cặp token mới (refresh token cũ bị thu hồi - xoay vòng)"""
+        try:
+            # Mỗi refresh token chỉ dùng được một lần, kể cả khi hai request gửi cùng lúc
+            if not token_revocation.consume(get_jwt()):
+                logger.warning(f"Refresh token reused: {current_user.username}")
+                return self.response.error(message="Refresh token đã được sử dụng", status_code=401)
+            
+            tokens = self._issue_tokens(current_user)
+            
+            logger.info(f"Tokens refreshed: {current_user.username}")
+            
+            return self.response.success(
+                data=tokens,
+                message="Làm mới token thành công"
+            )
+            
+        except Exception as e:
+            logger.error(f"Refresh token error: {str(e)}")
+            return self.response.error(
+                message="Lỗi khi làm mới token",
+                error=str(e)
+            )
+
     def logout(self, current_user):
         """Đăng xuất"""
         try:
-            # Trong JWT, logout thường chỉ cần client xóa token
-            # Có thể implement blacklist token nếu cần
+            # Refresh token gửi kèm (chế độ stateless) cũng bị thu hồi; kiểm tra trước
+            # để refresh token sai không làm đăng xuất nửa chừng
+            data = request.get_json(silent=True) or {}
+            refresh_payload = None
+            if data.get('refresh_token'):
+                try:
+                    refresh_payload = decode_token(data['refresh_token'])
+                except ExpiredSignatureError:
+                    # Đã hết hạn thì không dùng được nữa, không cần thu hồi
+                    refresh_payload = None
+                except (InvalidTokenError, JWTExtendedException):
+                    return self.response.error(message="refresh_token không hợp lệ")
+                
+                if refresh_payload is not None and (
+                    refresh_payload.get('type') != 'refresh'
+                    or str(refresh_payload.get('sub')) != str(current_user.id)
+                ):
+                    return self.response.error(message="refresh_token không hợp lệ")
+            
+            # Thu hồi token hiện tại phía server (các token khác của user vẫn dùng được)
+            token_revocation.revoke_token(get_jwt())
+            if refresh_payload is not None:
+                token_revocation.revoke_token(refresh_payload)
             
             logger.info(f"User logged out: {current_user.username}")
             
@@ -204,11 +272,29 @@ class UserController:
         try:
             # Xóa tất cả data của user trước
             from models.AppData import AppData
+            from models.ChangeLog import ChangeLog
+            from models.UserStats import UserStats
+            from models.IdempotencyKey import IdempotencyKey
             AppData.query.filter_by(user_id=current_user.id).delete()
+            ChangeLog.delete_by_user(current_user.id)
+            UserStats.delete_by_user(current_user.id)
+            IdempotencyKey.delete_by_user(current_user.id)
+            
+            user_id = current_user.id
             
-            # Xóa user
-            db.session.delete(current_user)
+            # Xóa user (current_user là principal trong cache, xóa theo id)
+            User.query.filter_by(id=user_id).delete()
             db.session.commit()
+            principal_cache.invalidate(user_id)
+            
+            # Mọi token đã cấp cho tài khoản này không còn dùng được (kể cả khi id được cấp lại)
+            token_revocation.revoke_user(user_id)
+            
+            # Xóa snapshot dữ liệu trên đĩa và cache đọc
+            from services.snapshot_service import SnapshotService
+            from services.data_cache_service import data_cache
+            SnapshotService().delete(user_id)
+            data_cache.invalidate_user(user_id)
             
             logger.info(f"User account deleted: {current_user.username}")
             
@@ -222,4 +308,47 @@ class UserController:
             return self.response.error(
                 message="Lỗi khi xóa tài khoản",
                 error=str(e)
-            )
\ No newline at end of file
+            )
+
+    def _issue_tokens(self, user):
+        """Cấp token cho user (User hoặc principal)
+
+        Chế độ stateless: access token ngắn hạn mang claims username / role để
+        token_required không cần đọc database, kèm refresh token dài hạn.
+        """
+        if not Config.AUTH_STATELESS:
+            return {'access_token': create_access_token(identity=user.id)}
+        
+        return {
+            'access_token': create_access_token(
+                identity=user.id,
+                additional_claims={'username': user.username, 'role': user.role},
+                expires_delta=timedelta(seconds=Config.AUTH_STATELESS_ACCESS_EXPIRES)
+            ),
+            'refresh_token': create_refresh_token(identity=user.id),
+            'expires_in': Config.AUTH_STATELESS_ACCESS_EXPIRES
+        }
+
+    def _rehash_password(self, user, password):
+        """Nâng hash của user lên cost hiện tại; lỗi (kể cả pool bận) không làm hỏng đăng nhập"""
+        try:
+            user.password = password_service.hash(password)
+            db.session.commit()
+            password_service.record_rehash()
+            logger.info(f"Password rehashed: {user.username}")
+        except PasswordPoolBusyError:
+            db.session.rollback()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Password rehash error: {str(e)}")
+
+    def _busy_response(self, error):
+        """503 + Retry-After khi pool hash mật khẩu đang đầy"""
+        logger.warning(f"Password hash pool busy: {request.method} {request.path} - {str(error)}")
+        body, status_code = self.response.error(
+            message="Máy chủ đang bận, vui lòng thử lại sau",
+            status_code=503,
+            error_code="PASSWORD_POOL_BUSY"
+        )
+        body.headers['Retry-After'] = '1'
+        return body, status_code
@@ -3,8 +3,10 @@ from functools import wraps
 from flask import request, jsonify, current_app
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
 from models.User import User
+from services.principal_cache_service import principal_cache
 from utils.logger import logger
 from utils.response_wrapper import ResponseWrapper
+from utils.rate_limiter import RateLimit, RateLimiter, MemoryRateLimitBackend
 from datetime import datetime, timedelta
 
 def token_required(f):
@@ -25,8 +27,8 @@ def token_required(f):
                     status_code=401
                 )
             
-            # Tìm user trong database
-            current_user = User.find_by_id(current_user_id)
+            # Principal từ claims của token (stateless) hoặc cache principal (query database khi miss)
+            current_user = principal_cache.resolve(current_user_id, get_jwt())
             
             if not current_user:
                 response = ResponseWrapper()
@@ -51,6 +53,38 @@ def token_required(f):
     
     return decorated_function
 
+def refresh_token_required(f):
+    """Decorator yêu cầu refresh token hợp lệ (endpoint làm mới token)
+
+    User luôn được đọc lại (cache principal / database) để token mới mang
+    claims hiện tại và tài khoản đã xóa không làm mới được.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        try:
+            verify_jwt_in_request(refresh=True)
+            
+            current_user = principal_cache.get(get_jwt_identity())
+            
+            if not current_user:
+                response = ResponseWrapper()
+                return response.error(
+                    message="Người dùng không tồn tại",
+                    status_code=401
+                )
+            
+            return f(current_user, *args, **kwargs)
+            
+        except Exception as e:
+            logger.error(f"Refresh token error: {str(e)}")
+            response = ResponseWrapper()
+            return response.error(
+                message="Refresh token không hợp lệ",
+                status_code=401
+            )
+    
+    return decorated_function
+
 def admin_required(f):
     """Decorator yêu cầu quyền admin (nếu có hệ thống role)"""
     @wraps(f)
@@ -59,7 +93,7 @@ def admin_required(f):
             verify_jwt_in_request()
             
             current_user_id = get_jwt_identity()
-            current_user = User.find_by_id(current_user_id)
+            current_user = principal_cache.resolve(current_user_id, get_jwt())
             
             if not current_user:
                 response = ResponseWrapper()
@@ -68,9 +102,8 @@ def admin_required(f):
                     status_code=401
                 )
             
-            # Kiểm tra role admin (có thể mở rộng thêm field role trong User model)
-            # Hiện tại chỉ kiểm tra user_id = 1 là admin
-            if current_user.id != 1:
+            # Kiểm tra role admin (User.role: hiện tại user_id = 1 là admin)
+            if current_user.role != User.ROLE_ADMIN:
                 response = ResponseWrapper()
                 return response.error(
                     message="Không có quyền truy cập",
@@ -103,7 +136,7 @@ def optional_auth(f):
             
             current_user_id = get_jwt_identity()
             if current_user_id:
-                current_user = User.find_by_id(current_user_id)
+                current_user = principal_cache.resolve(current_user_id, get_jwt())
                 
                 if current_user:
                     logger.info(f"Optional auth request: {request.method} {request.path} - User: {current_user.username}")
@@ -122,37 +155,29 @@ def optional_auth(f):
     return decorated_function
 
 def rate_limit_middleware(max_requests=100, per_minutes=60):
-    """Middleware giới hạn số request (đơn giản)"""
-    request_counts = {}
+    """Middleware giới hạn số request theo IP cho một endpoint (token bucket)
+
+    Giới hạn chung cho cả app được cấu hình trong middlewares/rate_limit.py;
+    decorator này dùng khi một endpoint cần giới hạn riêng.
+    """
+    limit = RateLimit(max_requests, per_minutes * 60)
+    limiter = RateLimiter(MemoryRateLimitBackend(shards=16))
     
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            from datetime import datetime, timedelta
-            
             # Lấy IP address
-            client_ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
-            current_time = datetime.utcnow()
-            
-            # Làm sạch dữ liệu cũ
-            cutoff_time = current_time - timedelta(minutes=per_minutes)
-            request_counts[client_ip] = [
-                req_time for req_time in request_counts.get(client_ip, [])
-                if req_time > cutoff_time
-            ]
-            
-            # Kiểm tra số lượng request
-            if len(request_counts.get(client_ip, [])) >= max_requests:
+            client_ip = request.remote_addr
+            
+            result = limiter.hit(client_ip, limit)
+            if not result.allowed:
                 response = ResponseWrapper()
-                return response.error(
+                body, status_code = response.error(
                     message=f"Quá nhiều request. Giới hạn {max_requests} request/{per_minutes} phút",
                     status_code=429
                 )
-            
-            # Thêm request hiện tại
-            if client_ip not in request_counts:
-                request_counts[client_ip] = []
-            request_counts[client_ip].append(current_time)
+                body.headers['Retry-After'] = str(result.retry_after)
+                return body, status_code
             
             return f(*args, **kwargs)
         
@@ -0,0 +1,196 @@
+# Nén response theo Accept-Encoding (gzip, deflate, brotli nếu có)
+import threading
+import zlib
+from flask import request
+from utils.logger import logger
+
+try:
+    import brotli
+except ImportError:  # brotli là optional
+    brotli = None
+
+# Các mimetype nên nén (JSON API, NDJSON stream, text)
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'application/xml',
+}
+
+class CompressionStats:
+    """Thống kê số byte tiết kiệm được nhờ nén (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.responses = 0
+            self.bytes_in = 0
+            self.bytes_out = 0
+            self.by_encoding = {}
+
+    def record(self, encoding, bytes_in, bytes_out):
+        with self._lock:
+            self.responses += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.by_encoding[encoding] = self.by_encoding.get(encoding, 0) + 1
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'responses': self.responses,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'bytes_saved': self.bytes_in - self.bytes_out,
+                'ratio': round(self.bytes_in / self.bytes_out, 2) if self.bytes_out else None,
+                'by_encoding': dict(self.by_encoding)
+            }
+
+compression_stats = CompressionStats()
+
+class _Compressor:
+    """Bọc compressor của từng encoding với cùng interface compress/flush/finish"""
+
+    def __init__(self, encoding, level, brotli_quality):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._obj = brotli.Compressor(quality=brotli_quality)
+        elif encoding == 'gzip':
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        else:
+            # HTTP 'deflate' là định dạng zlib (RFC 1950)
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._obj.process(data)
+        return self._obj.compress(data)
+
+    def flush(self):
+        """Đẩy dữ liệu đang buffer ra ngay (dùng cho streaming)"""
+        if self.encoding == 'br':
+            return self._obj.flush()
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._obj.finish()
+        return self._obj.flush(zlib.Z_FINISH)
+
+def supported_encodings():
+    """Các encoding server hỗ trợ, theo thứ tự ưu tiên"""
+    if brotli is not None:
+        return ['br', 'gzip', 'deflate']
+    return ['gzip', 'deflate']
+
+def negotiate_encoding(accept_encodings):
+    """Chọn encoding tốt nhất theo header Accept-Encoding (None nếu không có)"""
+    return accept_encodings.best_match(supported_encodings())
+
+def register_compression(app):
+    """Đăng ký middleware nén response cho Flask app"""
+    if not app.config.get('COMPRESSION_ENABLED', True):
+        logger.info("Response compression disabled")
+        return
+
+    min_size = app.config.get('COMPRESSION_MIN_SIZE', 500)
+    level = app.config.get('COMPRESSION_LEVEL', 6)
+    brotli_quality = app.config.get('COMPRESSION_BROTLI_QUALITY', 4)
+    streaming = app.config.get('COMPRESSION_STREAMING', True)
+
+    @app.after_request
+    def compress_response(response):
+        if not _should_compress(response, streaming):
+            return response
+
+        response.vary.add('Accept-Encoding')
+
+        encoding = negotiate_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            return _compress_stream(response, _Compressor(encoding, level, brotli_quality))
+
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        compressor = _Compressor(encoding, level, brotli_quality)
+        compressed = compressor.compress(data) + compressor.finish()
+        if len(compressed) >= len(data):
+            return response
+
+        response.set_data(compressed)
+        _mark_encoded(response, encoding)
+        compression_stats.record(encoding, len(data), len(compressed))
+
+        logger.debug(
+            f"Compressed {request.method} {request.path} ({encoding}): "
+            f"{len(data)} -> {len(compressed)} bytes"
+        )
+        return response
+
+    logger.info(f"Response compression enabled ({', '.join(supported_encodings())}, level {level}, min {min_size} bytes)")
+
+def _should_compress(response, streaming):
+    """Chỉ nén response thành công, có nội dung, chưa được encode"""
+    if request.method == 'HEAD':
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    if response.direct_passthrough:
+        # File gửi bằng send_file
+        return False
+    if response.is_streamed and not streaming:
+        return False
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES
+
+def _mark_encoded(response, encoding):
+    response.headers['Content-Encoding'] = encoding
+    # Nội dung đã đổi nên ETag mạnh không còn đúng byte-cho-byte
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+def _compress_stream(response, compressor):
+    """Nén response streaming theo từng chunk (flush sau mỗi chunk để client nhận ngay)"""
+    source = response.response
+    encoding = compressor.encoding
+
+    def generate():
+        bytes_in = 0
+        bytes_out = 0
+        try:
+            for chunk in source:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                if not chunk:
+                    continue
+                bytes_in += len(chunk)
+                data = compressor.compress(chunk) + compressor.flush()
+                bytes_out += len(data)
+                yield data
+            tail = compressor.finish()
+            bytes_out += len(tail)
+            yield tail
+        finally:
+            if hasattr(source, 'close'):
+                source.close()
+            compression_stats.record(encoding, bytes_in, bytes_out)
+
+    response.response = generate()
+    response.headers.pop('Content-Length', None)
+    _mark_encoded(response, encoding)
+    return response
+
+__all__ = [
+    'register_compression', 'negotiate_encoding', 'supported_encodings',
+    'compression_stats', 'CompressionStats'
+]
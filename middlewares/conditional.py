@@ -0,0 +1,59 @@
+# Conditional GET (ETag / If-None-Match / Last-Modified) theo version dữ liệu của user
+import hashlib
+from functools import wraps
+from flask import request, current_app, make_response
+from models.ChangeLog import ChangeLog
+from services.data_cache_service import data_cache
+
+def make_data_etag(user_id, version):
+    """ETag mạnh từ version dữ liệu của user và URL / định dạng được yêu cầu
+
+    Không cần serialize body: cùng user, cùng version, cùng request thì cùng nội dung.
+    """
+    variant = f"{user_id}|{request.full_path}|{request.headers.get('Accept', '')}"
+    digest = hashlib.sha1(variant.encode('utf-8')).hexdigest()[:16]
+    return f"v{version}-{digest}"
+
+def is_not_modified(etag, last_modified):
+    """Kiểm tra If-None-Match (ưu tiên) rồi If-Modified-Since"""
+    if request.if_none_match:
+        # So sánh weak theo RFC 7232 cho GET (ETag có thể bị hạ thành weak khi nén)
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+def conditional_get(f):
+    """Decorator trả 304 Not Modified khi dữ liệu của user chưa thay đổi
+
+    Dùng sau @token_required. Version là seq mới nhất trong change log của
+    user (một lookup trên index), được đọc trước khi xử lý request nên nếu
+    có ghi đồng thời thì ETag chỉ có thể cũ hơn body, không bao giờ mới hơn.
+    Cache dữ liệu dùng đúng version này làm key nên body không thể đến từ
+    entry cũ hơn ETag (kể cả entry của worker khác).
+    """
+    @wraps(f)
+    def decorated_function(current_user, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return f(current_user, *args, **kwargs)
+
+        version, last_modified = ChangeLog.get_latest(current_user.id)
+        etag = make_data_etag(current_user.id, version)
+        data_cache.remember_version(current_user.id, version)
+
+        if is_not_modified(etag, last_modified):
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(f(current_user, *args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        # Client phải xác thực lại mỗi lần, response không được chia sẻ giữa các user
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Authorization')
+        return response
+
+    return decorated_function
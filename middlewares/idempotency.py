@@ -0,0 +1,75 @@
+# Decorator chống xử lý lặp request ghi theo header Idempotency-Key
+from functools import wraps
+from flask import request, current_app, make_response
+from services.idempotency_service import IdempotencyService
+from utils.logger import logger
+from utils.response_wrapper import ResponseWrapper
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+idempotency_service = IdempotencyService()
+
+def idempotent(f):
+    """Decorator trả lại kết quả đã lưu khi client gửi lại request cùng Idempotency-Key
+
+    Dùng sau @token_required (cần current_user). Request không có header
+    được xử lý bình thường.
+    """
+    @wraps(f)
+    def decorated_function(current_user, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return f(current_user, *args, **kwargs)
+
+        response = ResponseWrapper()
+        if not idempotency_service.is_valid_key(key):
+            return response.error(
+                message="Idempotency-Key không hợp lệ",
+                status_code=400
+            )
+
+        request_hash = idempotency_service.hash_request(request.method, request.path, request.get_data())
+        state, record = idempotency_service.begin_request(current_user.id, key, request_hash)
+
+        if state == IdempotencyService.STATE_COMPLETED:
+            logger.info(f"Idempotent replay: {request.method} {request.path} - User: {current_user.id}")
+            replay = current_app.response_class(
+                record.response,
+                status=record.status_code,
+                mimetype='application/json'
+            )
+            replay.headers[REPLAYED_HEADER] = 'true'
+            return replay
+
+        if state == IdempotencyService.STATE_MISMATCH:
+            return response.error(
+                message="Idempotency-Key đã được dùng cho một request khác",
+                status_code=422,
+                error_code="IDEMPOTENCY_KEY_REUSED"
+            )
+
+        if state == IdempotencyService.STATE_IN_PROGRESS:
+            return response.conflict(message="Request với Idempotency-Key này đang được xử lý")
+
+        # STATE_NEW: record là thời điểm giữ chỗ của request này
+        reserved_at = record
+        try:
+            result = make_response(f(current_user, *args, **kwargs))
+        except Exception:
+            idempotency_service.release_request(current_user.id, key, reserved_at)
+            raise
+
+        # Chỉ lưu kết quả thành công (2xx). Controller trả lỗi (mặc định 400) cả khi
+        # bắt exception tạm thời (database is locked...) và đã rollback, nên request
+        # lỗi không để lại thay đổi: client thử lại sẽ được xử lý lại thay vì nhận lỗi cũ
+        if not 200 <= result.status_code < 300 or result.is_streamed:
+            idempotency_service.release_request(current_user.id, key, reserved_at)
+        else:
+            idempotency_service.complete_request(
+                current_user.id, key, reserved_at, result.status_code, result.get_data(as_text=True)
+            )
+
+        return result
+
+    return decorated_function
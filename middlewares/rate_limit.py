@@ -0,0 +1,141 @@
+# Giới hạn tần suất request theo user / IP và theo route (token bucket, chính sách đọc từ config)
+from flask import request, g
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from utils.rate_limiter import (
+    RateLimiter, MemoryRateLimitBackend, SQLiteRateLimitBackend, parse_rate_limit, parse_rate_limit_map
+)
+from utils.response_wrapper import ResponseWrapper
+from utils.logger import logger, security_logger
+
+# Không giới hạn health check và Socket.IO
+EXEMPT_PATHS = ('/socket.io',)
+EXEMPT_ENDPOINTS = ('health_check', 'static')
+
+HTTP_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE'}
+
+class RateLimitPolicies:
+    """Chính sách giới hạn của một request
+
+    - Giới hạn theo client: RATE_LIMIT_DEFAULT cho mọi user / IP, ghi đè theo
+      user id bằng RATE_LIMIT_USERS ('1=10000 per hour; 7=50 per minute').
+    - Giới hạn theo route (thêm vào giới hạn client): RATE_LIMIT_ROUTES
+      ('POST /api/user/login=10 per minute; /api/data/batch=30 per minute'),
+      path khớp theo tiền tố, tiền tố dài nhất thắng; bucket vẫn riêng cho từng client.
+    """
+
+    def __init__(self, default, users=None, routes=None):
+        self.default = default
+        self.users = dict(users or {})
+        # [(method hoặc None, path prefix, RateLimit)], tiền tố dài xét trước
+        self.routes = sorted(routes or [], key=lambda route: len(route[1]), reverse=True)
+
+    @classmethod
+    def from_config(cls, config):
+        users = {
+            str(int(user_id)): limit
+            for user_id, limit in parse_rate_limit_map(config.get('RATE_LIMIT_USERS'))
+        }
+        routes = []
+        for target, limit in parse_rate_limit_map(config.get('RATE_LIMIT_ROUTES')):
+            method, _, path = target.partition(' ')
+            if not path:
+                method, path = None, method
+            elif method.upper() not in HTTP_METHODS:
+                raise ValueError(f"Invalid rate limit route '{target}'")
+            routes.append((method.upper() if method else None, path.strip(), limit))
+        return cls(parse_rate_limit(config.get('RATE_LIMIT_DEFAULT')), users, routes)
+
+    def for_request(self, method, path, user_id):
+        """Các (tên bucket, RateLimit) áp cho request"""
+        policies = []
+        for route_method, prefix, limit in self.routes:
+            if (route_method is None or route_method == method) and path.startswith(prefix):
+                policies.append((f"route:{route_method or '*'} {prefix}", limit))
+                break
+
+        if user_id is not None and user_id in self.users:
+            policies.append((f"user:{user_id}", self.users[user_id]))
+        else:
+            policies.append(('default', self.default))
+        return policies
+
+def create_rate_limiter(storage):
+    """RATE_LIMIT_STORAGE: 'memory' (mỗi process) hoặc 'sqlite:///path' (dùng chung giữa các process)"""
+    if storage.startswith('sqlite:///'):
+        return RateLimiter(SQLiteRateLimitBackend(storage[len('sqlite:///'):]))
+    if storage != 'memory':
+        logger.warning(f"Unknown rate limit storage '{storage}', using memory")
+    return RateLimiter(MemoryRateLimitBackend())
+
+def _client_key(trust_proxy):
+    """Khóa client: user id nếu có access token hợp lệ, ngược lại địa chỉ IP"""
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+        if identity is not None:
+            return str(identity), f"user:{identity}"
+    except Exception:
+        pass  # Token sai / hết hạn: tính theo IP, endpoint tự trả 401
+
+    address = request.access_route[0] if trust_proxy and request.access_route else request.remote_addr
+    return None, f"ip:{address}"
+
+# Limiter của app (None khi tắt rate limit)
+rate_limiter = None
+
+def register_rate_limit(app):
+    """Đăng ký kiểm tra rate limit cho mọi request của app"""
+    global rate_limiter
+
+    if not app.config.get('RATE_LIMIT_ENABLED', True):
+        logger.info("Rate limiting disabled")
+        return None
+
+    policies = RateLimitPolicies.from_config(app.config)
+    limiter = rate_limiter = create_rate_limiter(app.config.get('RATE_LIMIT_STORAGE', 'memory'))
+    trust_proxy = app.config.get('RATE_LIMIT_TRUST_PROXY', False)
+
+    @app.before_request
+    def check_rate_limit():
+        if request.method == 'OPTIONS' or request.endpoint in EXEMPT_ENDPOINTS \
+                or request.path.startswith(EXEMPT_PATHS):
+            return None
+
+        user_id, client = _client_key(trust_proxy)
+        # Bucket nào từ chối thì token đã lấy ở bucket trước được trả lại
+        results = limiter.hit_all([
+            (f"{name}|{client}", limit)
+            for name, limit in policies.for_request(request.method, request.path, user_id)
+        ])
+        if results[-1].allowed:
+            # Header báo giới hạn chặt nhất (còn ít request nhất)
+            result = min(results, key=lambda current: current.remaining)
+        else:
+            result = results[-1]
+        g.rate_limit = result
+
+        if not result.allowed:
+            security_logger.log_rate_limit_exceeded(client, f"{request.method} {request.path}")
+            body, status_code = ResponseWrapper().rate_limit_exceeded(
+                message=f"Quá nhiều request. Giới hạn {result.limit} request, thử lại sau {result.retry_after} giây"
+            )
+            body.headers['Retry-After'] = str(result.retry_after)
+            return body, status_code
+        return None
+
+    @app.after_request
+    def add_rate_limit_headers(response):
+        result = g.get('rate_limit')
+        if result is not None:
+            response.headers['X-RateLimit-Limit'] = str(result.limit)
+            response.headers['X-RateLimit-Remaining'] = str(result.remaining)
+        return response
+
+    logger.info(f"Rate limiting enabled: {policies.default} per client, {len(policies.routes)} route policies")
+    return limiter
+
+def rate_limit_stats():
+    """Thống kê rate limit (None khi tắt)"""
+    return rate_limiter.stats() if rate_limiter is not None else None
+
+__all__ = ['RateLimitPolicies', 'create_rate_limiter', 'register_rate_limit', 'rate_limit_stats']
@@ -1,21 +1,42 @@
 # Mô hình dữ liệu App Data
 from config.db import db
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, Computed, select, event, tuple_, func, distinct, text
 from sqlalchemy.orm import relationship
+from models.AppDataAttribute import AppDataAttribute
+from utils.serializer import format_datetime, select_columns, get_row_serializer
+from utils.blob_store import ExternalText, BLOB_MARKER_PREFIX, HASH_LENGTH
+import hashlib
+import json
 
 class AppData(db.Model):
     """Model cho bảng app_data"""
     __tablename__ = 'app_data'
+    __table_args__ = (
+        # Index theo access path: lọc user_id (+ type), sắp xếp theo created_at / updated_at
+        Index('ix_app_data_user_created', 'user_id', 'created_at', 'id'),
+        Index('ix_app_data_user_type_created', 'user_id', 'type', 'created_at', 'id'),
+        Index('ix_app_data_user_updated', 'user_id', 'updated_at'),
+        # Các blob còn được tham chiếu (GC đọc index này thay vì quét content)
+        Index('ix_app_data_content_blob', 'content_blob', sqlite_where=text('content_blob IS NOT NULL')),
+    )
+    
+    # Hash blob trích từ tham chiếu '@blob:sha256:<hash>:<len>' trong content
+    CONTENT_BLOB_EXPRESSION = (
+        f"CASE WHEN substr(content, 1, {len(BLOB_MARKER_PREFIX)}) = '{BLOB_MARKER_PREFIX}' "
+        f"THEN substr(content, {len(BLOB_MARKER_PREFIX) + 1}, {HASH_LENGTH}) END"
+    )
     
     # Các cột
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
     type = Column(String(50), nullable=False, index=True)  # Loại dữ liệu: note, task, message, etc.
     title = Column(String(200), nullable=True)
-    content = Column(Text, nullable=False)  # Nội dung chính (JSON string hoặc text)
+    content = Column(ExternalText, nullable=False)  # Nội dung chính (JSON string hoặc text); lớn thì nằm trong blob store
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    content_hash = Column(String(64), nullable=True)  # Version/ETag: sha256 của (type, title, content)
+    content_blob = Column(String(64), Computed(CONTENT_BLOB_EXPRESSION, persisted=False))  # Cột ảo: hash blob hoặc NULL
     
     def __init__(self, user_id, type, content, title=None):
         """Khởi tạo AppData"""
@@ -28,6 +49,12 @@ class AppData(db.Model):
         """String representation"""
         return f'<AppData {self.id}: {self.type}>'
     
+    @staticmethod
+    def compute_hash(data_type, title, content):
+        """Tính content hash (version) của item, không phụ thuộc thời gian"""
+        canonical = json.dumps([data_type, title, content], ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    
     def to_dict(self):
         """Chuyển đổi object thành dictionary"""
         return {
@@ -36,8 +63,9 @@ class AppData(db.Model):
             'type': self.type,
             'title': self.title,
             'content': self.content,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'created_at': format_datetime(self.created_at),
+            'updated_at': format_datetime(self.updated_at),
+            'content_hash': self.content_hash
         }
     
     def to_sync_dict(self):
@@ -47,33 +75,256 @@ class AppData(db.Model):
             'type': self.type,
             'title': self.title,
             'content': self.content,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'created_at': format_datetime(self.created_at),
+            'updated_at': format_datetime(self.updated_at),
+            'content_hash': self.content_hash
         }
     
+    @classmethod
+    def row_to_sync_dict(cls, row):
+        """Chuyển row (Core select từ sync_columns) thành dict đồng bộ"""
+        return cls.serializer_for().serialize(row)
+    
+    # Các field client có thể chọn qua tham số fields= (cũng là thứ tự của sync_columns)
+    FIELDS = ('id', 'type', 'title', 'content', 'created_at', 'updated_at', 'content_hash')
+    
+    # Projection mặc định cho danh sách: không đọc cột content
+    SUMMARY_FIELDS = ('id', 'type', 'title', 'created_at', 'updated_at')
+    
+    DATETIME_FIELDS = ('created_at', 'updated_at')
+    
+    @classmethod
+    def field_names(cls, fields=None):
+        """Tên các cột (theo thứ tự) mà columns_for(fields) select"""
+        if fields is None:
+            return cls.FIELDS
+        return ('id', 'created_at') + tuple(name for name in fields if name not in ('id', 'created_at'))
+    
+    @classmethod
+    def columns_for(cls, fields=None):
+        """Các cột cần select cho danh sách field (luôn gồm id, created_at để phân trang)
+        
+        Cột datetime được đọc dạng text (xem utils.serializer.select_columns).
+        """
+        return select_columns([getattr(cls, name) for name in cls.field_names(fields)])
+    
+    @classmethod
+    def sync_columns(cls):
+        """Các cột cần cho dữ liệu đồng bộ"""
+        return cls.columns_for(None)
+    
+    @classmethod
+    def serializer_for(cls, fields=None, output=None):
+        """RowSerializer cho row select từ columns_for(fields), trả về các field output (mặc định = fields)"""
+        return get_row_serializer(
+            cls.field_names(fields),
+            tuple(output or fields or cls.FIELDS),
+            cls.DATETIME_FIELDS
+        )
+    
+    @classmethod
+    def find_user_rows_after(cls, user_id, after_id, limit, updated_since=None):
+        """Đọc tối đa `limit` row của user có id > after_id (keyset theo id)"""
+        return db.session.execute(cls.rows_after_statement(user_id, after_id, limit, updated_since)).all()
+    
+    @classmethod
+    def rows_after_statement(cls, user_id, after_id, limit, updated_since=None):
+        """Câu select keyset theo id của find_user_rows_after"""
+        query = select(*cls.sync_columns()).where(
+            cls.user_id == user_id,
+            cls.id > after_id
+        )
+        if updated_since is not None:
+            query = query.where(cls.updated_at > updated_since)
+        
+        return query.order_by(cls.id).limit(limit)
+    
+    @classmethod
+    def iter_user_rows(cls, user_id, chunk_size=500, updated_since=None):
+        """Đọc data của user theo từng chunk (keyset theo id, không hydrate ORM)"""
+        last_id = 0
+        while True:
+            rows = cls.find_user_rows_after(user_id, last_id, chunk_size, updated_since=updated_since)
+            if not rows:
+                break
+            
+            yield rows
+            
+            if len(rows) < chunk_size:
+                break
+            last_id = rows[-1].id
+    
+    @classmethod
+    def select_statement(cls, columns, user_id, data_type=None, where=None):
+        """Câu select data của user (+ type, + where) và cặp cột vị trí (created_at, id)
+        
+        where là ((path, (values...)), ...) trên các JSON path đã index. Khi có
+        where, câu select đi từ bảng app_data_attributes (index lookup theo
+        user, type, path, value đã sắp xếp sẵn theo created_at) rồi đọc
+        app_data theo rowid; app_data không có điều kiện nào khác nên planner
+        không thể chọn duyệt toàn bộ item cùng type, kể cả khi thống kê cũ.
+        """
+        if not where:
+            query = select(*columns).where(cls.user_id == user_id)
+            if data_type:
+                query = query.where(cls.type == data_type)
+            return query, (cls.created_at, cls.id)
+        
+        match = AppDataAttribute.__table__.alias('match')
+        query = select(*columns)\
+            .select_from(match.join(cls.__table__, cls.id == match.c.data_id))\
+            .where(*AppDataAttribute.match_conditions(match, user_id, data_type, where))
+        if AppDataAttribute.may_repeat(where):
+            query = query.distinct()
+        return query, (match.c.created_at, match.c.data_id)
+    
+    @classmethod
+    def list_statement(cls, user_id, data_type=None, fields=None, where=None):
+        """Câu select danh sách data của user (mới nhất trước, không hydrate ORM)"""
+        query, (created_at, data_id) = cls.select_statement(cls.columns_for(fields), user_id, data_type, where)
+        return query.order_by(created_at.desc(), data_id.desc())
+    
+    @classmethod
+    def count_statement(cls, user_id, data_type, where):
+        """Câu đếm số item khớp các điều kiện where (chỉ đọc index app_data_attributes)"""
+        match = AppDataAttribute.__table__.alias('match')
+        total = func.count(distinct(match.c.data_id)) if AppDataAttribute.may_repeat(where) else func.count()
+        return select(total).select_from(match)\
+            .where(*AppDataAttribute.match_conditions(match, user_id, data_type, where))
+    
+    @classmethod
+    def page_statement(cls, user_id, limit, after=None, before=None, data_type=None, fields=None, where=None):
+        """Câu select một trang keyset theo (created_at, id)
+        
+        So sánh row value (created_at, id) để SQLite dùng range trên index
+        ix_app_data_user_created / ix_app_data_user_type_created (hoặc
+        ix_app_data_attributes_lookup khi có where).
+        """
+        query, (created_at, data_id) = cls.select_statement(cls.columns_for(fields), user_id, data_type, where)
+        
+        position = tuple_(created_at, data_id)
+        if before is not None:
+            # Trang trước: đọc ngược (asc) rồi đảo lại
+            query = query.where(position > tuple_(*before))\
+                         .order_by(created_at.asc(), data_id.asc())
+        else:
+            if after is not None:
+                query = query.where(position < tuple_(*after))
+            query = query.order_by(created_at.desc(), data_id.desc())
+        
+        return query.limit(limit)
+    
+    @classmethod
+    def find_user_page(cls, user_id, limit, after=None, before=None, data_type=None, fields=None, where=None):
+        """Đọc một trang data của user theo keyset (created_at desc, id desc)
+        
+        `after` / `before` là tuple (created_at, id) của item cuối / đầu trang
+        trước đó. Đọc limit + 1 row để biết còn trang tiếp theo hay không;
+        trả về (rows, has_more) với rows luôn theo thứ tự mới nhất trước.
+        """
+        query = cls.page_statement(user_id, limit + 1, after=after, before=before, data_type=data_type,
+                                   fields=fields, where=where)
+        rows = db.session.execute(query).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if before is not None:
+            rows.reverse()
+        return rows, has_more
+    
+    @classmethod
+    def iter_rows_by_ids(cls, user_id, data_ids, chunk_size=500):
+        """Đọc các row theo danh sách ID của user, theo từng chunk"""
+        ids = sorted(set(data_ids))
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            rows = db.session.execute(
+                select(*cls.sync_columns())
+                .where(cls.user_id == user_id, cls.id.in_(chunk))
+                .order_by(cls.id)
+            ).all()
+            if rows:
+                yield rows
+    
     @classmethod
     def find_by_id(cls, data_id):
         """Tìm data theo ID"""
         return cls.query.get(data_id)
     
+    @classmethod
+    def find_by_ids(cls, data_ids, chunk_size=500):
+        """Tìm nhiều data theo danh sách ID (một truy vấn IN cho mỗi chunk)"""
+        ids = list(dict.fromkeys(data_ids))
+        items = []
+        # SQLite giới hạn số tham số mỗi câu lệnh nên chia nhỏ danh sách
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            items.extend(cls.query.filter(cls.id.in_(chunk)).all())
+        return items
+    
+    @classmethod
+    def find_versions(cls, user_id, data_ids, chunk_size=500):
+        """Lấy version (content_hash, updated_at) của nhiều item, không đọc content"""
+        ids = list(dict.fromkeys(data_ids))
+        versions = {}
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            rows = db.session.execute(
+                select(cls.id, cls.content_hash, cls.updated_at)
+                .where(cls.user_id == user_id, cls.id.in_(chunk))
+            ).all()
+            for row in rows:
+                versions[row.id] = row
+        return versions
+    
+    @classmethod
+    def find_types(cls, user_id, data_ids, chunk_size=500):
+        """Lấy type của các item thuộc user, trả về dict id -> type"""
+        ids = sorted(set(data_ids))
+        types = {}
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            # Chỉ lọc theo id (tra rowid) rồi kiểm tra user ở Python: lọc cả user_id trong SQL
+            # thì SQLite có thể chọn quét cả phần covering index của user (có sẵn type)
+            for row in db.session.execute(
+                select(cls.id, cls.type, cls.user_id).where(cls.id.in_(chunk))
+            ):
+                if row.user_id == user_id:
+                    types[row.id] = row.type
+        return types
+    
     @classmethod
     def find_by_user_id(cls, user_id):
         """Tìm tất cả data của user"""
-        return cls.query.filter_by(user_id=user_id).order_by(cls.created_at.desc()).all()
+        return cls.query_by_user_id(user_id).all()
+    
+    @classmethod
+    def query_by_user_id(cls, user_id):
+        """Query của find_by_user_id"""
+        return cls.query.filter_by(user_id=user_id).order_by(cls.created_at.desc())
     
     @classmethod
     def find_by_user_and_type(cls, user_id, data_type):
         """Tìm data theo user và type"""
+        return cls.query_by_user_and_type(user_id, data_type).all()
+    
+    @classmethod
+    def query_by_user_and_type(cls, user_id, data_type):
+        """Query của find_by_user_and_type"""
         return cls.query.filter_by(user_id=user_id, type=data_type)\
-                      .order_by(cls.created_at.desc()).all()
+                      .order_by(cls.created_at.desc())
     
     @classmethod
     def find_by_user_since(cls, user_id, since_datetime):
         """Tìm data của user từ thời điểm cụ thể"""
+        return cls.query_by_user_since(user_id, since_datetime).all()
+    
+    @classmethod
+    def query_by_user_since(cls, user_id, since_datetime):
+        """Query của find_by_user_since"""
         return cls.query.filter(
             cls.user_id == user_id,
             cls.updated_at > since_datetime
-        ).order_by(cls.updated_at.desc()).all()
+        ).order_by(cls.updated_at.desc())
     
     @classmethod
     def get_user_data_count(cls, user_id):
@@ -132,4 +383,10 @@ class AppData(db.Model):
     
     def is_recent(self, minutes=60):
         """Kiểm tra data có được tạo trong vòng x phút không"""
-        return self.get_age_in_minutes() <= minutes
\ No newline at end of file
+        return self.get_age_in_minutes() <= minutes
+
+@event.listens_for(AppData, 'before_insert')
+@event.listens_for(AppData, 'before_update')
+def set_content_hash(mapper, connection, target):
+    """Cập nhật content hash mỗi khi item được ghi qua ORM"""
+    target.content_hash = AppData.compute_hash(target.type, target.title, target.content)
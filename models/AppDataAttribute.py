@@ -0,0 +1,100 @@
+# Mô hình bảng thuộc tính JSON được index của AppData (do trigger SQLite cập nhật)
+from config.db import db
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Index, select
+
+class AppDataIndexedPath(db.Model):
+    """Model cho bảng app_data_indexed_paths: các JSON path được index theo type"""
+    __tablename__ = 'app_data_indexed_paths'
+
+    # Các cột
+    type = Column(String(50), primary_key=True)
+    path = Column(String(200), primary_key=True)  # Ví dụ 'phone', 'address.city'
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        """String representation"""
+        return f'<AppDataIndexedPath {self.type}.{self.path}>'
+
+
+class AppDataAttribute(db.Model):
+    """Model cho bảng app_data_attributes: một dòng cho mỗi giá trị của một path được index
+
+    Giá trị mảng được tách thành nhiều dòng (mỗi phần tử một dòng). Số được
+    lưu dạng text nên so sánh bằng chuỗi đã chuẩn hóa (xem normalize_value).
+    created_at được chép từ app_data để index trả về item đã theo thứ tự trang.
+    """
+    __tablename__ = 'app_data_attributes'
+    __table_args__ = (
+        # where[path]=value => range trên index, đã sắp xếp theo (created_at, data_id)
+        Index('ix_app_data_attributes_lookup', 'user_id', 'type', 'path', 'value', 'created_at', 'data_id'),
+        # Trigger xóa / cập nhật theo data_id
+        Index('ix_app_data_attributes_data_id', 'data_id'),
+    )
+
+    # Các cột
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    data_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    type = Column(String(50), nullable=False)
+    path = Column(String(200), nullable=False)
+    value = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        """String representation"""
+        return f'<AppDataAttribute {self.data_id}: {self.path}={self.value}>'
+
+    @staticmethod
+    def normalize_value(value):
+        """Chuẩn hóa giá trị query về dạng text giống cách SQLite lưu giá trị JSON
+
+        true/false trong JSON được json_each trả về là 1/0.
+        """
+        if value in ('true', 'false'):
+            return '1' if value == 'true' else '0'
+        return value
+
+    @classmethod
+    def value_condition(cls, value_column, values):
+        """value = x hoặc value IN (...) với các giá trị đã chuẩn hóa"""
+        values = [cls.normalize_value(value) for value in values]
+        if len(values) == 1:
+            return value_column == values[0]
+        return value_column.in_(values)
+
+    @classmethod
+    def ids_statement(cls, user_id, data_type, path, values):
+        """Câu select data_id của các item có path bằng một trong các values"""
+        return select(cls.data_id).where(
+            cls.user_id == user_id,
+            cls.type == data_type,
+            cls.path == path,
+            cls.value_condition(cls.value, values)
+        )
+
+    @classmethod
+    def match_conditions(cls, match, user_id, data_type, where):
+        """Điều kiện trên alias `match` của bảng cho các điều kiện where
+
+        Điều kiện ít giá trị nhất được dùng làm lookup chính trên alias; các
+        điều kiện còn lại là data_id IN (lookup khác trên cùng index).
+        """
+        where = sorted(where, key=lambda condition: len(condition[1]))
+        (path, values), others = where[0], where[1:]
+
+        conditions = [
+            match.c.user_id == user_id,
+            match.c.type == data_type,
+            match.c.path == path,
+            cls.value_condition(match.c.value, values)
+        ]
+        for path, values in others:
+            conditions.append(match.c.data_id.in_(cls.ids_statement(user_id, data_type, path, values)))
+        return conditions
+
+    @staticmethod
+    def may_repeat(where):
+        """Lookup chính có nhiều giá trị => một item (giá trị mảng) có thể khớp nhiều dòng"""
+        return min(len(values) for path, values in where) > 1
+
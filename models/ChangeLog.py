@@ -0,0 +1,78 @@
+# Mô hình nhật ký thay đổi (change log) phục vụ delta sync
+from config.db import db
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Index, func
+
+class ChangeLog(db.Model):
+    """Model cho bảng app_data_changes (append-only, seq tăng đơn điệu)"""
+    __tablename__ = 'app_data_changes'
+    __table_args__ = (
+        # Delta sync = range scan theo (user_id, seq)
+        Index('ix_app_data_changes_user_seq', 'user_id', 'seq'),
+        # AUTOINCREMENT để seq không bao giờ bị dùng lại sau khi compact
+        {'sqlite_autoincrement': True},
+    )
+    
+    # Các loại thao tác
+    OP_CREATE = 'create'
+    OP_UPDATE = 'update'
+    OP_DELETE = 'delete'
+    
+    # Các cột
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, nullable=False)
+    data_id = Column(Integer, nullable=False)
+    op = Column(String(10), nullable=False)
+    type = Column(String(50), nullable=True)
+    changed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        """String representation"""
+        return f'<ChangeLog {self.seq}: {self.op} {self.data_id}>'
+    
+    def to_dict(self):
+        """Chuyển đổi object thành dictionary"""
+        return {
+            'seq': self.seq,
+            'data_id': self.data_id,
+            'op': self.op,
+            'type': self.type,
+            'changed_at': self.changed_at.isoformat() if self.changed_at else None
+        }
+    
+    @classmethod
+    def find_since(cls, user_id, since_seq, limit=None):
+        """Lấy các thay đổi của user có seq > since_seq (theo thứ tự seq)"""
+        query = cls.query.filter(
+            cls.user_id == user_id,
+            cls.seq > since_seq
+        ).order_by(cls.seq.asc())
+        
+        if limit is not None:
+            query = query.limit(limit)
+        
+        return query.all()
+    
+    @classmethod
+    def get_latest_seq(cls, user_id):
+        """Lấy seq mới nhất của user (0 nếu chưa có thay đổi nào)"""
+        latest = db.session.query(func.max(cls.seq))\
+                           .filter(cls.user_id == user_id)\
+                           .scalar()
+        return latest or 0
+    
+    @classmethod
+    def get_latest(cls, user_id):
+        """Lấy (seq, changed_at) của thay đổi mới nhất của user ((0, None) nếu chưa có)"""
+        latest = db.session.query(cls.seq, cls.changed_at)\
+                           .filter(cls.user_id == user_id)\
+                           .order_by(cls.seq.desc())\
+                           .first()
+        if latest is None:
+            return 0, None
+        return latest.seq, latest.changed_at
+    
+    @classmethod
+    def delete_by_user(cls, user_id):
+        """Xóa toàn bộ change log của user (khi xóa tài khoản)"""
+        return cls.query.filter_by(user_id=user_id).delete(synchronize_session=False)
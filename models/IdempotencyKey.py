@@ -0,0 +1,120 @@
+# Mô hình bảng chống trùng lặp thao tác ghi (idempotency key, có hạn dùng)
+from config.db import db
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+class IdempotencyKey(db.Model):
+    """Model cho bảng idempotency_keys (một dòng cho mỗi user, scope, key)"""
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        # Dọn key hết hạn = range scan theo expires_at
+        Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
+
+    # Phạm vi của key
+    SCOPE_REQUEST = 'request'
+    SCOPE_ITEM = 'item'
+
+    # Độ dài tối đa của key do client gửi lên
+    MAX_KEY_LENGTH = 255
+
+    # Các cột
+    user_id = Column(Integer, primary_key=True)
+    scope = Column(String(10), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=True)
+    status_code = Column(Integer, nullable=True)  # NULL = request đang xử lý
+    response = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        """String representation"""
+        return f'<IdempotencyKey {self.user_id}:{self.scope}:{self.key}>'
+
+    @property
+    def is_completed(self):
+        """Thao tác đã xử lý xong và có kết quả lưu lại"""
+        return self.status_code is not None
+
+    @classmethod
+    def find(cls, user_id, scope, key, now=None):
+        """Tìm key còn hạn"""
+        if now is None:
+            now = datetime.utcnow()
+        return cls.query.filter(
+            cls.user_id == user_id,
+            cls.scope == scope,
+            cls.key == key,
+            cls.expires_at > now
+        ).first()
+
+    @classmethod
+    def find_many(cls, user_id, scope, keys, now=None, chunk_size=500):
+        """Tìm nhiều key còn hạn (IN theo từng chunk), trả về dict key -> record"""
+        if now is None:
+            now = datetime.utcnow()
+
+        keys = list(dict.fromkeys(keys))
+        records = {}
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            for record in cls.query.filter(
+                cls.user_id == user_id,
+                cls.scope == scope,
+                cls.key.in_(chunk),
+                cls.expires_at > now
+            ).all():
+                records[record.key] = record
+        return records
+
+    @classmethod
+    def insert_ignore(cls, rows):
+        """Chèn nhiều dòng, bỏ qua dòng đã tồn tại (không commit)
+
+        Với một dòng, trả về 1 nếu được chèn, 0 nếu key đã tồn tại.
+        """
+        if not rows:
+            return 0
+        statement = sqlite_insert(cls.__table__).on_conflict_do_nothing()
+        if len(rows) == 1:
+            return db.session.execute(statement.values(**rows[0])).rowcount
+        db.session.execute(statement, rows)
+        return None
+
+    @classmethod
+    def upsert(cls, rows):
+        """Chèn hoặc ghi đè kết quả của nhiều key (không commit)"""
+        if not rows:
+            return
+        statement = sqlite_insert(cls.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=[cls.user_id, cls.scope, cls.key],
+            set_={
+                'request_hash': statement.excluded.request_hash,
+                'status_code': statement.excluded.status_code,
+                'response': statement.excluded.response,
+                'created_at': statement.excluded.created_at,
+                'expires_at': statement.excluded.expires_at
+            }
+        )
+        db.session.execute(statement, rows)
+
+    @classmethod
+    def delete_key(cls, user_id, scope, key):
+        """Xóa một key (không commit)"""
+        return cls.query.filter_by(user_id=user_id, scope=scope, key=key)\
+                        .delete(synchronize_session=False)
+
+    @classmethod
+    def delete_expired(cls, now=None):
+        """Xóa các key đã hết hạn (không commit)"""
+        if now is None:
+            now = datetime.utcnow()
+        return cls.query.filter(cls.expires_at <= now).delete(synchronize_session=False)
+
+    @classmethod
+    def delete_by_user(cls, user_id):
+        """Xóa toàn bộ key của user (khi xóa tài khoản)"""
+        return cls.query.filter_by(user_id=user_id).delete(synchronize_session=False)
@@ -0,0 +1,76 @@
+# Mô hình bảng token bị thu hồi (logout, xóa tài khoản), đồng bộ vào bộ nhớ của mỗi process
+from config.db import db
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+class RevokedToken(db.Model):
+    """Model cho bảng revoked_tokens
+
+    Mỗi dòng thu hồi một token (jti) hoặc mọi token của một user được cấp
+    trước revoked_at (jti = 'user:<id>'). Dòng được giữ tới expires_at, sau
+    đó token tương ứng đã tự hết hạn nên có thể xóa.
+    """
+    __tablename__ = 'revoked_tokens'
+    __table_args__ = (
+        # Đồng bộ các dòng mới = range scan theo revoked_at
+        Index('ix_revoked_tokens_revoked_at', 'revoked_at'),
+        # Dọn dòng hết hạn = range scan theo expires_at
+        Index('ix_revoked_tokens_expires_at', 'expires_at'),
+    )
+
+    # Tiền tố jti của dòng thu hồi toàn bộ token của user
+    USER_PREFIX = 'user:'
+
+    # Các cột
+    jti = Column(String(64), primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    revoked_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        """String representation"""
+        return f'<RevokedToken {self.jti}>'
+
+    @classmethod
+    def user_key(cls, user_id):
+        return f"{cls.USER_PREFIX}{user_id}"
+
+    @classmethod
+    def insert_ignore(cls, row):
+        """Chèn một dòng nếu jti chưa có (không commit); trả về 1 nếu được chèn, 0 nếu đã tồn tại"""
+        statement = sqlite_insert(cls.__table__).on_conflict_do_nothing()
+        return db.session.execute(statement.values(**row)).rowcount
+
+    @classmethod
+    def upsert(cls, rows):
+        """Chèn hoặc ghi đè các dòng thu hồi (không commit)"""
+        if not rows:
+            return
+        statement = sqlite_insert(cls.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=[cls.jti],
+            set_={
+                'revoked_at': statement.excluded.revoked_at,
+                'expires_at': statement.excluded.expires_at
+            }
+        )
+        db.session.execute(statement, rows)
+
+    @classmethod
+    def find_since(cls, since, now=None):
+        """Các dòng còn hiệu lực được ghi từ thời điểm since (None = tất cả)"""
+        if now is None:
+            now = datetime.utcnow()
+        query = cls.query.with_entities(cls.jti, cls.user_id, cls.revoked_at, cls.expires_at)\
+                         .filter(cls.expires_at > now)
+        if since is not None:
+            query = query.filter(cls.revoked_at >= since)
+        return query.all()
+
+    @classmethod
+    def delete_expired(cls, now=None):
+        """Xóa các dòng đã hết hạn (không commit)"""
+        if now is None:
+            now = datetime.utcnow()
+        return cls.query.filter(cls.expires_at <= now).delete(synchronize_session=False)
@@ -25,10 +25,19 @@ class User(db.Model):
         self.email = email
         self.password = password
     
+    # Role (chưa có cột role: user_id = 1 là admin, giống admin_required)
+    ROLE_ADMIN = 'admin'
+    ROLE_USER = 'user'
+    
     def __repr__(self):
         """String representation"""
         return f'<User {self.username}>'
     
+    @property
+    def role(self):
+        """Role của user"""
+        return self.ROLE_ADMIN if self.id == 1 else self.ROLE_USER
+    
     def to_dict(self):
         """Chuyển đổi object thành dictionary"""
         return {
@@ -0,0 +1,118 @@
+# Mô hình thống kê dữ liệu theo user (được cập nhật cùng transaction với mỗi thao tác ghi)
+from config.db import db
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, select, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+class UserStats(db.Model):
+    """Model cho bảng user_data_stats (một dòng cho mỗi cặp user, type)"""
+    __tablename__ = 'user_data_stats'
+    
+    # Các cột
+    user_id = Column(Integer, primary_key=True)
+    type = Column(String(50), primary_key=True)
+    item_count = Column(Integer, nullable=False, default=0)
+    last_activity = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        """String representation"""
+        return f'<UserStats {self.user_id}: {self.type}={self.item_count}>'
+    
+    @classmethod
+    def apply_deltas(cls, user_id, deltas, activity_at=None):
+        """Cộng dồn số lượng theo type (deltas: dict type -> số lượng thay đổi)
+        
+        Dùng UPSERT nên an toàn khi nhiều request ghi đồng thời; không commit.
+        """
+        if not deltas:
+            return
+        
+        if activity_at is None:
+            activity_at = datetime.utcnow()
+        
+        table = cls.__table__
+        statement = sqlite_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.type],
+            set_={
+                'item_count': table.c.item_count + statement.excluded.item_count,
+                'last_activity': statement.excluded.last_activity
+            }
+        )
+        
+        rows = [
+            {
+                'user_id': user_id,
+                'type': data_type,
+                'item_count': delta,
+                'last_activity': activity_at
+            }
+            for data_type, delta in deltas.items()
+        ]
+        db.session.execute(statement, rows)
+    
+    @classmethod
+    def get_user_stats(cls, user_id):
+        """Lấy thống kê của user: tổng số item, số item theo type, hoạt động cuối"""
+        rows = cls.query.filter_by(user_id=user_id).all()
+        
+        type_stats = {}
+        last_activity = None
+        for row in rows:
+            if row.item_count > 0:
+                type_stats[row.type] = row.item_count
+            if row.last_activity and (last_activity is None or row.last_activity > last_activity):
+                last_activity = row.last_activity
+        
+        return {
+            'total_items': sum(type_stats.values()),
+            'type_statistics': type_stats,
+            'last_activity': last_activity
+        }
+    
+    @classmethod
+    def get_item_count(cls, user_id, data_type=None):
+        """Số item của user (theo type nếu có) từ bộ đếm, không COUNT(*) trên app_data"""
+        query = db.session.query(func.coalesce(func.sum(cls.item_count), 0))\
+                          .filter(cls.user_id == user_id)
+        if data_type:
+            query = query.filter(cls.type == data_type)
+        return max(int(query.scalar()), 0)
+    
+    @classmethod
+    def rebuild(cls, user_id=None):
+        """Tính lại thống kê từ app_data bằng GROUP BY (dùng để sửa dữ liệu lệch)"""
+        from models.AppData import AppData
+        
+        delete_query = cls.query
+        aggregate = select(
+            AppData.user_id,
+            AppData.type,
+            func.count(AppData.id),
+            func.max(AppData.updated_at)
+        ).group_by(AppData.user_id, AppData.type)
+        
+        if user_id is not None:
+            delete_query = delete_query.filter_by(user_id=user_id)
+            aggregate = aggregate.where(AppData.user_id == user_id)
+        
+        delete_query.delete(synchronize_session=False)
+        
+        rows = [
+            {
+                'user_id': row[0],
+                'type': row[1],
+                'item_count': row[2],
+                'last_activity': row[3]
+            }
+            for row in db.session.execute(aggregate)
+        ]
+        if rows:
+            db.session.execute(cls.__table__.insert(), rows)
+        
+        return len(rows)
+    
+    @classmethod
+    def delete_by_user(cls, user_id):
+        """Xóa thống kê của user (khi xóa tài khoản)"""
+        return cls.query.filter_by(user_id=user_id).delete(synchronize_session=False)
@@ -2,6 +2,8 @@
 from flask import Blueprint
 from controllers.data_controller import DataController
 from middlewares.auth_middleware import token_required
+from middlewares.idempotency import idempotent
+from middlewares.conditional import conditional_get
 
 # Tạo blueprint
 data_bp = Blueprint('data', __name__)
@@ -12,35 +14,88 @@ data_controller = DataController()
 # GET /api/data - Lấy tất cả dữ liệu của user
 @data_bp.route('/', methods=['GET'])
 @token_required
+@conditional_get
 def get_all_data(current_user):
     return data_controller.get_all_data(current_user)
 
+# GET /api/data/search?q=... - Tìm kiếm full-text (không phân biệt dấu, theo prefix)
+@data_bp.route('/search', methods=['GET'])
+@token_required
+@conditional_get
+def search_data(current_user):
+    return data_controller.search_data(current_user)
+
+# GET /api/data/export - Xuất toàn bộ dữ liệu (NDJSON streaming)
+@data_bp.route('/export', methods=['GET'])
+@token_required
+def export_data(current_user):
+    return data_controller.export_data(current_user)
+
+# POST /api/data/batch - Tạo nhiều dữ liệu trong một transaction
+@data_bp.route('/batch', methods=['POST'])
+@token_required
+@idempotent
+def batch_create(current_user):
+    return data_controller.batch_create(current_user)
+
+# PUT /api/data/batch - Cập nhật nhiều dữ liệu trong một transaction
+@data_bp.route('/batch', methods=['PUT'])
+@token_required
+@idempotent
+def batch_update(current_user):
+    return data_controller.batch_update(current_user)
+
+# DELETE /api/data/batch - Xóa nhiều dữ liệu trong một transaction
+@data_bp.route('/batch', methods=['DELETE'])
+@token_required
+@idempotent
+def batch_delete(current_user):
+    return data_controller.batch_delete(current_user)
+
 # GET /api/data/<id> - Lấy dữ liệu theo ID
 @data_bp.route('/<int:data_id>', methods=['GET'])
 @token_required
+@conditional_get
 def get_data_by_id(current_user, data_id):
     return data_controller.get_data_by_id(current_user, data_id)
 
+# GET /api/data/<id>/content - Content gốc (không bọc JSON), content lớn gửi thẳng từ blob store
+@data_bp.route('/<int:data_id>/content', methods=['GET'])
+@token_required
+def get_data_content(current_user, data_id):
+    return data_controller.get_data_content(current_user, data_id)
+
 # POST /api/data - Tạo dữ liệu mới
 @data_bp.route('/', methods=['POST'])
 @token_required
+@idempotent
 def create_data(current_user):
     return data_controller.create_data(current_user)
 
 # PUT /api/data/<id> - Cập nhật dữ liệu
 @data_bp.route('/<int:data_id>', methods=['PUT'])
 @token_required
+@idempotent
 def update_data(current_user, data_id):
     return data_controller.update_data(current_user, data_id)
 
+# PATCH /api/data/<id> - Cập nhật một phần content (JSON Patch / Merge Patch)
+@data_bp.route('/<int:data_id>', methods=['PATCH'])
+@token_required
+@idempotent
+def patch_data(current_user, data_id):
+    return data_controller.patch_data(current_user, data_id)
+
 # DELETE /api/data/<id> - Xóa dữ liệu
 @data_bp.route('/<int:data_id>', methods=['DELETE'])
 @token_required
+@idempotent
 def delete_data(current_user, data_id):
     return data_controller.delete_data(current_user, data_id)
 
 # GET /api/data/type/<type> - Lấy dữ liệu theo loại
 @data_bp.route('/type/<string:data_type>', methods=['GET'])
 @token_required
+@conditional_get
 def get_data_by_type(current_user, data_type):
     return data_controller.get_data_by_type(current_user, data_type)
\ No newline at end of file
@@ -2,6 +2,8 @@
 from flask import Blueprint
 from controllers.sync_controller import SyncController
 from middlewares.auth_middleware import token_required
+from middlewares.idempotency import idempotent
+from middlewares.conditional import conditional_get
 
 # Tạo blueprint
 sync_bp = Blueprint('sync', __name__)
@@ -12,12 +14,14 @@ sync_controller = SyncController()
 # GET /api/sync - Lấy dữ liệu đồng bộ
 @sync_bp.route('/', methods=['GET'])
 @token_required
+@conditional_get
 def get_sync_data(current_user):
     return sync_controller.get_sync_data(current_user)
 
 # POST /api/sync - Gửi dữ liệu để đồng bộ
 @sync_bp.route('/', methods=['POST'])
 @token_required
+@idempotent
 def sync_data(current_user):
     return sync_controller.sync_data(current_user)
 
@@ -31,4 +35,16 @@ def get_sync_status(current_user):
 @sync_bp.route('/force', methods=['POST'])
 @token_required
 def force_sync(current_user):
-    return sync_controller.force_sync(current_user)
\ No newline at end of file
+    return sync_controller.force_sync(current_user)
+
+# POST /api/sync/conflicts - Kiểm tra xung đột theo version (batch)
+@sync_bp.route('/conflicts', methods=['POST'])
+@token_required
+def check_conflicts(current_user):
+    return sync_controller.check_conflicts(current_user)
+
+# GET /api/sync/snapshot - Tải snapshot toàn bộ dữ liệu (gzip)
+@sync_bp.route('/snapshot', methods=['GET'])
+@token_required
+def get_snapshot(current_user):
+    return sync_controller.get_snapshot(current_user)
\ No newline at end of file
@@ -1,7 +1,7 @@
 # API người dùng
 from flask import Blueprint
 from controllers.user_controller import UserController
-from middlewares.auth_middleware import token_required
+from middlewares.auth_middleware import token_required, refresh_token_required
 
 # Tạo blueprint
 user_bp = Blueprint('user', __name__)
@@ -19,6 +19,12 @@ def register():
 def login():
     return user_controller.login()
 
+# POST /api/user/refresh - Làm mới token (refresh token, chế độ stateless)
+@user_bp.route('/refresh', methods=['POST'])
+@refresh_token_required
+def refresh(current_user):
+    return user_controller.refresh(current_user)
+
 # GET /api/user/profile - Lấy thông tin profile
 @user_bp.route('/profile', methods=['GET'])
 @token_required
@@ -0,0 +1,61 @@
+# Benchmark endpoint @token_required tối thiểu với 3 chế độ xác thực
+#   db:     tra users mỗi request (AUTH_CACHE_ENABLED=false)
+#   cache:  principal cache (mặc định)
+#   claims: claims-only (AUTH_STATELESS=true)
+# Chạy: python scripts/bench_auth_modes.py db|cache|claims [số request, mặc định 3000]
+import sys
+import time
+from bench_common import create_bench_app, login
+
+def main(mode, count):
+    app = create_bench_app({
+        'AUTH_STATELESS': 'True' if mode == 'claims' else 'False',
+        'AUTH_CACHE_ENABLED': 'False' if mode == 'db' else 'True'
+    })
+    from middlewares.auth_middleware import token_required
+
+    @app.route('/bench')
+    @token_required
+    def bench(current_user):
+        return {'id': current_user.id, 'username': current_user.username}
+
+    client = app.test_client()
+    headers = login(client)
+
+    for _ in range(200):
+        client.get('/bench', headers=headers)
+
+    best = 0
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(count):
+            assert client.get('/bench', headers=headers).status_code == 200
+        best = max(best, count / (time.perf_counter() - start))
+
+    print(f"{mode}: {best:.0f} req/s (best of 3 x {count} requests)")
+
+    # Đếm số truy vấn bảng users trên 20 request dữ liệu, principal cache rỗng
+    from sqlalchemy import event
+    from config.db import db
+    from services.principal_cache_service import principal_cache
+
+    user_queries = []
+
+    def count_user_queries(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM users' in statement:
+            user_queries.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    principal_cache.clear()
+    event.listen(engine, 'before_cursor_execute', count_user_queries)
+    for _ in range(20):
+        client.get('/api/data/', headers=headers)
+    event.remove(engine, 'before_cursor_execute', count_user_queries)
+    print(f"  users queries over 20 GET /api/data/: {len(user_queries)}")
+
+if __name__ == '__main__':
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else 'cache',
+        int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    )
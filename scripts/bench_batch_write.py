@@ -0,0 +1,43 @@
+# Benchmark ghi từng item (POST /api/data) so với batch (POST / DELETE /api/data/batch)
+# Chạy: python scripts/bench_batch_write.py [số item, mặc định 500]
+import json
+import sys
+import time
+from bench_common import create_bench_app, login
+
+def main(count):
+    app = create_bench_app()
+    client = app.test_client()
+    headers = login(client)
+
+    items = [
+        {
+            'type': 'customer',
+            'title': f'c{i}',
+            'content': json.dumps({'phone': '090%07d' % i, 'name': f'Khách {i}'}, ensure_ascii=False)
+        }
+        for i in range(count)
+    ]
+
+    start = time.perf_counter()
+    for item in items:
+        assert client.post('/api/data/', json=item, headers=headers).status_code in (200, 201)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    response = client.post('/api/data/batch', json={'items': items}, headers=headers)
+    batch = time.perf_counter() - start
+    result = response.get_json()['data']
+    ids = [entry['data']['id'] for entry in result['results']]
+
+    start = time.perf_counter()
+    deleted = client.delete('/api/data/batch', json={'ids': ids}, headers=headers).get_json()['data']
+    delete = time.perf_counter() - start
+
+    print(f"{count} x POST /api/data:        {single:.2f}s (~{count / single:.0f} items/s)")
+    print(f"1 x POST /api/data/batch:      {batch:.3f}s (~{count / batch:.0f} items/s), "
+          f"{result['created_count']} created, {result['error_count']} errors")
+    print(f"DELETE /api/data/batch:        {delete:.3f}s, {deleted['deleted_count']} deleted")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
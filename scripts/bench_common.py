@@ -0,0 +1,43 @@
+# Khởi tạo app trên bản sao database.db trong thư mục tạm cho các script benchmark
+import atexit
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import warnings
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def create_bench_app(env=None):
+    """Tạo app trên bản sao database.db (không đụng tới dữ liệu thật)
+
+    env: biến môi trường cấu hình cần đặt trước khi import config.
+    Thư mục tạm (database, snapshots...) bị xóa khi script kết thúc.
+    """
+    if env:
+        os.environ.update(env)
+
+    work_dir = tempfile.mkdtemp(prefix='bench_')
+    atexit.register(shutil.rmtree, work_dir, ignore_errors=True)
+    shutil.copy(os.path.join(ROOT_DIR, 'database.db'), work_dir)
+    os.chdir(work_dir)
+
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    logging.disable(logging.CRITICAL)
+    warnings.filterwarnings('ignore')
+
+    from config.env import Config
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(work_dir, 'database.db')}"
+    Config.SQLALCHEMY_ECHO = False
+
+    from app import app
+    # Token dùng user id (int) làm subject
+    app.config['JWT_VERIFY_SUB'] = False
+    return app
+
+def login(client, username='testuser', password='test123'):
+    """Đăng nhập bằng user mẫu, trả về header Authorization"""
+    response = client.post('/api/user/login', json={'username': username, 'password': password})
+    return {'Authorization': 'Bearer ' + response.get_json()['data']['access_token']}
@@ -0,0 +1,91 @@
+# Benchmark đợt login đồng thời: bcrypt trên thread request (inline) so với pool có giới hạn
+# Chạy trên werkzeug threaded server, 2 client đọc GET /api/data/ song song.
+# Chạy: python scripts/bench_password_pool.py inline|pool [queue limit, mặc định 8] [số login, mặc định 40]
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from bench_common import create_bench_app, login
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 1)
+
+def main(mode, queue_limit, logins):
+    app = create_bench_app({
+        'PASSWORD_HASH_WORKERS': '0' if mode == 'inline' else '1',
+        'PASSWORD_HASH_QUEUE_LIMIT': '100000' if mode == 'inline' else str(queue_limit),
+        'PASSWORD_BCRYPT_ROUNDS': '10'
+    })
+    from werkzeug.serving import make_server
+    from services.password_service import password_service
+
+    # Lần login đầu rehash user mẫu về cost 10
+    headers = login(app.test_client())
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    def call(path, data=None, extra_headers=None):
+        request = urllib.request.Request(
+            base_url + path,
+            data=json.dumps(data).encode('utf-8') if data else None,
+            headers={'Content-Type': 'application/json', **(extra_headers or {})}
+        )
+        start = time.perf_counter()
+        try:
+            status = urllib.request.urlopen(request).status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        return status, (time.perf_counter() - start) * 1000
+
+    login_latency, other_latency, statuses = [], [], {}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def burst():
+        status, elapsed = call('/api/user/login', {'username': 'testuser', 'password': 'test123'})
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                login_latency.append(elapsed)
+
+    def reader():
+        while not stop.is_set():
+            other_latency.append(call('/api/data/?per_page=5', extra_headers=headers)[1])
+            time.sleep(0.01)
+
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    for thread in readers:
+        thread.start()
+
+    start = time.perf_counter()
+    bursts = [threading.Thread(target=burst) for _ in range(logins)]
+    for thread in bursts:
+        thread.start()
+    for thread in bursts:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    stop.set()
+    for thread in readers:
+        thread.join()
+    server.shutdown()
+
+    print(f"{mode}: status {statuses}, wall {wall:.2f}s")
+    print(f"  login 200 p50/p99 ms: {percentile(login_latency, .5)} / {percentile(login_latency, .99)}")
+    print(f"  other p50/p99 ms:     {percentile(other_latency, .5)} / {percentile(other_latency, .99)} "
+          f"({len(other_latency)} requests)")
+    print(f"  pool: {password_service.stats()}")
+
+if __name__ == '__main__':
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else 'pool',
+        int(sys.argv[2]) if len(sys.argv) > 2 else 8,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 40
+    )
@@ -0,0 +1,106 @@
+# Benchmark serialise AppData: ORM / getattr + isoformat (trước) so với RowSerializer (sau)
+# Kiểm tra luôn output của hai cách giống hệt nhau.
+# Chạy: python scripts/bench_serializer.py [số item, mặc định 10000]
+import json
+import sys
+import time
+from datetime import datetime
+from bench_common import create_bench_app, login
+
+def best_of(name, function, count, runs=7):
+    """Thời gian tốt nhất sau một lần chạy làm nóng"""
+    result = function()
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:46s} {best * 1000:8.1f} ms {count / best:10.0f} rows/s")
+    return result
+
+def serialize_row_before(row, fields):
+    """Cách đọc row trước đây: getattr từng field, isoformat cho datetime"""
+    item = {}
+    for name in fields:
+        value = getattr(row, name)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        item[name] = value
+    return item
+
+def main(count):
+    app = create_bench_app()
+    client = app.test_client()
+    headers = login(client)
+
+    items = [
+        {'type': 'note', 'title': f'T{i}', 'content': json.dumps({'text': 'x' * 200, 'n': i})}
+        for i in range(count)
+    ]
+    for start in range(0, count, 1000):
+        client.post('/api/data/batch', json={'items': items[start:start + 1000]}, headers=headers)
+
+    from sqlalchemy import select, text
+    from config.db import db
+    from models.AppData import AppData
+    from controllers.data_controller import DataController
+
+    with app.app_context():
+        user_id = db.session.execute(text("SELECT id FROM users WHERE username = 'testuser'")).scalar()
+        total = db.session.execute(
+            text("SELECT COUNT(*) FROM app_data WHERE user_id = :user_id"), {'user_id': user_id}
+        ).scalar()
+
+        def query(columns):
+            return select(*columns).where(AppData.user_id == user_id).order_by(
+                AppData.created_at.desc(), AppData.id.desc()
+            )
+
+        def model_columns(fields):
+            return [getattr(AppData, name) for name in fields]
+
+        def orm_before():
+            db.session.expunge_all()
+            return [
+                item.to_sync_dict()
+                for item in AppData.query.filter_by(user_id=user_id)
+                .order_by(AppData.created_at.desc(), AppData.id.desc()).all()
+            ]
+
+        best_of('sync: ORM hydrate + to_sync_dict (before)', orm_before, total)
+        sync_after = best_of(
+            'sync: RowSerializer (after)',
+            lambda: AppData.serializer_for().serialize_all(db.session.execute(query(AppData.sync_columns())).all()),
+            total
+        )
+        sync_fields = tuple(sync_after[0]) if sync_after else ()
+        sync_before = best_of(
+            'sync: Core + getattr/isoformat (before)',
+            lambda: [
+                serialize_row_before(row, sync_fields)
+                for row in db.session.execute(query(model_columns(sync_fields))).all()
+            ],
+            total
+        )
+        print(f"  identical: {sync_before == sync_after}")
+
+        for label, fields in (('list full', DataController.FULL_FIELDS), ('list summary', AppData.SUMMARY_FIELDS)):
+            before = best_of(
+                f'{label}: getattr/isoformat (before)',
+                lambda: [
+                    serialize_row_before(row, fields)
+                    for row in db.session.execute(query(model_columns(fields))).all()
+                ],
+                total
+            )
+            after = best_of(
+                f'{label}: RowSerializer (after)',
+                lambda: DataController._serialize_rows(
+                    db.session.execute(query(AppData.columns_for(fields))).all(), fields
+                ),
+                total
+            )
+            print(f"  identical: {before == after}")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,187 @@
+# Service index các JSON path trong AppData.content theo type (bảng app_data_attributes)
+import re
+from sqlalchemy import text
+from config.db import db
+from config.env import Config
+from models.AppDataAttribute import AppDataAttribute
+from utils.logger import logger
+
+ATTRIBUTE_TABLE = AppDataAttribute.__tablename__
+ATTRIBUTE_SOURCE_VIEW = 'app_data_attribute_source'
+
+# Path hợp lệ: tên field JSON, lồng nhau bằng dấu chấm (ví dụ address.city)
+PATH_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$')
+
+# Số điều kiện where[...] tối đa trong một request
+MAX_CONDITIONS = 5
+
+# View trích giá trị của các path đã khai báo (app_data_indexed_paths) từ content.
+# json_each trên path trả về chính giá trị (scalar) hoặc từng phần tử (mảng);
+# content không phải JSON hợp lệ được coi như '{}' để trigger không làm hỏng thao tác ghi.
+# Content nằm trong blob store (cột chỉ còn tham chiếu) được đọc qua hàm blob_json
+# (đăng ký trên mỗi connection trong config/db.py).
+ATTRIBUTE_SOURCE_SQL = f"""
+    CREATE VIEW IF NOT EXISTS {ATTRIBUTE_SOURCE_VIEW} AS
+    SELECT d.id AS data_id, d.user_id AS user_id, d.type AS type, p.path AS path, j.value AS value,
+           d.created_at AS created_at
+    FROM app_data d
+    JOIN app_data_indexed_paths p ON p.type = d.type,
+    json_each(
+        CASE WHEN d.content_blob IS NOT NULL THEN blob_json(d.content)
+        WHEN json_valid(d.content) THEN d.content ELSE '{{}}' END,
+        '$.' || p.path
+    ) j
+    WHERE j.type NOT IN ('object', 'array', 'null')
+    """
+
+ATTRIBUTE_SCHEMA = [
+    ATTRIBUTE_SOURCE_SQL,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS app_data_attributes_ai AFTER INSERT ON app_data BEGIN
+        INSERT INTO {ATTRIBUTE_TABLE}(data_id, user_id, type, path, value, created_at)
+        SELECT data_id, user_id, type, path, value, created_at FROM {ATTRIBUTE_SOURCE_VIEW} WHERE data_id = new.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS app_data_attributes_au AFTER UPDATE OF user_id, type, content, created_at ON app_data BEGIN
+        DELETE FROM {ATTRIBUTE_TABLE} WHERE data_id = old.id;
+        INSERT INTO {ATTRIBUTE_TABLE}(data_id, user_id, type, path, value, created_at)
+        SELECT data_id, user_id, type, path, value, created_at FROM {ATTRIBUTE_SOURCE_VIEW} WHERE data_id = new.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS app_data_attributes_ad AFTER DELETE ON app_data BEGIN
+        DELETE FROM {ATTRIBUTE_TABLE} WHERE data_id = old.id;
+    END
+    """,
+]
+
+def parse_indexed_paths(spec):
+    """Đọc cấu hình DATA_INDEXED_PATHS ('customer.phone,service.price') thành tập (type, path)"""
+    paths = set()
+    for entry in (spec or '').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        data_type, _, path = entry.partition('.')
+        if not data_type or not PATH_PATTERN.match(path):
+            logger.warning(f"Ignoring invalid indexed path '{entry}'")
+            continue
+        paths.add((data_type, path))
+    return paths
+
+class AttributeIndexService:
+    """Quản lý các JSON path được index và chuyển where[...] thành điều kiện trên index"""
+
+    def __init__(self, spec=None):
+        self.paths = parse_indexed_paths(Config.DATA_INDEXED_PATHS if spec is None else spec)
+
+    def ensure_index(self):
+        """Tạo view / trigger và đồng bộ danh sách path với cấu hình
+
+        Path mới được backfill từ dữ liệu hiện có; path bị bỏ khỏi cấu hình
+        thì xóa các giá trị đã index.
+        """
+        with db.engine.begin() as conn:
+            self._migrate_source_view(conn)
+            for statement in ATTRIBUTE_SCHEMA:
+                conn.execute(text(statement))
+
+            existing = {
+                (row.type, row.path)
+                for row in conn.execute(text("SELECT type, path FROM app_data_indexed_paths"))
+            }
+
+            for data_type, path in sorted(existing - self.paths):
+                conn.execute(text("DELETE FROM app_data_indexed_paths WHERE type = :type AND path = :path"),
+                             {'type': data_type, 'path': path})
+                removed = conn.execute(text(
+                    f"DELETE FROM {ATTRIBUTE_TABLE} WHERE type = :type AND path = :path"
+                ), {'type': data_type, 'path': path}).rowcount
+                logger.info(f"✅ Migration: dropped indexed path {data_type}.{path} ({removed} values)")
+
+            for data_type, path in sorted(self.paths - existing):
+                conn.execute(text(
+                    "INSERT INTO app_data_indexed_paths(type, path, created_at) VALUES (:type, :path, CURRENT_TIMESTAMP)"
+                ), {'type': data_type, 'path': path})
+                added = conn.execute(text(
+                    f"INSERT INTO {ATTRIBUTE_TABLE}(data_id, user_id, type, path, value, created_at) "
+                    f"SELECT data_id, user_id, type, path, value, created_at FROM {ATTRIBUTE_SOURCE_VIEW} "
+                    f"WHERE type = :type AND path = :path"
+                ), {'type': data_type, 'path': path}).rowcount
+                logger.info(f"✅ Migration: indexed path {data_type}.{path} ({added} values)")
+
+    def _migrate_source_view(self, conn):
+        """Tạo lại view nguồn nếu định nghĩa đã đổi và index lại các row có content trong blob store
+
+        View cũ coi tham chiếu blob là content không hợp lệ nên các row này chưa có thuộc tính.
+        """
+        current = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = :name"),
+            {'name': ATTRIBUTE_SOURCE_VIEW}
+        ).scalar()
+        if current is None or 'blob_json' in current:
+            return
+
+        conn.execute(text(f"DROP VIEW {ATTRIBUTE_SOURCE_VIEW}"))
+        conn.execute(text(ATTRIBUTE_SOURCE_SQL))
+        blob_rows = "SELECT id FROM app_data WHERE content_blob IS NOT NULL"
+        conn.execute(text(f"DELETE FROM {ATTRIBUTE_TABLE} WHERE data_id IN ({blob_rows})"))
+        added = conn.execute(text(
+            f"INSERT INTO {ATTRIBUTE_TABLE}(data_id, user_id, type, path, value, created_at) "
+            f"SELECT data_id, user_id, type, path, value, created_at FROM {ATTRIBUTE_SOURCE_VIEW} "
+            f"WHERE data_id IN ({blob_rows})"
+        )).rowcount
+        logger.info(f"✅ Migration: attribute index reads blob content ({added} values from blob rows)")
+
+    def rebuild(self):
+        """Index lại toàn bộ giá trị từ app_data (khi bảng thuộc tính bị lệch)"""
+        with db.engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {ATTRIBUTE_TABLE}"))
+            count = conn.execute(text(
+                f"INSERT INTO {ATTRIBUTE_TABLE}(data_id, user_id, type, path, value, created_at) "
+                f"SELECT data_id, user_id, type, path, value, created_at FROM {ATTRIBUTE_SOURCE_VIEW}"
+            )).rowcount
+            conn.execute(text(f"ANALYZE {ATTRIBUTE_TABLE}"))
+
+        logger.info(f"✅ Attribute index rebuilt: {count} values")
+        return count
+
+    def indexed_paths(self, data_type):
+        """Các path được index của một type"""
+        return sorted(path for path_type, path in self.paths if path_type == data_type)
+
+    def parse_where(self, args, data_type):
+        """Đọc các tham số where[path]=value thành tuple ((path, (values...)), ...)
+
+        Nhiều giá trị cho cùng một path là OR, nhiều path là AND. Chỉ cho phép
+        các path đã khai báo để mọi điều kiện đều là lookup trên index;
+        raise ValueError nếu không hợp lệ. Trả về () nếu không có điều kiện.
+        """
+        conditions = {}
+        for key in args.keys():
+            if not (key.startswith('where[') and key.endswith(']')):
+                continue
+            path = key[len('where['):-1]
+            values = tuple(dict.fromkeys(args.getlist(key)))
+            conditions[path] = values
+
+        if not conditions:
+            return ()
+
+        if not data_type:
+            raise ValueError("Cần tham số type khi lọc theo where[...]")
+        if len(conditions) > MAX_CONDITIONS:
+            raise ValueError(f"Tối đa {MAX_CONDITIONS} điều kiện where[...]")
+
+        allowed = self.indexed_paths(data_type)
+        for path in conditions:
+            if path not in allowed:
+                raise ValueError(
+                    f"Field '{path}' không được index cho type '{data_type}'. "
+                    f"Có thể lọc theo: {', '.join(allowed) or '(không có)'}"
+                )
+
+        return tuple(sorted(conditions.items()))
+
+__all__ = ['AttributeIndexService', 'parse_indexed_paths']
@@ -0,0 +1,97 @@
+# Service quản lý blob content của AppData: chuyển dữ liệu cũ ra blob store và dọn blob không dùng
+import threading
+import time
+from sqlalchemy import select, bindparam, text
+from models.AppData import AppData
+from config.db import db
+from config.env import Config
+from utils.blob_store import blob_store
+from utils.logger import logger
+
+class BlobService:
+    """Các thao tác trên blob store cần đến database (tham chiếu từ app_data)"""
+
+    def __init__(self, store=None):
+        self.store = store or blob_store
+
+    def referenced_hashes(self):
+        """Tập hash blob đang được app_data tham chiếu (đọc partial index ix_app_data_content_blob)"""
+        rows = db.session.execute(
+            select(AppData.content_blob).where(AppData.content_blob.isnot(None)).distinct()
+        )
+        return {row[0] for row in rows}
+
+    def collect_garbage(self, grace_seconds=None):
+        """Xóa các blob không còn row nào tham chiếu (mark & sweep)"""
+        if grace_seconds is None:
+            grace_seconds = Config.CONTENT_BLOB_GC_GRACE
+
+        referenced = self.referenced_hashes()
+        removed, freed = self.store.collect_garbage(referenced, grace_seconds)
+        logger.info(f"Blob GC: {removed} blobs removed ({freed} bytes), {len(referenced)} referenced")
+        return {'removed': removed, 'freed_bytes': freed, 'referenced': len(referenced)}
+
+    def externalize_existing(self, chunk_size=200):
+        """Chuyển content lớn của các row đã có ra blob store (một lần sau khi bật tính năng)
+
+        Ghi lại cột content qua Core update: ExternalText tự đưa giá trị ra blob.
+        updated_at / content_hash giữ nguyên vì nội dung không đổi.
+        """
+        if self.store.threshold <= 0:
+            return 0
+
+        table = AppData.__table__
+        statement = table.update()\
+                         .where(table.c.id == bindparam('_id'))\
+                         .values(content=bindparam('content'), updated_at=table.c.updated_at)
+
+        total = 0
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                select(table.c.id, table.c.content)
+                .where(
+                    table.c.id > last_id,
+                    table.c.content_blob.is_(None),
+                    text("length(CAST(app_data.content AS BLOB)) > :threshold")
+                )
+                .order_by(table.c.id)
+                .limit(chunk_size),
+                {'threshold': self.store.threshold}
+            ).all()
+            if not rows:
+                break
+
+            db.session.execute(statement, [{'_id': row.id, 'content': row.content} for row in rows])
+            db.session.commit()
+            total += len(rows)
+            last_id = rows[-1].id
+
+        logger.info(f"✅ Externalized content of {total} rows to blob store")
+        return total
+
+    def start_gc_worker(self, app, interval=None):
+        """Chạy GC blob định kỳ trong background thread"""
+        if interval is None:
+            interval = Config.CONTENT_BLOB_GC_INTERVAL
+
+        if interval <= 0:
+            logger.info("Blob GC worker disabled")
+            return None
+
+        def worker():
+            while True:
+                time.sleep(interval)
+                try:
+                    with app.app_context():
+                        self.collect_garbage()
+                        db.session.remove()
+                except Exception as e:
+                    logger.error(f"Blob GC worker error: {str(e)}")
+
+        thread = threading.Thread(target=worker, name='blob-gc', daemon=True)
+        thread.start()
+        logger.info(f"Blob GC worker started (interval: {interval}s)")
+        return thread
+
+__all__ = ['BlobService']
@@ -0,0 +1,442 @@
+# Service xử lý ghi dữ liệu hàng loạt trong một transaction
+from sqlalchemy import bindparam
+from models.AppData import AppData
+from models.ChangeLog import ChangeLog
+from config.db import db
+from services.change_log_service import ChangeLogService
+from services.idempotency_service import IdempotencyService
+from datetime import datetime
+from utils.json_patch import patch_json_text, normalize_patch_type
+from utils.logger import logger
+
+class BulkDataService:
+    """Service ghi AppData hàng loạt (prefetch một lần, executemany, commit một lần)"""
+
+    # Các field client được phép ghi
+    WRITABLE_FIELDS = ('type', 'title', 'content')
+
+    def __init__(self):
+        self.change_log = ChangeLogService()
+        self.idempotency = IdempotencyService()
+
+    def upsert(self, user_id, data_items):
+        """Tạo mới / cập nhật nhiều item trong một transaction
+
+        Trả về dict gồm 'created', 'updated' (danh sách sync dict), 'patched'
+        (diff của các item cập nhật bằng patch), 'replayed' (kết quả đã lưu của
+        các item có idempotency_key đã xử lý) và 'errors' (danh sách thông báo
+        lỗi theo từng item, giống luồng xử lý từng item).
+        """
+        plan = self._plan_upsert(user_id, data_items)
+
+        try:
+            created_results = self._apply_plan(user_id, plan)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Bulk upsert failed for user {user_id}, falling back to per-item mode: {str(e)}")
+            return self.upsert_individually(user_id, data_items)
+
+        return {
+            'created': created_results,
+            'updated': plan['updated_results'],
+            'patched': plan['patched_results'],
+            'replayed': plan['replayed_results'],
+            'errors': plan['errors']
+        }
+
+    def upsert_individually(self, user_id, data_items):
+        """Xử lý từng item một (luồng cũ, dùng khi bulk thất bại)"""
+        updated_items = []
+        created_items = []
+        patched_items = []
+        replayed_items = []
+        errors = []
+
+        for item_data in data_items:
+            try:
+                item_id = item_data.get('id')
+                item_key = self._item_key(item_data)
+                if item_key is not None:
+                    stored = self.idempotency.find_item_results(user_id, [item_key])
+                    if item_key in stored:
+                        replayed_items.append(stored[item_key])
+                        continue
+
+                if item_id:
+                    existing_item = AppData.find_by_id(item_id)
+                    if existing_item and existing_item.is_owned_by(user_id):
+                        previous_type = existing_item.type
+                        base_hash = existing_item.content_hash
+                        content = existing_item.content
+                        if 'patch' in item_data:
+                            content = self._apply_item_patch(item_id, item_data, content, base_hash)
+                        existing_item.type = item_data.get('type', existing_item.type)
+                        existing_item.title = item_data.get('title', existing_item.title)
+                        existing_item.content = item_data.get('content', content)
+                        existing_item.updated_at = datetime.utcnow()
+                        db.session.flush()
+                        self.change_log.record_updated(user_id, existing_item.id, existing_item.type, previous_type)
+                        result = existing_item.to_sync_dict()
+                        if item_key is not None:
+                            self.idempotency.store_item_results(user_id, {item_key: result})
+                        db.session.commit()
+                        updated_items.append(result)
+                        if 'patch' in item_data:
+                            patched_items.append(self._patch_result(existing_item.id, item_data, base_hash, existing_item.content_hash))
+                    else:
+                        errors.append(f"Item {item_id} not found or not owned by user")
+                else:
+                    new_item = AppData(
+                        user_id=user_id,
+                        type=item_data.get('type'),
+                        title=item_data.get('title'),
+                        content=item_data.get('content')
+                    )
+                    db.session.add(new_item)
+                    db.session.flush()
+                    self.change_log.record_created(user_id, new_item.id, new_item.type)
+                    result = new_item.to_sync_dict()
+                    if item_key is not None:
+                        self.idempotency.store_item_results(user_id, {item_key: result})
+                    db.session.commit()
+                    created_items.append(result)
+
+            except Exception as item_error:
+                db.session.rollback()
+                errors.append(f"Error processing item: {str(item_error)}")
+                continue
+
+        return {
+            'created': created_items,
+            'updated': updated_items,
+            'patched': patched_items,
+            'replayed': replayed_items,
+            'errors': errors
+        }
+
+    def write_batch(self, user_id, data_items, mode, atomic=False):
+        """Tạo mới (mode='create') hoặc cập nhật (mode='update') nhiều item trong một transaction
+
+        Mọi item được kiểm tra trước khi ghi; kết quả trả về theo vị trí của
+        từng item. Với atomic=True, chỉ cần một item lỗi là không ghi gì cả.
+        """
+        plan = self._plan_upsert(user_id, data_items, mode=mode)
+
+        applied = not (atomic and plan['errors'])
+        if applied:
+            try:
+                self._apply_plan(user_id, plan)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+        results = []
+        for entry in plan['item_results']:
+            result = {'index': entry['index'], 'status': entry['status']}
+            if entry['status'] == 'error':
+                result['error'] = entry['error']
+            elif not applied:
+                result['status'] = 'skipped'
+            elif 'item' in entry:
+                result['data'] = plan['created_by_item'][id(entry['item'])]
+            elif 'key' in entry:
+                result['data'] = plan['key_results'][entry['key']]
+            else:
+                result['data'] = entry['data']
+            results.append(result)
+
+        return {
+            'applied': applied,
+            'results': results,
+            'created': [r['data'] for r in results if r['status'] == 'created'],
+            'updated': [r['data'] for r in results if r['status'] == 'updated'],
+            'patched': plan['patched_results'] if applied else [],
+            'errors': plan['errors']
+        }
+
+    def delete_batch(self, user_id, data_ids, atomic=False):
+        """Xóa nhiều item trong một transaction, kết quả theo vị trí của từng ID"""
+        results = []
+        errors = []
+        valid_ids = []
+        for index, raw_id in enumerate(data_ids):
+            data_id = self._coerce_id({'id': raw_id})
+            if data_id is None:
+                error = f"Invalid id {raw_id!r}"
+                errors.append(error)
+                results.append({'index': index, 'status': 'error', 'error': error})
+            else:
+                valid_ids.append(data_id)
+                results.append({'index': index, 'status': 'deleted', 'id': data_id})
+
+        # Chỉ các item thuộc user (một truy vấn IN theo chunk)
+        owned_types = AppData.find_types(user_id, valid_ids)
+        for result in results:
+            if result['status'] == 'deleted' and result['id'] not in owned_types:
+                error = f"Item {result['id']} not found or not owned by user"
+                errors.append(error)
+                result.update(status='error', error=error)
+
+        applied = not (atomic and errors)
+        if not applied:
+            for result in results:
+                if result['status'] == 'deleted':
+                    result['status'] = 'skipped'
+            return {'applied': False, 'results': results, 'deleted': [], 'errors': errors}
+
+        deleted_ids = sorted(owned_types)
+        try:
+            if deleted_ids:
+                table = AppData.__table__
+                for start in range(0, len(deleted_ids), 500):
+                    chunk = deleted_ids[start:start + 500]
+                    db.session.execute(
+                        table.delete().where(table.c.user_id == user_id, table.c.id.in_(chunk))
+                    )
+                self.change_log.record_changes(user_id, [
+                    (ChangeLog.OP_DELETE, data_id, owned_types[data_id])
+                    for data_id in deleted_ids
+                ])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return {'applied': True, 'results': results, 'deleted': deleted_ids, 'errors': errors}
+
+    def _plan_upsert(self, user_id, data_items, mode=None):
+        """Kiểm tra quyền sở hữu và chuẩn bị dữ liệu ghi, hoàn toàn trong bộ nhớ
+
+        mode = 'create' / 'update' giới hạn loại thao tác được phép (batch API).
+        """
+        # Prefetch tất cả item được tham chiếu bằng một truy vấn IN
+        referenced_ids = []
+        for item_data in data_items:
+            item_id = self._coerce_id(item_data)
+            if item_id is not None:
+                referenced_ids.append(item_id)
+
+        existing = {}
+        if referenced_ids:
+            for item in AppData.find_by_ids(referenced_ids):
+                existing[item.id] = item
+
+        # Kết quả đã lưu của các item key (một truy vấn IN)
+        item_keys = [
+            item_data.get('idempotency_key') for item_data in data_items
+            if isinstance(item_data, dict) and IdempotencyService.is_valid_key(item_data.get('idempotency_key'))
+        ]
+        stored_results = self.idempotency.find_item_results(user_id, item_keys)
+
+        # Trạng thái hiện tại của các item được cập nhật (nhiều lần cập nhật cùng id sẽ cộng dồn)
+        pending_updates = {}
+        original_types = {}
+        updated_results = []
+        patched_results = []
+        replayed_results = []
+        new_items = []
+        # item key -> ('update', result dict) / ('create', AppData mới)
+        pending_keys = {}
+        duplicate_keys = []
+        errors = []
+        # Kết quả theo vị trí của từng item trong payload
+        item_results = []
+
+        for index, item_data in enumerate(data_items):
+            try:
+                item_id = item_data.get('id')
+                item_key = self._item_key(item_data)
+                if item_key is not None:
+                    if item_key in stored_results:
+                        replayed_results.append(stored_results[item_key])
+                        item_results.append({'index': index, 'status': 'replayed', 'data': stored_results[item_key]})
+                        continue
+                    if item_key in pending_keys:
+                        # Trùng key trong cùng batch: trả lại kết quả của lần đầu
+                        duplicate_keys.append(item_key)
+                        item_results.append({'index': index, 'status': 'replayed', 'key': item_key})
+                        continue
+
+                if mode == 'create' and item_id:
+                    raise ValueError(f"Item {item_id} already has an id")
+                if mode == 'update' and not item_id:
+                    raise ValueError("Missing required field 'id'")
+
+                if item_id:
+                    key = self._coerce_id(item_data)
+                    existing_item = existing.get(key)
+                    if not existing_item or not existing_item.is_owned_by(user_id):
+                        error = f"Item {item_id} not found or not owned by user"
+                        errors.append(error)
+                        item_results.append({'index': index, 'status': 'error', 'error': error})
+                        continue
+
+                    current = pending_updates.get(key) or {
+                        'type': existing_item.type,
+                        'title': existing_item.title,
+                        'content': existing_item.content,
+                        'content_hash': existing_item.content_hash
+                    }
+                    if 'patch' in item_data:
+                        # Patch được áp dụng lên version hiện tại (kể cả thay đổi trước đó trong batch)
+                        current = dict(current, content=self._apply_item_patch(
+                            item_id, item_data, current['content'], current['content_hash']
+                        ))
+                    values = {
+                        field: item_data.get(field, current[field])
+                        for field in self.WRITABLE_FIELDS
+                    }
+                    self._validate(values)
+                    values['updated_at'] = datetime.utcnow()
+                    values['content_hash'] = AppData.compute_hash(values['type'], values['title'], values['content'])
+                    pending_updates[key] = values
+                    original_types[key] = existing_item.type
+
+                    result = {
+                        'id': existing_item.id,
+                        'type': values['type'],
+                        'title': values['title'],
+                        'content': values['content'],
+                        'created_at': existing_item.created_at.isoformat() if existing_item.created_at else None,
+                        'updated_at': values['updated_at'].isoformat(),
+                        'content_hash': values['content_hash']
+                    }
+                    updated_results.append(result)
+                    item_results.append({'index': index, 'status': 'updated', 'data': result})
+                    if item_key is not None:
+                        pending_keys[item_key] = ('update', result)
+                    if 'patch' in item_data:
+                        patched_results.append(self._patch_result(
+                            existing_item.id, item_data, current['content_hash'], values['content_hash']
+                        ))
+                else:
+                    values = {field: item_data.get(field) for field in self.WRITABLE_FIELDS}
+                    self._validate(values)
+                    new_item = AppData(
+                        user_id=user_id,
+                        type=values['type'],
+                        title=values['title'],
+                        content=values['content']
+                    )
+                    new_items.append(new_item)
+                    item_results.append({'index': index, 'status': 'created', 'item': new_item})
+                    if item_key is not None:
+                        pending_keys[item_key] = ('create', new_item)
+
+            except Exception as item_error:
+                error = f"Error processing item: {str(item_error)}"
+                errors.append(error)
+                item_results.append({'index': index, 'status': 'error', 'error': error})
+                continue
+
+        return {
+            'pending_updates': pending_updates,
+            'original_types': original_types,
+            'updated_results': updated_results,
+            'patched_results': patched_results,
+            'replayed_results': replayed_results,
+            'new_items': new_items,
+            'pending_keys': pending_keys,
+            'duplicate_keys': duplicate_keys,
+            'item_results': item_results,
+            'errors': errors
+        }
+
+    def _apply_plan(self, user_id, plan):
+        """Ghi kế hoạch vào session (chưa commit), trả về sync dict của các item mới"""
+        if plan['pending_updates']:
+            table = AppData.__table__
+            statement = table.update()\
+                             .where(table.c.id == bindparam('_id'))\
+                             .values(
+                                 type=bindparam('type'),
+                                 title=bindparam('title'),
+                                 content=bindparam('content'),
+                                 updated_at=bindparam('updated_at'),
+                                 content_hash=bindparam('content_hash')
+                             )
+            params = [
+                dict(values, _id=item_id)
+                for item_id, values in plan['pending_updates'].items()
+            ]
+            # Danh sách tham số => executemany
+            db.session.execute(statement, params)
+
+        new_items = plan['new_items']
+        if new_items:
+            db.session.add_all(new_items)
+            db.session.flush()
+
+        # Change log được ghi trong cùng transaction
+        changes = [
+            (ChangeLog.OP_UPDATE, item_id, values['type'], plan['original_types'][item_id])
+            for item_id, values in plan['pending_updates'].items()
+        ]
+        changes.extend(
+            (ChangeLog.OP_CREATE, item.id, item.type)
+            for item in new_items
+        )
+        self.change_log.record_changes(user_id, changes)
+
+        # Serialize trước khi commit để tránh reload sau expire_on_commit
+        created_results = [item.to_sync_dict() for item in new_items]
+
+        # Lưu kết quả theo item key trong cùng transaction
+        created_by_item = {id(item): result for item, result in zip(new_items, created_results)}
+        plan['created_by_item'] = created_by_item
+        if plan['pending_keys']:
+            key_results = {
+                key: created_by_item[id(target)] if kind == 'create' else target
+                for key, (kind, target) in plan['pending_keys'].items()
+            }
+            self.idempotency.store_item_results(user_id, key_results)
+            plan['replayed_results'].extend(key_results[key] for key in plan['duplicate_keys'])
+            plan['key_results'] = key_results
+
+        return created_results
+
+    def _apply_item_patch(self, item_id, item_data, content, current_hash):
+        """Áp dụng patch của item lên content hiện tại, kiểm tra base_hash nếu có"""
+        base_hash = item_data.get('base_hash')
+        if base_hash and base_hash != current_hash:
+            raise ValueError(f"Item {item_id} version conflict")
+        patch_type = normalize_patch_type(item_data.get('patch_type'))
+        return patch_json_text(content, item_data['patch'], patch_type)
+
+    @staticmethod
+    def _patch_result(item_id, item_data, base_hash, content_hash):
+        """Diff gửi qua realtime thay cho toàn bộ content"""
+        return {
+            'id': item_id,
+            'patch': item_data['patch'],
+            'patch_type': normalize_patch_type(item_data.get('patch_type')),
+            'base_hash': base_hash,
+            'content_hash': content_hash
+        }
+
+    @staticmethod
+    def _item_key(item_data):
+        """Lấy idempotency_key của item (None nếu không có), lỗi nếu không hợp lệ"""
+        item_key = item_data.get('idempotency_key')
+        if item_key is None:
+            return None
+        if not IdempotencyService.is_valid_key(item_key):
+            raise ValueError("Invalid idempotency key")
+        return item_key
+
+    def _validate(self, values):
+        """Kiểm tra các field bắt buộc (type, content)"""
+        for field in ('type', 'content'):
+            if values.get(field) is None:
+                raise ValueError(f"Missing required field '{field}'")
+
+    @staticmethod
+    def _coerce_id(item_data):
+        """Chuẩn hóa ID từ payload về int (None nếu không hợp lệ)"""
+        try:
+            item_id = item_data.get('id')
+            return int(item_id) if item_id else None
+        except (AttributeError, TypeError, ValueError):
+            return None
@@ -0,0 +1,214 @@
+# Service ghi và đọc change log cho delta sync
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from models.ChangeLog import ChangeLog
+from models.UserStats import UserStats
+from config.db import db
+from config.env import Config
+from services.data_cache_service import data_cache
+from utils.cursor import encode_cursor, decode_cursor
+from utils.logger import logger
+
+class ChangeLogService:
+    """Service quản lý change log (seq đơn điệu, tombstone cho delete) và thống kê user"""
+
+    def __init__(self):
+        self.retention_days = Config.CHANGE_LOG_RETENTION_DAYS
+
+    # ===== Ghi change log (trong transaction hiện tại, không commit) =====
+
+    def record_changes(self, user_id, changes):
+        """Ghi nhiều thay đổi và cập nhật thống kê của user
+
+        Mỗi phần tử là tuple (op, data_id, type) hoặc (op, data_id, type,
+        previous_type) khi một update đổi type của item.
+        """
+        if not changes:
+            return
+
+        now = datetime.utcnow()
+        rows = []
+        deltas = {}
+        for change in changes:
+            op, data_id, data_type = change[:3]
+            previous_type = change[3] if len(change) > 3 else None
+
+            rows.append({
+                'user_id': user_id,
+                'data_id': data_id,
+                'op': op,
+                'type': data_type,
+                'changed_at': now
+            })
+
+            if op == ChangeLog.OP_CREATE:
+                deltas[data_type] = deltas.get(data_type, 0) + 1
+            elif op == ChangeLog.OP_DELETE:
+                deltas[data_type] = deltas.get(data_type, 0) - 1
+            else:
+                deltas.setdefault(data_type, 0)
+                if previous_type is not None and previous_type != data_type:
+                    deltas[previous_type] = deltas.get(previous_type, 0) - 1
+                    deltas[data_type] += 1
+
+        db.session.execute(ChangeLog.__table__.insert(), rows)
+        UserStats.apply_deltas(user_id, deltas, now)
+        
+        # Cache đọc của user được invalidate khi transaction commit
+        data_cache.invalidate_changes(db.session, user_id, changes)
+
+    def record_created(self, user_id, data_id, data_type):
+        """Ghi nhận item mới được tạo"""
+        self.record_changes(user_id, [(ChangeLog.OP_CREATE, data_id, data_type)])
+
+    def record_updated(self, user_id, data_id, data_type, previous_type=None):
+        """Ghi nhận item được cập nhật"""
+        self.record_changes(user_id, [(ChangeLog.OP_UPDATE, data_id, data_type, previous_type)])
+
+    def record_deleted(self, user_id, data_id, data_type):
+        """Ghi nhận item bị xóa (tombstone)"""
+        self.record_changes(user_id, [(ChangeLog.OP_DELETE, data_id, data_type)])
+
+    # ===== Cursor =====
+
+    def make_cursor(self, seq, issued_at=None):
+        """Tạo cursor opaque từ seq"""
+        if issued_at is None:
+            issued_at = time.time()
+        return encode_cursor({'s': int(seq), 't': int(issued_at)})
+
+    def is_expired(self, issued_at):
+        """Cursor cũ hơn thời gian lưu tombstone bị coi là hết hạn
+
+        Các delete cũ hơn có thể đã bị compact nên client phải full sync lại.
+        """
+        return issued_at < time.time() - self.retention_days * 86400
+
+    def make_caught_up_cursor(self, seq, since_seq=None, issued_at=None):
+        """Cursor cho client đã theo kịp tới seq
+
+        Không có thay đổi mới (seq == since_seq) thì trả lại đúng cursor của
+        client để URL poll tiếp theo không đổi và conditional GET trả được 304;
+        chỉ đóng dấu thời điểm mới khi cursor đã qua nửa thời gian lưu tombstone.
+        """
+        if (seq == since_seq and issued_at is not None
+                and issued_at >= time.time() - self.retention_days * 86400 / 2):
+            return self.make_cursor(seq, issued_at)
+        return self.make_cursor(seq)
+
+    def parse_cursor(self, cursor):
+        """Giải mã cursor delta, trả về (seq, issued_at, expired)"""
+        payload = decode_cursor(cursor)
+        if 'm' in payload:
+            # Continuation token của full sync, không phải cursor delta
+            raise ValueError("Cursor không hợp lệ")
+
+        try:
+            seq = int(payload['s'])
+            issued_at = int(payload['t'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Cursor không hợp lệ")
+
+        return seq, issued_at, self.is_expired(issued_at)
+
+    # ===== Đọc change log =====
+
+    def get_current_cursor(self, user_id):
+        """Cursor trỏ tới thay đổi mới nhất của user"""
+        return self.make_cursor(ChangeLog.get_latest_seq(user_id))
+
+    def get_changed_ids_since(self, user_id, since_seq):
+        """Lấy ID các item thay đổi kể từ since_seq, gộp theo item
+
+        Trả về dict gồm 'changed' (ID được tạo/cập nhật), 'deleted' (ID đã bị
+        xóa) và 'seq' (seq lớn nhất đã đọc).
+        """
+        entries = ChangeLog.find_since(user_id, since_seq)
+
+        # Chỉ giữ thao tác cuối cùng của mỗi item
+        last_op = {}
+        latest_seq = since_seq
+        for entry in entries:
+            last_op[entry.data_id] = entry.op
+            latest_seq = max(latest_seq, entry.seq)
+
+        return {
+            'changed': [
+                data_id for data_id, op in last_op.items()
+                if op != ChangeLog.OP_DELETE
+            ],
+            'deleted': [
+                data_id for data_id, op in last_op.items()
+                if op == ChangeLog.OP_DELETE
+            ],
+            'seq': latest_seq
+        }
+
+    # ===== Compaction =====
+
+    def compact(self, retention_days=None):
+        """Dọn change log: bỏ entry đã bị ghi đè và tombstone quá hạn
+
+        Entry mới nhất của mỗi user luôn được giữ lại để seq hiện tại của user
+        không bao giờ giảm.
+        """
+        if retention_days is None:
+            retention_days = self.retention_days
+
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=retention_days)
+
+            table = ChangeLog.__table__
+
+            # Entry bị thay thế bởi thay đổi mới hơn trên cùng item
+            latest_per_item = select(func.max(table.c.seq))\
+                .group_by(table.c.user_id, table.c.data_id)
+            superseded = db.session.execute(
+                table.delete().where(table.c.seq.notin_(latest_per_item))
+            ).rowcount
+
+            # Tombstone quá hạn (giữ lại entry mới nhất của mỗi user)
+            latest_per_user = select(func.max(table.c.seq)).group_by(table.c.user_id)
+            expired = db.session.execute(
+                table.delete().where(
+                    table.c.op == ChangeLog.OP_DELETE,
+                    table.c.changed_at < cutoff,
+                    table.c.seq.notin_(latest_per_user)
+                )
+            ).rowcount
+
+            db.session.commit()
+
+            logger.info(f"Change log compacted: {superseded} superseded, {expired} expired tombstones removed")
+            return {'superseded': superseded, 'expired': expired}
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error compacting change log: {str(e)}")
+            raise e
+
+    def start_compaction_worker(self, app, interval=None):
+        """Chạy compaction định kỳ trong background thread"""
+        if interval is None:
+            interval = Config.CHANGE_LOG_COMPACT_INTERVAL
+
+        if interval <= 0:
+            logger.info("Change log compaction worker disabled")
+            return None
+
+        def worker():
+            while True:
+                time.sleep(interval)
+                try:
+                    with app.app_context():
+                        self.compact()
+                        db.session.remove()
+                except Exception as e:
+                    logger.error(f"Change log compaction worker error: {str(e)}")
+
+        thread = threading.Thread(target=worker, name='change-log-compactor', daemon=True)
+        thread.start()
+        logger.info(f"Change log compaction worker started (interval: {interval}s)")
+        return thread
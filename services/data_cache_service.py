@@ -0,0 +1,134 @@
+# Cache đọc AppData theo user, invalidate chính xác sau khi transaction ghi commit
+from flask import request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from config.env import Config
+from models.ChangeLog import ChangeLog
+from utils.cache import MemoryCacheBackend, NullCacheBackend
+from utils.logger import logger
+
+# Key trong session.info chứa các invalidate chờ commit
+PENDING_KEY = 'data_cache_pending'
+
+# Key trong WSGI environ chứa version dữ liệu đã đọc trong request (user_id -> seq)
+VERSION_ENVIRON_KEY = 'app.data_versions'
+
+# Tag cho các danh sách không lọc theo type
+TAG_ALL = 'all'
+
+class DataCacheService:
+    """Read-through cache cho các API đọc AppData, namespace theo user
+
+    Entry được gắn tag theo item ('item:<id>'), theo type ('type:<type>') và
+    TAG_ALL cho danh sách không lọc. Thay đổi ghi qua ChangeLogService được
+    gom theo session và chỉ invalidate sau khi commit thành công.
+
+    Key của entry kèm version dữ liệu của user (seq mới nhất trong change log)
+    nên worker khác ghi dữ liệu thì entry cũ ở worker này không còn được dùng,
+    kể cả khi chưa bị invalidate (invalidate theo tag chỉ có trong process ghi).
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or self._create_backend()
+
+    @staticmethod
+    def _create_backend():
+        """Chọn backend theo cấu hình DATA_CACHE_BACKEND"""
+        if not Config.DATA_CACHE_ENABLED or Config.DATA_CACHE_BACKEND == 'none':
+            return NullCacheBackend()
+        if Config.DATA_CACHE_BACKEND != 'memory':
+            logger.warning(f"Unknown cache backend '{Config.DATA_CACHE_BACKEND}', using memory")
+        return MemoryCacheBackend(
+            max_entries=Config.DATA_CACHE_MAX_ENTRIES,
+            max_bytes=Config.DATA_CACHE_MAX_BYTES,
+            default_ttl=Config.DATA_CACHE_TTL,
+            max_entry_bytes=Config.DATA_CACHE_MAX_ENTRY_BYTES
+        )
+
+    # ===== Đọc =====
+
+    def get_or_load(self, user_id, key, loader, tags):
+        """Lấy từ cache theo version dữ liệu hiện tại, nếu miss thì gọi loader() và lưu kết quả"""
+        if isinstance(self.backend, NullCacheBackend):
+            return loader()
+
+        key = (self.current_version(user_id),) + tuple(key)
+        hit, value = self.backend.get(user_id, key)
+        if hit:
+            return value
+
+        generation = self.backend.generation(user_id)
+        value = loader()
+        if value is not None:
+            self.backend.set(user_id, key, value, tags=tags, generation=generation)
+        return value
+
+    @staticmethod
+    def remember_version(user_id, version):
+        """Ghi nhận version đã đọc trong request (conditional_get) để body và ETag cùng version"""
+        if has_request_context():
+            request.environ.setdefault(VERSION_ENVIRON_KEY, {})[user_id] = version
+
+    @staticmethod
+    def current_version(user_id):
+        """Version dữ liệu của user: dùng lại version đã đọc trong request, nếu chưa có thì đọc DB"""
+        if has_request_context():
+            versions = request.environ.get(VERSION_ENVIRON_KEY, {})
+            if user_id in versions:
+                return versions[user_id]
+        return ChangeLog.get_latest_seq(user_id)
+
+    @staticmethod
+    def item_tags(data_id):
+        return (f"item:{data_id}",)
+
+    @staticmethod
+    def list_tags(data_type=None):
+        return (f"type:{data_type}",) if data_type else (TAG_ALL,)
+
+    # ===== Invalidate =====
+
+    def invalidate_changes(self, session, user_id, changes):
+        """Ghi nhận các thay đổi (tuple giống ChangeLogService.record_changes) để invalidate khi commit"""
+        tags = session.info.setdefault(PENDING_KEY, {}).setdefault(user_id, set())
+        tags.add(TAG_ALL)
+        for change in changes:
+            op, data_id, data_type = change[:3]
+            previous_type = change[3] if len(change) > 3 else None
+            tags.add(f"item:{data_id}")
+            tags.add(f"type:{data_type}")
+            if previous_type is not None:
+                tags.add(f"type:{previous_type}")
+
+    def invalidate_user(self, user_id):
+        """Xóa toàn bộ cache của user (ví dụ khi xóa tài khoản)"""
+        return self.backend.invalidate_namespace(user_id)
+
+    def apply_pending(self, session):
+        """Thực hiện các invalidate đã gom của session (sau commit)"""
+        pending = session.info.pop(PENDING_KEY, None)
+        if not pending:
+            return
+        for user_id, tags in pending.items():
+            self.backend.invalidate_tags(user_id, tags)
+
+    @staticmethod
+    def discard_pending(session):
+        """Bỏ các invalidate đã gom khi transaction rollback"""
+        session.info.pop(PENDING_KEY, None)
+
+    def stats(self):
+        """Thống kê hit/miss của cache"""
+        return self.backend.stats()
+
+data_cache = DataCacheService()
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    data_cache.apply_pending(session)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    data_cache.discard_pending(session)
+
+__all__ = ['DataCacheService', 'data_cache']
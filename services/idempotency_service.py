@@ -0,0 +1,198 @@
+# Service chống trùng lặp thao tác ghi bằng idempotency key
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+from models.IdempotencyKey import IdempotencyKey
+from config.db import db
+from config.env import Config
+from utils.logger import logger
+
+class IdempotencyService:
+    """Service lưu kết quả của các thao tác ghi theo key do client cung cấp
+
+    Request lặp lại (cùng key) được trả lời bằng kết quả đã lưu mà không
+    chạm vào app_data. Key theo request dùng header Idempotency-Key; key theo
+    item dùng field 'idempotency_key' trong payload sync.
+    """
+
+    # Trạng thái khi bắt đầu xử lý một request
+    STATE_NEW = 'new'
+    STATE_COMPLETED = 'completed'
+    STATE_IN_PROGRESS = 'in_progress'
+    STATE_MISMATCH = 'mismatch'
+
+    def __init__(self):
+        self.ttl = Config.IDEMPOTENCY_TTL
+        self.lock_timeout = Config.IDEMPOTENCY_LOCK_TIMEOUT
+
+    @staticmethod
+    def hash_request(method, path, body):
+        """Băm request để phát hiện key bị dùng lại với payload khác"""
+        digest = hashlib.sha256()
+        digest.update(f"{method} {path}\n".encode('utf-8'))
+        digest.update(body or b'')
+        return digest.hexdigest()
+
+    @staticmethod
+    def is_valid_key(key):
+        """Key hợp lệ: chuỗi không rỗng, không quá MAX_KEY_LENGTH ký tự"""
+        return isinstance(key, str) and 0 < len(key) <= IdempotencyKey.MAX_KEY_LENGTH
+
+    # ===== Key theo request =====
+
+    def begin_request(self, user_id, key, request_hash):
+        """Giữ chỗ cho key (commit ngay), trả về (state, record)
+
+        Chỉ một request với cùng key được xử lý tại một thời điểm; các request
+        trùng sau đó nhận kết quả đã lưu hoặc trạng thái đang xử lý.
+        Với STATE_NEW, record là thời điểm giữ chỗ (truyền lại cho
+        complete_request / release_request). Chỗ giữ quá lock_timeout giây mà
+        chưa có kết quả (worker chết giữa chừng) được coi như bỏ và lấy lại được.
+        """
+        now = datetime.utcnow()
+        try:
+            # Key đã hết hạn, hoặc chỗ giữ đã quá hạn khóa, được coi như chưa từng tồn tại
+            db.session.query(IdempotencyKey).filter(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.scope == IdempotencyKey.SCOPE_REQUEST,
+                IdempotencyKey.key == key,
+                or_(
+                    IdempotencyKey.expires_at <= now,
+                    and_(
+                        IdempotencyKey.status_code.is_(None),
+                        IdempotencyKey.created_at <= now - timedelta(seconds=self.lock_timeout)
+                    )
+                )
+            ).delete(synchronize_session=False)
+
+            inserted = IdempotencyKey.insert_ignore([{
+                'user_id': user_id,
+                'scope': IdempotencyKey.SCOPE_REQUEST,
+                'key': key,
+                'request_hash': request_hash,
+                'created_at': now,
+                'expires_at': now + timedelta(seconds=self.ttl)
+            }])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if inserted:
+            return self.STATE_NEW, now
+
+        record = IdempotencyKey.find(user_id, IdempotencyKey.SCOPE_REQUEST, key, now)
+        if record is None:
+            # Bị xóa giữa chừng (hết hạn / release), coi như trùng đang xử lý
+            return self.STATE_IN_PROGRESS, None
+        if record.request_hash != request_hash:
+            return self.STATE_MISMATCH, record
+        if not record.is_completed:
+            return self.STATE_IN_PROGRESS, record
+        return self.STATE_COMPLETED, record
+
+    def _reservation(self, user_id, key, reserved_at):
+        """Chỗ giữ do chính request này tạo (chưa bị request khác lấy lại sau khi quá hạn khóa)"""
+        return db.session.query(IdempotencyKey).filter_by(
+            user_id=user_id,
+            scope=IdempotencyKey.SCOPE_REQUEST,
+            key=key,
+            created_at=reserved_at,
+            status_code=None
+        )
+
+    def complete_request(self, user_id, key, reserved_at, status_code, body):
+        """Lưu kết quả của request đã xử lý xong"""
+        try:
+            self._reservation(user_id, key, reserved_at).update({
+                'status_code': status_code,
+                'response': body
+            }, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error storing idempotent result for user {user_id}: {str(e)}")
+
+    def release_request(self, user_id, key, reserved_at):
+        """Bỏ giữ chỗ khi request thất bại để client có thể thử lại"""
+        try:
+            self._reservation(user_id, key, reserved_at).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error releasing idempotency key for user {user_id}: {str(e)}")
+
+    # ===== Key theo item (trong transaction của bulk upsert, không commit) =====
+
+    def find_item_results(self, user_id, keys):
+        """Lấy kết quả đã lưu của các item key, trả về dict key -> kết quả (dict)"""
+        if not keys:
+            return {}
+        records = IdempotencyKey.find_many(user_id, IdempotencyKey.SCOPE_ITEM, keys)
+        return {
+            key: json.loads(record.response)
+            for key, record in records.items()
+            if record.response
+        }
+
+    def store_item_results(self, user_id, results):
+        """Lưu kết quả theo item key (results: dict key -> kết quả)"""
+        if not results:
+            return
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        # Ghi đè key cũ đã hết hạn nhưng chưa được dọn
+        IdempotencyKey.upsert([
+            {
+                'user_id': user_id,
+                'scope': IdempotencyKey.SCOPE_ITEM,
+                'key': key,
+                'request_hash': None,
+                'status_code': 200,
+                'response': json.dumps(result, ensure_ascii=False, separators=(',', ':')),
+                'created_at': now,
+                'expires_at': expires_at
+            }
+            for key, result in results.items()
+        ])
+
+    # ===== Dọn key hết hạn =====
+
+    def purge_expired(self):
+        """Xóa các key đã hết hạn"""
+        try:
+            removed = IdempotencyKey.delete_expired()
+            db.session.commit()
+            logger.info(f"Idempotency keys purged: {removed} expired")
+            return removed
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error purging idempotency keys: {str(e)}")
+            raise e
+
+    def start_cleanup_worker(self, app, interval=None):
+        """Chạy dọn key hết hạn định kỳ trong background thread"""
+        if interval is None:
+            interval = Config.IDEMPOTENCY_CLEANUP_INTERVAL
+
+        if interval <= 0:
+            logger.info("Idempotency cleanup worker disabled")
+            return None
+
+        def worker():
+            while True:
+                time.sleep(interval)
+                try:
+                    with app.app_context():
+                        self.purge_expired()
+                        db.session.remove()
+                except Exception as e:
+                    logger.error(f"Idempotency cleanup worker error: {str(e)}")
+
+        thread = threading.Thread(target=worker, name='idempotency-cleanup', daemon=True)
+        thread.start()
+        logger.info(f"Idempotency cleanup worker started (interval: {interval}s)")
+        return thread
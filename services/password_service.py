@@ -0,0 +1,185 @@
+# Hash / kiểm tra mật khẩu bcrypt trên pool worker có giới hạn, tách khỏi thread xử lý request
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+from config.env import Config
+from utils.logger import logger
+
+# '$2b$12$...' -> cost = 12
+HASH_COST_PATTERN = re.compile(r'^\$2[abxy]?\$(\d{2})\$')
+
+class PasswordPoolBusyError(RuntimeError):
+    """Pool hash đã đầy (hoặc chờ quá lâu): request nên trả 503 để client thử lại"""
+
+def _hash_password(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _check_password(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+def hash_cost(hashed):
+    """Cost (log2 rounds) của một bcrypt hash, None nếu không đọc được"""
+    match = HASH_COST_PATTERN.match(hashed or '')
+    return int(match.group(1)) if match else None
+
+class PasswordService:
+    """Chạy bcrypt trên pool riêng với số việc đang chờ bị giới hạn
+
+    Tối đa `workers + queue_limit` việc được nhận cùng lúc; vượt quá thì
+    raise PasswordPoolBusyError ngay thay vì xếp hàng (và giữ thread request)
+    không giới hạn. Pool process dùng fork và được start sớm (start()) trước
+    khi app chạy các thread nền; nền tảng không có fork dùng pool thread
+    (bcrypt nhả GIL khi hash). workers = 0: hash ngay trên thread request.
+    """
+
+    def __init__(self, workers=None, queue_limit=None, rounds=None, timeout=None, executor=None):
+        self.workers = Config.PASSWORD_HASH_WORKERS if workers is None else workers
+        self.queue_limit = Config.PASSWORD_HASH_QUEUE_LIMIT if queue_limit is None else queue_limit
+        self.rounds = Config.PASSWORD_BCRYPT_ROUNDS if rounds is None else rounds
+        self.timeout = Config.PASSWORD_HASH_TIMEOUT if timeout is None else timeout
+        self.executor_kind = executor or Config.PASSWORD_HASH_EXECUTOR
+
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(self.workers, 1) + max(self.queue_limit, 0))
+
+        self._stats_lock = threading.Lock()
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._in_flight = 0
+        self._rehashed = 0
+
+    # ===== Pool =====
+
+    def start(self):
+        """Tạo pool và khởi động worker (gọi lúc khởi tạo app, trước các thread nền)"""
+        if self.workers <= 0:
+            return None
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+        # Pool fork tạo đủ worker ở lần submit đầu tiên
+        self._executor.submit(hash_cost, '').result()
+        return self._executor
+
+    def _create_executor(self):
+        if self.executor_kind == 'process' and 'fork' in multiprocessing.get_all_start_methods():
+            logger.info(f"Password hash pool: {self.workers} processes, queue limit {self.queue_limit}")
+            return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('fork'))
+
+        if self.executor_kind == 'process':
+            logger.warning("fork is not available, password hash pool uses threads")
+        logger.info(f"Password hash pool: {self.workers} threads, queue limit {self.queue_limit}")
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+            return self._executor
+
+    def _reset_executor(self, broken):
+        with self._executor_lock:
+            if self._executor is broken:
+                logger.error("Password hash pool is broken, recreating")
+                self._executor = None
+        broken.shutdown(wait=False)
+
+    def shutdown(self):
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _run(self, function, *args):
+        """Chạy function trên pool; raise PasswordPoolBusyError nếu pool đầy hoặc quá timeout"""
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._rejected += 1
+            raise PasswordPoolBusyError("Password hash pool is saturated")
+
+        with self._stats_lock:
+            self._in_flight += 1
+        released = threading.Event()
+
+        def release(_future=None):
+            # Slot chỉ được trả khi việc thật sự xong (kể cả khi request đã thôi chờ do timeout)
+            with self._stats_lock:
+                if released.is_set():
+                    return
+                released.set()
+                self._in_flight -= 1
+            self._slots.release()
+
+        future = None
+        try:
+            if self.workers <= 0:
+                result = function(*args)
+            else:
+                for attempt in range(2):
+                    executor = self._get_executor()
+                    try:
+                        future = executor.submit(function, *args)
+                        result = future.result(timeout=self.timeout)
+                        break
+                    except BrokenProcessPool:
+                        # Worker chết (OOM kill...): tạo lại pool và thử lại một lần
+                        self._reset_executor(executor)
+                        if attempt:
+                            raise
+        except FutureTimeoutError:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise PasswordPoolBusyError("Password hash timed out")
+        finally:
+            # Giữ slot qua cả lần thử lại: chỉ trả khi lần chạy cuối cùng xong
+            # (add_done_callback gọi ngay nếu future đã xong)
+            if future is None:
+                release()
+            else:
+                future.add_done_callback(release)
+
+        with self._stats_lock:
+            self._completed += 1
+        return result
+
+    # ===== API =====
+
+    def hash(self, password, rounds=None):
+        """Hash mật khẩu với cost cấu hình, trả về str"""
+        return self._run(_hash_password, password.encode('utf-8'), rounds or self.rounds)
+
+    def verify(self, password, hashed):
+        """Kiểm tra mật khẩu với hash đã lưu"""
+        return self._run(_check_password, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def needs_rehash(self, hashed):
+        """Hash được tạo với cost khác cấu hình hiện tại"""
+        return hash_cost(hashed) != self.rounds
+
+    def record_rehash(self):
+        with self._stats_lock:
+            self._rehashed += 1
+
+    def stats(self):
+        """Thống kê pool (số việc đang chạy / bị từ chối / timeout)"""
+        with self._stats_lock:
+            return {
+                'executor': self.executor_kind if self.workers > 0 else 'inline',
+                'workers': self.workers,
+                'queue_limit': self.queue_limit,
+                'rounds': self.rounds,
+                'in_flight': self._in_flight,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'timeouts': self._timeouts,
+                'rehashed': self._rehashed
+            }
+
+password_service = PasswordService()
+
+__all__ = ['PasswordPoolBusyError', 'PasswordService', 'hash_cost', 'password_service']
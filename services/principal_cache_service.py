@@ -0,0 +1,88 @@
+# Cache thông tin user đã xác thực (principal) cho các decorator auth, tránh query users mỗi request
+from collections import namedtuple
+from config.env import Config
+from models.User import User
+from utils.cache import MemoryCacheBackend, NullCacheBackend
+
+# Thông tin user mà các handler cần; bất biến nên dùng chung giữa các request / thread được.
+# Principal dựng từ claims của token (chế độ stateless) không có email / created_at.
+AuthenticatedPrincipal = namedtuple('AuthenticatedPrincipal', ['id', 'username', 'email', 'created_at', 'role'])
+
+PRINCIPAL_KEY = 'principal'
+
+class PrincipalCacheService:
+    """Cache TTL có giới hạn: user_id -> AuthenticatedPrincipal
+
+    Mỗi user là một namespace của backend nên invalidate chỉ chạm tới user đó,
+    và generation của namespace chặn việc lưu lại bản đọc trước khi invalidate.
+    Không cache kết quả "không tồn tại". Invalidate chỉ có hiệu lực trong
+    process hiện tại; các process khác thấy thay đổi sau tối đa TTL giây.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or self._create_backend()
+
+    @staticmethod
+    def _create_backend():
+        if not Config.AUTH_CACHE_ENABLED:
+            return NullCacheBackend()
+        return MemoryCacheBackend(
+            max_entries=Config.AUTH_CACHE_MAX_ENTRIES,
+            max_bytes=Config.AUTH_CACHE_MAX_ENTRIES * 1024,
+            default_ttl=Config.AUTH_CACHE_TTL
+        )
+
+    @staticmethod
+    def from_user(user):
+        return AuthenticatedPrincipal(user.id, user.username, user.email, user.created_at, user.role)
+
+    @staticmethod
+    def from_claims(claims):
+        """Principal từ access token mang claims (chế độ stateless), None nếu token không có claims"""
+        username = claims.get('username')
+        if username is None:
+            return None
+        try:
+            user_id = int(claims.get('sub'))
+        except (TypeError, ValueError):
+            return None
+        return AuthenticatedPrincipal(user_id, username, None, None, claims.get('role', User.ROLE_USER))
+
+    def resolve(self, user_id, claims):
+        """Principal của request: từ claims nếu token mang claims, ngược lại từ cache / database"""
+        return self.from_claims(claims) or self.get(user_id)
+
+    def get(self, user_id):
+        """Principal của user_id (từ cache hoặc database), None nếu user không tồn tại"""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+
+        hit, principal = self.backend.get(user_id, PRINCIPAL_KEY)
+        if hit:
+            return principal
+
+        generation = self.backend.generation(user_id)
+        user = User.find_by_id(user_id)
+        if user is None:
+            return None
+
+        principal = self.from_user(user)
+        self.backend.set(user_id, PRINCIPAL_KEY, principal, tags=(PRINCIPAL_KEY,), generation=generation)
+        return principal
+
+    def invalidate(self, user_id):
+        """Xóa principal của user (sau khi cập nhật profile / xóa tài khoản)"""
+        return self.backend.invalidate_tags(int(user_id), (PRINCIPAL_KEY,))
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        """Thống kê hit/miss (hit_rate) của cache"""
+        return self.backend.stats()
+
+principal_cache = PrincipalCacheService()
+
+__all__ = ['AuthenticatedPrincipal', 'PrincipalCacheService', 'principal_cache']
@@ -0,0 +1,142 @@
+# Service tìm kiếm full-text trên AppData (SQLite FTS5)
+import re
+from sqlalchemy import select, text, literal_column, table, column
+from models.AppData import AppData
+from config.db import db
+from utils.logger import logger
+
+# Bảng FTS5 dùng external content là view app_data_fts_source: view chuẩn hóa
+# dữ liệu trước khi index (đ -> d, content JSON -> các giá trị text), nên
+# trigger và rebuild luôn index cùng một nội dung.
+FTS_TABLE = 'app_data_fts'
+FTS_SOURCE_VIEW = 'app_data_fts_source'
+
+# unicode61 + remove_diacritics 2 bỏ dấu tiếng Việt (ễ -> e, ứ -> u...), riêng
+# 'đ' là chữ cái riêng nên được thay bằng 'd' trong view và trong câu truy vấn
+# Content nằm trong blob store (cột chỉ còn tham chiếu) không được index full-text.
+# View được tạo lại mỗi lần khởi động để database cũ nhận định nghĩa mới.
+FTS_SCHEMA = [
+    f"DROP VIEW IF EXISTS {FTS_SOURCE_VIEW}",
+    f"""
+    CREATE VIEW {FTS_SOURCE_VIEW} AS
+    SELECT
+        id,
+        'u' || user_id AS owner,
+        replace(replace(coalesce(title, ''), 'đ', 'd'), 'Đ', 'D') AS title,
+        replace(replace(
+            CASE WHEN content_blob IS NOT NULL THEN ''
+            WHEN json_valid(content) THEN (
+                SELECT group_concat(value, ' ') FROM json_tree(app_data.content)
+                WHERE type IN ('text', 'integer', 'real')
+            ) ELSE content END,
+        'đ', 'd'), 'Đ', 'D') AS content
+    FROM app_data
+    """,
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        owner, title, content,
+        content='{FTS_SOURCE_VIEW}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS app_data_fts_ai AFTER INSERT ON app_data BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, owner, title, content)
+        SELECT id, owner, title, content FROM {FTS_SOURCE_VIEW} WHERE id = new.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS app_data_fts_bd BEFORE DELETE ON app_data BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, owner, title, content)
+        SELECT 'delete', id, owner, title, content FROM {FTS_SOURCE_VIEW} WHERE id = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS app_data_fts_bu BEFORE UPDATE OF user_id, title, content ON app_data BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, owner, title, content)
+        SELECT 'delete', id, owner, title, content FROM {FTS_SOURCE_VIEW} WHERE id = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS app_data_fts_au AFTER UPDATE OF user_id, title, content ON app_data BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, owner, title, content)
+        SELECT id, owner, title, content FROM {FTS_SOURCE_VIEW} WHERE id = new.id;
+    END
+    """,
+]
+
+# Trọng số bm25 theo cột (owner, title, content): tiêu đề quan trọng hơn nội dung
+RANK_EXPRESSION = f"bm25({FTS_TABLE}, 0.0, 10.0, 1.0)"
+
+# Số từ tối đa trong một câu tìm kiếm
+MAX_TERMS = 10
+
+class SearchService:
+    """Service quản lý index FTS5 và tìm kiếm AppData theo user"""
+
+    def ensure_index(self):
+        """Tạo bảng FTS, view nguồn và trigger nếu chưa có; rebuild khi mới tạo"""
+        with db.engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': FTS_TABLE}
+            ).first()
+            for statement in FTS_SCHEMA:
+                conn.execute(text(statement))
+
+        if not exists:
+            logger.info(f"✅ Migration: created full-text index {FTS_TABLE}")
+            self.rebuild()
+
+    def rebuild(self):
+        """Index lại toàn bộ app_data (dùng cho database cũ hoặc khi index bị lệch)"""
+        with db.engine.begin() as conn:
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"))
+            count = conn.execute(text(
+                f"INSERT INTO {FTS_TABLE}(rowid, owner, title, content) "
+                f"SELECT id, owner, title, content FROM {FTS_SOURCE_VIEW}"
+            )).rowcount
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+
+        logger.info(f"✅ Full-text index rebuilt: {count} rows")
+        return count
+
+    @staticmethod
+    def build_match_query(user_id, query):
+        """Chuyển chuỗi tìm kiếm thành biểu thức MATCH của FTS5
+
+        Mỗi từ được tìm theo prefix, tất cả các từ phải xuất hiện trong title
+        hoặc content; luôn giới hạn trong dữ liệu của user. Trả về None nếu
+        câu tìm kiếm không có từ nào.
+        """
+        folded = (query or '').replace('đ', 'd').replace('Đ', 'D')
+        terms = re.findall(r'\w+', folded)[:MAX_TERMS]
+        if not terms:
+            return None
+
+        phrases = ' '.join(f'"{term}"*' for term in terms)
+        return f'owner:"u{int(user_id)}" AND {{title content}}: ({phrases})'
+
+    def search(self, user_id, query, data_type=None, limit=20, offset=0, fields=None):
+        """Tìm data của user theo độ liên quan, trả về (rows, has_more)
+
+        Mỗi row có các cột của `fields` và cột score (bm25, càng nhỏ càng liên quan).
+        """
+        match = self.build_match_query(user_id, query)
+        if match is None:
+            return [], False
+
+        fts = table(FTS_TABLE, column('rowid'))
+        statement = select(*AppData.columns_for(fields), literal_column(RANK_EXPRESSION).label('score'))\
+            .select_from(fts.join(AppData.__table__, AppData.id == fts.c.rowid))\
+            .where(text(f"{FTS_TABLE} MATCH :match"))\
+            .where(AppData.user_id == user_id)
+        if data_type:
+            statement = statement.where(AppData.type == data_type)
+
+        statement = statement.order_by(literal_column('score'), AppData.id)\
+                             .limit(limit + 1)\
+                             .offset(offset)
+
+        rows = db.session.execute(statement, {'match': match}).all()
+        return rows[:limit], len(rows) > limit
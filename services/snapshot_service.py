@@ -0,0 +1,166 @@
+# Service tạo và cache snapshot dữ liệu của user (nén gzip trên đĩa)
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from models.AppData import AppData
+from models.ChangeLog import ChangeLog
+from config.env import Config
+from utils.logger import logger
+
+class SnapshotService:
+    """Service quản lý snapshot có version cho force sync
+
+    Version của snapshot là seq mới nhất trong change log của user, nên mọi
+    thao tác ghi đều làm snapshot cũ hết hạn; snapshot được tạo lại khi có
+    request tiếp theo (lazy) và không bao giờ ghi vào app_data.
+    """
+
+    _locks = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, snapshot_dir=None):
+        self.snapshot_dir = os.path.abspath(snapshot_dir or Config.SNAPSHOT_DIR)
+        self.compression_level = Config.SNAPSHOT_COMPRESSION_LEVEL
+
+    def get_snapshot(self, user_id):
+        """Lấy metadata snapshot hiện tại của user, tạo lại nếu đã cũ"""
+        version = ChangeLog.get_latest_seq(user_id)
+
+        meta = self._load_meta(user_id)
+        if self._is_current(meta, version):
+            return meta
+
+        # Chỉ một thread tạo snapshot cho mỗi user tại một thời điểm
+        with self._lock_for(user_id):
+            meta = self._load_meta(user_id)
+            if self._is_current(meta, version):
+                return meta
+            return self._generate(user_id, version)
+
+    def get_snapshot_path(self, meta):
+        """Đường dẫn file snapshot (gzip) của metadata"""
+        return os.path.join(self.snapshot_dir, meta['file'])
+
+    def iter_uncompressed(self, meta, chunk_size=64 * 1024):
+        """Đọc nội dung snapshot đã giải nén theo từng chunk (cho client không hỗ trợ gzip)"""
+        with gzip.open(self.get_snapshot_path(meta), 'rb') as snapshot_file:
+            while True:
+                chunk = snapshot_file.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def delete(self, user_id):
+        """Xóa snapshot của user (khi xóa tài khoản)"""
+        meta = self._load_meta(user_id)
+        for path in (self._meta_path(user_id), meta and self.get_snapshot_path(meta)):
+            if path and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Could not remove snapshot file {path}: {str(e)}")
+
+    def _generate(self, user_id, version):
+        """Tạo snapshot mới: đọc theo chunk, nén và băm dần, ghi file tạm rồi rename"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+        filename = f"user_{user_id}_v{version}.json.gz"
+        path = os.path.join(self.snapshot_dir, filename)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        digest = hashlib.sha256()
+        item_count = 0
+        raw_size = 0
+
+        def write(raw_file, text):
+            nonlocal raw_size
+            data = text.encode('utf-8')
+            digest.update(data)
+            raw_size += len(data)
+            raw_file.write(data)
+
+        try:
+            with gzip.open(tmp_path, 'wb', compresslevel=self.compression_level) as raw_file:
+                write(raw_file, '{"user_id":%d,"version":%d,"items":[' % (user_id, version))
+                for rows in AppData.iter_user_rows(user_id, Config.SYNC_STREAM_CHUNK_SIZE):
+                    parts = []
+                    for row in rows:
+                        prefix = ',' if item_count else ''
+                        parts.append(prefix + json.dumps(AppData.row_to_sync_dict(row), separators=(',', ':')))
+                        item_count += 1
+                    write(raw_file, ''.join(parts))
+                write(raw_file, ']}')
+
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        meta = {
+            'user_id': user_id,
+            'version': version,
+            'hash': digest.hexdigest(),
+            'file': filename,
+            'item_count': item_count,
+            'size': raw_size,
+            'compressed_size': os.path.getsize(path),
+            'generated_at': datetime.utcnow().isoformat()
+        }
+
+        previous = self._load_meta(user_id)
+        self._save_meta(user_id, meta)
+
+        # Xóa file snapshot cũ (reader đang mở file vẫn đọc được trên POSIX)
+        if previous and previous.get('file') != filename:
+            old_path = self.get_snapshot_path(previous)
+            if os.path.exists(old_path):
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+        logger.info(
+            f"Snapshot generated for user {user_id}: version {version}, "
+            f"{item_count} items, {meta['compressed_size']}/{raw_size} bytes"
+        )
+        return meta
+
+    def _is_current(self, meta, version):
+        """Snapshot còn dùng được nếu cùng version và file còn tồn tại"""
+        return (
+            meta is not None
+            and meta.get('version') == version
+            and os.path.exists(self.get_snapshot_path(meta))
+        )
+
+    def _meta_path(self, user_id):
+        return os.path.join(self.snapshot_dir, f"user_{user_id}.meta.json")
+
+    def _load_meta(self, user_id):
+        path = self._meta_path(user_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as meta_file:
+                return json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+
+    def _save_meta(self, user_id, meta):
+        path = self._meta_path(user_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def _lock_for(cls, user_id):
+        with cls._locks_guard:
+            lock = cls._locks.get(user_id)
+            if lock is None:
+                lock = cls._locks[user_id] = threading.Lock()
+            return lock
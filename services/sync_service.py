@@ -1,92 +1,335 @@
 # Các service hỗ trợ (Realtime, socket, email, etc.)
 from models.AppData import AppData
 from models.User import User
+from models.ChangeLog import ChangeLog
+from models.UserStats import UserStats
 from config.db import db
+from config.env import Config
+from services.bulk_data_service import BulkDataService
+from services.change_log_service import ChangeLogService
+from services.snapshot_service import SnapshotService
 from datetime import datetime, timedelta
-from utils.logger import logger
+from utils.cursor import encode_cursor, decode_cursor
+from utils.logger import logger, sync_logger
 import json
+import time
 
 class SyncService:
     """Service xử lý đồng bộ realtime"""
     
     def __init__(self):
-        pass
+        self.bulk_service = BulkDataService()
+        self.change_log = ChangeLogService()
+        self.snapshot_service = SnapshotService()
     
-    def get_user_sync_data(self, user_id, last_sync=None):
-        """Lấy dữ liệu đồng bộ của user"""
+    def get_user_sync_data(self, user_id, last_sync=None, cursor=None, limit=None):
+        """Lấy dữ liệu đồng bộ của user (tối đa SYNC_BATCH_SIZE item mỗi lần)
+        
+        Nếu còn dữ liệu, 'has_more' = True và client gọi lại với 'cursor' trả về
+        cho tới khi has_more = False; cursor cuối cùng dùng cho delta sync.
+        """
         try:
+            limit = self._resolve_limit(limit)
+            deadline = time.monotonic() + Config.SYNC_TIMEOUT
+            
+            token = self._parse_sync_cursor(cursor) if cursor else None
+            
+            if token and token['mode'] == 'delta':
+                return self.get_user_delta_data(user_id, token['seq'], limit, deadline, token['issued_at'])
+            
+            if token and token['mode'] == 'full':
+                return self._get_full_sync_page(
+                    user_id,
+                    after_id=token['after_id'],
+                    snapshot_seq=token['seq'],
+                    issued_at=token['issued_at'],
+                    updated_since=token['updated_since'],
+                    limit=limit,
+                    deadline=deadline
+                )
+            
+            # Lấy seq trước khi đọc data để không bỏ lỡ thay đổi xảy ra trong lúc đọc
+            current_seq = ChangeLog.get_latest_seq(user_id)
+            
             # Nếu có last_sync, chỉ lấy data được update sau thời điểm đó
-            if last_sync:
+            updated_since = None
+            if last_sync and not token:
                 try:
-                    last_sync_datetime = datetime.fromisoformat(last_sync.replace('Z', '+00:00'))
-                    data_items = AppData.find_by_user_since(user_id, last_sync_datetime)
+                    updated_since = datetime.fromisoformat(last_sync.replace('Z', '+00:00'))
                 except ValueError:
                     # Nếu parse datetime thất bại, lấy tất cả
-                    data_items = AppData.find_by_user_id(user_id)
-            else:
-                # Lấy tất cả data của user
-                data_items = AppData.find_by_user_id(user_id)
+                    updated_since = None
+            
+            result = self._get_full_sync_page(
+                user_id,
+                after_id=0,
+                snapshot_seq=current_seq,
+                issued_at=time.time(),
+                updated_since=updated_since,
+                limit=limit,
+                deadline=deadline
+            )
+            
+            if token and token['mode'] == 'reset':
+                # Cursor hết hạn / không hợp lệ => client phải tải lại toàn bộ
+                logger.warning(f"Sync cursor expired or invalid for user {user_id}, full sync required")
+                result['reset'] = True
+            
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error getting sync data for user {user_id}: {str(e)}")
+            raise e
+    
+    def _get_full_sync_page(self, user_id, after_id, snapshot_seq, issued_at, updated_since, limit, deadline):
+        """Đọc một trang full sync (keyset theo id, ổn định khi có ghi đồng thời)"""
+        sync_data = []
+        last_id = after_id
+        exhausted = False
+        
+        while len(sync_data) < limit:
+            chunk_size = min(limit - len(sync_data), Config.SYNC_STREAM_CHUNK_SIZE)
+            rows = AppData.find_user_rows_after(user_id, last_id, chunk_size, updated_since=updated_since)
             
-            # Chuyển đổi thành dict để sync
-            sync_data = []
-            for item in data_items:
-                sync_data.append(item.to_sync_dict())
+            sync_data.extend(AppData.row_to_sync_dict(row) for row in rows)
+            if rows:
+                last_id = rows[-1].id
+            
+            if len(rows) < chunk_size:
+                exhausted = True
+                break
+            
+            # Hết ngân sách thời gian => trả về phần đã đọc, client tiếp tục sau
+            if time.monotonic() > deadline:
+                logger.warning(f"Sync time budget exceeded for user {user_id}, returning partial page")
+                break
+        
+        if not exhausted and len(sync_data) == limit:
+            # Trang đầy: kiểm tra còn dữ liệu không để tránh một trang rỗng cuối cùng
+            exhausted = not AppData.find_user_rows_after(user_id, last_id, 1, updated_since=updated_since)
+        
+        if exhausted:
+            # Hoàn tất full sync => cursor delta tính từ seq lúc bắt đầu
+            next_cursor = self.change_log.make_cursor(snapshot_seq, issued_at)
+        else:
+            next_cursor = encode_cursor({
+                'm': 'f',
+                'a': last_id,
+                's': snapshot_seq,
+                't': int(issued_at),
+                'u': updated_since.isoformat() if updated_since else None
+            })
+        
+        return {
+            'data': sync_data,
+            'deleted': [],
+            'cursor': next_cursor,
+            'has_more': not exhausted,
+            'sync_type': 'full',
+            'reset': False,
+            'timestamp': datetime.utcnow().isoformat(),
+            'count': len(sync_data),
+            'limit': limit,
+            'user_id': user_id
+        }
+    
+    def get_user_delta_data(self, user_id, since_seq, limit=None, deadline=None, issued_at=None):
+        """Lấy các thay đổi (kể cả tombstone) kể từ seq của client
+
+        issued_at là thời điểm phát hành cursor của client: khi còn trang sau
+        (has_more) cursor mới giữ nguyên thời điểm này để client phân trang chậm
+        qua backlog cũ vẫn bị coi là hết hạn (tombstone có thể đã bị compact);
+        khi đã theo kịp thì xem ChangeLogService.make_caught_up_cursor.
+        """
+        try:
+            limit = self._resolve_limit(limit)
+            if deadline is None:
+                deadline = time.monotonic() + Config.SYNC_TIMEOUT
+            
+            # Đọc thêm 1 entry để biết còn thay đổi phía sau không
+            entries = ChangeLog.find_since(user_id, since_seq, limit=limit + 1)
+            has_more = len(entries) > limit
+            entries = entries[:limit]
+            
+            upserts = {}
+            deleted = {}
+            last_seq = since_seq
+            chunk_size = Config.SYNC_STREAM_CHUNK_SIZE
+            
+            # Xử lý theo thứ tự seq, từng chunk, để có thể dừng giữa chừng khi hết thời gian
+            for start in range(0, len(entries), chunk_size):
+                chunk = entries[start:start + chunk_size]
+                
+                last_op = {}
+                for entry in chunk:
+                    last_op[entry.data_id] = entry.op
+                
+                changed_ids = []
+                for data_id, op in last_op.items():
+                    if op == ChangeLog.OP_DELETE:
+                        upserts.pop(data_id, None)
+                        deleted[data_id] = True
+                    else:
+                        deleted.pop(data_id, None)
+                        changed_ids.append(data_id)
+                
+                for rows in AppData.iter_rows_by_ids(user_id, changed_ids):
+                    for row in rows:
+                        upserts[row.id] = AppData.row_to_sync_dict(row)
+                
+                last_seq = chunk[-1].seq
+                
+                if start + chunk_size < len(entries) and time.monotonic() > deadline:
+                    logger.warning(f"Sync time budget exceeded for user {user_id}, returning partial delta")
+                    has_more = True
+                    break
+            
+            sync_data = [upserts[data_id] for data_id in sorted(upserts)]
+            if has_more:
+                next_cursor = self.change_log.make_cursor(last_seq, issued_at)
+            else:
+                next_cursor = self.change_log.make_caught_up_cursor(last_seq, since_seq, issued_at)
             
             return {
                 'data': sync_data,
+                'deleted': sorted(deleted),
+                'cursor': next_cursor,
+                'has_more': has_more,
+                'sync_type': 'delta',
+                'reset': False,
                 'timestamp': datetime.utcnow().isoformat(),
                 'count': len(sync_data),
+                'limit': limit,
                 'user_id': user_id
             }
             
         except Exception as e:
-            logger.error(f"Error getting sync data for user {user_id}: {str(e)}")
+            logger.error(f"Error getting delta sync data for user {user_id}: {str(e)}")
             raise e
     
+    def _resolve_limit(self, limit):
+        """Giới hạn số item mỗi lần sync trong khoảng [1, SYNC_BATCH_SIZE]"""
+        max_limit = max(1, Config.SYNC_BATCH_SIZE)
+        if not limit:
+            return max_limit
+        return max(1, min(int(limit), max_limit))
+    
+    def _parse_sync_cursor(self, cursor):
+        """Giải mã cursor sync (delta cursor hoặc continuation token của full sync)"""
+        try:
+            payload = decode_cursor(cursor)
+            
+            if payload.get('m') == 'f':
+                issued_at = int(payload['t'])
+                if self.change_log.is_expired(issued_at):
+                    return {'mode': 'reset'}
+                
+                updated_since = payload.get('u')
+                return {
+                    'mode': 'full',
+                    'after_id': int(payload['a']),
+                    'seq': int(payload['s']),
+                    'issued_at': issued_at,
+                    'updated_since': datetime.fromisoformat(updated_since) if updated_since else None
+                }
+            
+            since_seq, issued_at, expired = self.change_log.parse_cursor(cursor)
+            if expired:
+                return {'mode': 'reset'}
+            return {'mode': 'delta', 'seq': since_seq, 'issued_at': issued_at}
+            
+        except (KeyError, TypeError, ValueError):
+            return {'mode': 'reset'}
+    
+    def iter_user_sync_stream(self, user_id, last_sync=None, cursor=None, chunk_size=None):
+        """Sinh dữ liệu đồng bộ theo từng chunk cho streaming NDJSON
+        
+        Mỗi chunk là list record dạng {'op': 'upsert', 'data': {...}} hoặc
+        {'op': 'delete', 'id': ...}; chunk cuối là record {'op': 'end', ...}
+        chứa cursor cho lần sync tiếp theo.
+        """
+        if chunk_size is None:
+            chunk_size = Config.SYNC_STREAM_CHUNK_SIZE
+        
+        sync_type = 'full'
+        reset = False
+        since_seq = None
+        issued_at = None
+        
+        if cursor:
+            try:
+                since_seq, issued_at, expired = self.change_log.parse_cursor(cursor)
+            except ValueError:
+                since_seq, issued_at, expired = None, None, True
+            
+            if expired:
+                logger.warning(f"Sync cursor expired or invalid for user {user_id}, full sync required")
+                since_seq = None
+                reset = True
+            else:
+                sync_type = 'delta'
+        
+        count = 0
+        deleted_count = 0
+        
+        if since_seq is not None:
+            changes = self.change_log.get_changed_ids_since(user_id, since_seq)
+            end_seq = changes['seq']
+            
+            deleted = changes['deleted']
+            for start in range(0, len(deleted), chunk_size):
+                chunk = deleted[start:start + chunk_size]
+                deleted_count += len(chunk)
+                yield [{'op': 'delete', 'id': data_id} for data_id in chunk]
+            
+            row_chunks = AppData.iter_rows_by_ids(user_id, changes['changed'], chunk_size)
+        else:
+            # Lấy seq trước khi đọc data để không bỏ lỡ thay đổi xảy ra trong lúc đọc
+            end_seq = ChangeLog.get_latest_seq(user_id)
+            
+            updated_since = None
+            if last_sync:
+                try:
+                    updated_since = datetime.fromisoformat(last_sync.replace('Z', '+00:00'))
+                except ValueError:
+                    updated_since = None
+            
+            row_chunks = AppData.iter_user_rows(user_id, chunk_size, updated_since=updated_since)
+        
+        for rows in row_chunks:
+            count += len(rows)
+            yield [{'op': 'upsert', 'data': AppData.row_to_sync_dict(row)} for row in rows]
+        
+        logger.info(f"Streamed {sync_type} sync for user {user_id}: {count} items, {deleted_count} deleted")
+        
+        yield [{
+            'op': 'end',
+            'cursor': self.change_log.make_caught_up_cursor(end_seq, since_seq, issued_at),
+            'sync_type': sync_type,
+            'reset': reset,
+            'count': count,
+            'deleted_count': deleted_count,
+            'timestamp': datetime.utcnow().isoformat(),
+            'user_id': user_id
+        }]
+    
     def process_sync_data(self, user_id, sync_data):
         """Xử lý dữ liệu đồng bộ từ client"""
         try:
-            updated_items = []
-            created_items = []
-            errors = []
-            
             # Lấy danh sách data từ payload
             data_items = sync_data.get('data', [])
             
-            for item_data in data_items:
-                try:
-                    item_id = item_data.get('id')
-                    
-                    if item_id:
-                        # Update existing item
-                        existing_item = AppData.find_by_id(item_id)
-                        if existing_item and existing_item.is_owned_by(user_id):
-                            # Cập nhật
-                            existing_item.update(
-                                type=item_data.get('type', existing_item.type),
-                                title=item_data.get('title', existing_item.title),
-                                content=item_data.get('content', existing_item.content)
-                            )
-                            updated_items.append(existing_item.to_sync_dict())
-                        else:
-                            errors.append(f"Item {item_id} not found or not owned by user")
-                    else:
-                        # Create new item
-                        new_item = AppData(
-                            user_id=user_id,
-                            type=item_data.get('type'),
-                            title=item_data.get('title'),
-                            content=item_data.get('content')
-                        )
-                        new_item.save()
-                        created_items.append(new_item.to_sync_dict())
-                        
-                except Exception as item_error:
-                    errors.append(f"Error processing item: {str(item_error)}")
-                    continue
+            # Ghi toàn bộ trong một transaction (prefetch IN, executemany, commit một lần)
+            bulk_result = self.bulk_service.upsert(user_id, data_items)
+            updated_items = bulk_result['updated']
+            created_items = bulk_result['created']
+            errors = bulk_result['errors']
             
             sync_result = {
                 'updated_data': updated_items + created_items,
+                'patched': bulk_result['patched'],
+                'replayed': bulk_result['replayed'],
+                'replayed_count': len(bulk_result['replayed']),
                 'created_count': len(created_items),
                 'updated_count': len(updated_items),
                 'errors': errors,
@@ -102,34 +345,20 @@ class SyncService:
             raise e
     
     def get_sync_status(self, user_id):
-        """Lấy trạng thái đồng bộ của user"""
+        """Lấy trạng thái đồng bộ của user (đọc từ bảng thống kê, không quét app_data)"""
         try:
-            # Đếm tổng số data
-            total_count = AppData.get_user_data_count(user_id)
-            
-            # Lấy data gần đây nhất
-            recent_data = AppData.query.filter_by(user_id=user_id)\
-                                    .order_by(AppData.updated_at.desc())\
-                                    .first()
+            stats = UserStats.get_user_stats(user_id)
+            total_count = stats['total_items']
             
             last_activity = None
-            if recent_data:
-                last_activity = recent_data.updated_at.isoformat()
-            
-            # Thống kê theo type
-            type_stats = {}
-            all_data = AppData.find_by_user_id(user_id)
-            for item in all_data:
-                if item.type in type_stats:
-                    type_stats[item.type] += 1
-                else:
-                    type_stats[item.type] = 1
+            if stats['last_activity']:
+                last_activity = stats['last_activity'].isoformat()
             
             return {
                 'user_id': user_id,
                 'total_items': total_count,
                 'last_activity': last_activity,
-                'type_statistics': type_stats,
+                'type_statistics': stats['type_statistics'],
                 'sync_status': 'active' if total_count > 0 else 'empty',
                 'timestamp': datetime.utcnow().isoformat()
             }
@@ -139,73 +368,142 @@ class SyncService:
             raise e
     
     def force_full_sync(self, user_id):
-        """Buộc đồng bộ toàn bộ dữ liệu"""
+        """Buộc đồng bộ toàn bộ dữ liệu (không ghi vào app_data)
+        
+        Chỉ chuẩn bị snapshot và trả về metadata; client tải dữ liệu qua
+        GET /api/sync/snapshot (gửi thẳng file gzip) thay vì nhận inline.
+        """
         try:
-            # Lấy tất cả data của user
-            all_data = AppData.find_by_user_id(user_id)
-            
-            # Chuyển đổi thành sync format
-            sync_data = []
-            for item in all_data:
-                sync_data.append(item.to_sync_dict())
-            
-            # Cập nhật timestamp cho tất cả items
-            for item in all_data:
-                item.updated_at = datetime.utcnow()
-            
-            db.session.commit()
+            meta = self.snapshot_service.get_snapshot(user_id)
             
             result = {
-                'data': sync_data,
-                'total_synced': len(sync_data),
+                'total_synced': meta['item_count'],
                 'sync_type': 'force_full',
+                'snapshot': {
+                    'version': meta['version'],
+                    'hash': meta['hash'],
+                    'generated_at': meta['generated_at'],
+                    'size': meta['size'],
+                    'compressed_size': meta['compressed_size']
+                },
+                'cursor': self.change_log.make_cursor(meta['version']),
                 'timestamp': datetime.utcnow().isoformat()
             }
             
-            logger.info(f"Force full sync completed for user {user_id}: {len(sync_data)} items")
+            logger.info(f"Force full sync completed for user {user_id}: {meta['item_count']} items (snapshot v{meta['version']})")
             
             return result
             
         except Exception as e:
-            db.session.rollback()
             logger.error(f"Error in force full sync for user {user_id}: {str(e)}")
             raise e
     
     def get_sync_conflicts(self, user_id, client_data):
-        """Kiểm tra xung đột đồng bộ"""
+        """Kiểm tra xung đột đồng bộ cho nhiều item bằng một truy vấn batch
+        
+        Mỗi client item có thể gửi 'base_hash' (version mà client đã sửa từ đó),
+        'content_hash' hoặc nội dung (type/title/content) để so sánh theo version;
+        nếu không có base_hash mới so sánh theo updated_at như trước.
+        """
         try:
             conflicts = []
+            missing = []
+            checked = 0
             
+            # Một truy vấn batch lấy version của tất cả item (không đọc content)
+            item_ids = []
             for client_item in client_data:
-                item_id = client_item.get('id')
-                if item_id:
-                    server_item = AppData.find_by_id(item_id)
-                    if server_item and server_item.is_owned_by(user_id):
-                        # So sánh timestamp
-                        client_updated = client_item.get('updated_at')
-                        if client_updated:
-                            try:
-                                client_datetime = datetime.fromisoformat(client_updated.replace('Z', '+00:00'))
-                                if server_item.updated_at > client_datetime:
-                                    conflicts.append({
-                                        'item_id': item_id,
-                                        'server_version': server_item.to_sync_dict(),
-                                        'client_version': client_item,
-                                        'conflict_type': 'timestamp_mismatch'
-                                    })
-                            except ValueError:
-                                continue
+                item_id = self._coerce_item_id(client_item)
+                if item_id is not None:
+                    item_ids.append(item_id)
+            versions = AppData.find_versions(user_id, item_ids) if item_ids else {}
+            
+            for client_item in client_data:
+                item_id = self._coerce_item_id(client_item)
+                if item_id is None:
+                    continue
+                checked += 1
+                
+                server = versions.get(item_id)
+                if server is None:
+                    missing.append(item_id)
+                    continue
+                
+                conflict_type = self._detect_conflict(client_item, server)
+                if conflict_type:
+                    conflicts.append({
+                        'item_id': item_id,
+                        'server_hash': server.content_hash,
+                        'client_version': client_item,
+                        'conflict_type': conflict_type
+                    })
+            
+            # Chỉ đọc toàn bộ nội dung của các item thực sự xung đột
+            if conflicts:
+                server_versions = {}
+                for rows in AppData.iter_rows_by_ids(user_id, [c['item_id'] for c in conflicts]):
+                    for row in rows:
+                        server_versions[row.id] = AppData.row_to_sync_dict(row)
+                for conflict in conflicts:
+                    conflict['server_version'] = server_versions.get(conflict['item_id'])
+            
+            for conflict in conflicts:
+                sync_logger.log_conflict_detected(user_id, conflict['item_id'], conflict['conflict_type'])
             
             return {
                 'conflicts': conflicts,
                 'conflict_count': len(conflicts),
-                'has_conflicts': len(conflicts) > 0
+                'has_conflicts': len(conflicts) > 0,
+                'missing': missing,
+                'checked_count': checked
             }
             
         except Exception as e:
             logger.error(f"Error checking sync conflicts for user {user_id}: {str(e)}")
             raise e
     
+    def _detect_conflict(self, client_item, server):
+        """So sánh một client item với version trên server, trả về loại xung đột hoặc None"""
+        client_hash = client_item.get('content_hash')
+        if not client_hash and 'content' in client_item:
+            client_hash = AppData.compute_hash(
+                client_item.get('type'),
+                client_item.get('title'),
+                client_item.get('content')
+            )
+        
+        # Nội dung giống hệt => không xung đột dù timestamp khác nhau
+        if client_hash and client_hash == server.content_hash:
+            return None
+        
+        base_hash = client_item.get('base_hash')
+        if base_hash:
+            # Server đã thay đổi kể từ version client dùng làm gốc
+            return 'version_mismatch' if base_hash != server.content_hash else None
+        
+        # Không có version gốc => so sánh timestamp như trước
+        client_updated = client_item.get('updated_at')
+        if client_updated and server.updated_at:
+            try:
+                client_datetime = datetime.fromisoformat(client_updated.replace('Z', '+00:00'))
+                if client_datetime.tzinfo is not None:
+                    client_datetime = client_datetime.replace(tzinfo=None) - client_datetime.utcoffset()
+                if server.updated_at > client_datetime:
+                    return 'timestamp_mismatch'
+            except (AttributeError, ValueError):
+                return None
+        
+        return None
+    
+    @staticmethod
+    def _coerce_item_id(client_item):
+        """Chuẩn hóa ID của client item về int (None nếu không có / không hợp lệ)"""
+        try:
+            item_id = client_item.get('id')
+            return int(item_id) if item_id else None
+        except (AttributeError, TypeError, ValueError):
+            return None
+    
     def cleanup_old_data(self, days_old=30):
         """Dọn dẹp dữ liệu cũ (có thể chạy định kỳ)"""
         try:
@@ -215,6 +513,7 @@ class SyncService:
             
             deleted_count = 0
             for item in old_items:
+                self.change_log.record_deleted(item.user_id, item.id, item.type)
                 item.delete()
                 deleted_count += 1
             
@@ -0,0 +1,209 @@
+# Thu hồi JWT (logout, xóa tài khoản): kiểm tra trong bộ nhớ, lưu bền và chia sẻ qua SQLite
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from models.RevokedToken import RevokedToken
+from config.db import db
+from config.env import Config
+from utils.logger import logger
+
+def _to_timestamp(value):
+    """datetime UTC (naive) -> epoch seconds"""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+def _max_token_lifetime():
+    """Thời gian sống dài nhất của một token (access hoặc refresh), tính bằng giây"""
+    return max(Config.JWT_ACCESS_TOKEN_EXPIRES, Config.JWT_REFRESH_TOKEN_EXPIRES)
+
+def _to_datetime(timestamp):
+    """epoch seconds -> datetime UTC (naive, giống các cột DateTime khác)"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+class TokenRevocationService:
+    """Danh sách token bị thu hồi dùng cho token_in_blocklist_loader
+
+    is_revoked() chỉ tra hai dict trong bộ nhớ (jti -> exp, user_id -> mốc
+    thu hồi), không query database. Thu hồi được ghi vào bảng revoked_tokens
+    rồi mới áp vào bộ nhớ; các process khác nhận dòng mới qua sync() định kỳ
+    (trễ tối đa TOKEN_REVOCATION_SYNC_INTERVAL giây). Dòng và entry tự hết
+    hạn cùng lúc với token tương ứng.
+    """
+
+    # Đọc lùi lại khi sync để không sót dòng commit muộn hơn dòng có revoked_at lớn hơn
+    SYNC_OVERLAP = timedelta(seconds=60)
+
+    def __init__(self):
+        # Thay thế cả dict khi dọn; đọc / ghi từng key an toàn giữa các thread (GIL)
+        self._tokens = {}
+        self._users = {}
+        self._lock = threading.Lock()
+        self._synced_at = None
+        self._checks = 0
+        self._revoked_hits = 0
+
+    # ===== Kiểm tra (hot path) =====
+
+    def is_revoked(self, payload):
+        """Token (payload JWT đã verify) đã bị thu hồi chưa"""
+        self._checks += 1
+        if payload.get('jti') in self._tokens:
+            self._revoked_hits += 1
+            return True
+
+        cutoff = self._users.get(str(payload.get('sub')))
+        if cutoff is not None and payload.get('iat', 0) <= cutoff:
+            self._revoked_hits += 1
+            return True
+        return False
+
+    # ===== Thu hồi =====
+
+    def revoke_token(self, payload):
+        """Thu hồi một token (logout, refresh token đã dùng để xoay vòng)"""
+        self._persist(self._row(payload))
+
+    @staticmethod
+    def _row(payload):
+        """Dòng revoked_tokens cho một token"""
+        expires_at = _to_datetime(payload['exp']) if payload.get('exp') else \
+            datetime.utcnow() + timedelta(seconds=_max_token_lifetime())
+        return {
+            'jti': payload['jti'],
+            'user_id': int(payload['sub']),
+            'revoked_at': datetime.utcnow(),
+            'expires_at': expires_at
+        }
+
+    def consume(self, payload):
+        """Thu hồi token dùng một lần (refresh token khi xoay vòng)
+
+        Trả về False nếu token đã bị thu hồi trước đó (bởi process này hay
+        process khác): việc chèn jti vào database quyết định request nào thắng.
+        """
+        if self.is_revoked(payload):
+            return False
+
+        row = self._row(payload)
+        try:
+            inserted = RevokedToken.insert_ignore(row)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error revoking token {row['jti']}: {str(e)}")
+            raise e
+        self._apply([row])
+        return inserted == 1
+
+    def revoke_user(self, user_id):
+        """Thu hồi mọi token đã cấp cho user (xóa tài khoản)
+
+        Token cấp sau thời điểm này (ví dụ user mới được cấp lại id) không bị ảnh hưởng.
+        """
+        now = datetime.utcnow()
+        self._persist({
+            'jti': RevokedToken.user_key(user_id),
+            'user_id': int(user_id),
+            'revoked_at': now,
+            'expires_at': now + timedelta(seconds=_max_token_lifetime())
+        })
+
+    def _persist(self, row):
+        try:
+            RevokedToken.upsert([row])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error revoking token {row['jti']}: {str(e)}")
+            raise e
+        self._apply([row])
+
+    def _apply(self, rows):
+        """Áp các dòng thu hồi vào bộ nhớ"""
+        with self._lock:
+            for row in rows:
+                jti = row['jti']
+                if jti.startswith(RevokedToken.USER_PREFIX):
+                    user_id = jti[len(RevokedToken.USER_PREFIX):]
+                    cutoff = _to_timestamp(row['revoked_at'])
+                    self._users[user_id] = max(cutoff, self._users.get(user_id, cutoff))
+                else:
+                    self._tokens[jti] = _to_timestamp(row['expires_at'])
+
+    # ===== Đồng bộ / dọn dẹp =====
+
+    def sync(self):
+        """Nạp các dòng thu hồi mới từ database (lần đầu: toàn bộ dòng còn hạn)"""
+        started_at = datetime.utcnow()
+        since = self._synced_at - self.SYNC_OVERLAP if self._synced_at else None
+        rows = RevokedToken.find_since(since, now=started_at)
+        self._apply([row._asdict() for row in rows])
+        self._synced_at = started_at
+        return len(rows)
+
+    def purge_expired(self):
+        """Xóa dòng / entry đã hết hạn (token tương ứng đã tự hết hạn)"""
+        try:
+            removed = RevokedToken.delete_expired()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error purging revoked tokens: {str(e)}")
+            raise e
+
+        now = time.time()
+        user_cutoff = now - _max_token_lifetime()
+        with self._lock:
+            self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+            self._users = {user_id: cutoff for user_id, cutoff in self._users.items() if cutoff > user_cutoff}
+
+        logger.info(f"Revoked tokens purged: {removed} expired")
+        return removed
+
+    def start_sync_worker(self, app, interval=None, purge_interval=None):
+        """Nạp danh sách thu hồi rồi đồng bộ / dọn định kỳ trong background thread"""
+        if interval is None:
+            interval = Config.TOKEN_REVOCATION_SYNC_INTERVAL
+        if purge_interval is None:
+            purge_interval = Config.TOKEN_REVOCATION_PURGE_INTERVAL
+
+        with app.app_context():
+            loaded = self.sync()
+            db.session.remove()
+        logger.info(f"Revoked tokens loaded: {loaded}")
+
+        if interval <= 0:
+            logger.info("Token revocation sync worker disabled")
+            return None
+
+        def worker():
+            last_purge = time.monotonic()
+            while True:
+                time.sleep(interval)
+                try:
+                    with app.app_context():
+                        self.sync()
+                        if purge_interval > 0 and time.monotonic() - last_purge >= purge_interval:
+                            last_purge = time.monotonic()
+                            self.purge_expired()
+                        db.session.remove()
+                except Exception as e:
+                    logger.error(f"Token revocation sync worker error: {str(e)}")
+
+        thread = threading.Thread(target=worker, name='token-revocation-sync', daemon=True)
+        thread.start()
+        logger.info(f"Token revocation sync worker started (interval: {interval}s)")
+        return thread
+
+    def stats(self):
+        """Số token / user đang bị thu hồi trong bộ nhớ"""
+        return {
+            'tokens': len(self._tokens),
+            'users': len(self._users),
+            'checks': self._checks,
+            'revoked_hits': self._revoked_hits,
+            'synced_at': self._synced_at.isoformat() if self._synced_at else None
+        }
+
+token_revocation = TokenRevocationService()
+
+__all__ = ['TokenRevocationService', 'token_revocation']
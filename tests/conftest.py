@@ -0,0 +1,7 @@
+# Cấu hình chung cho test: chạy từ thư mục gốc của repo
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
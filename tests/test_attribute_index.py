@@ -0,0 +1,63 @@
+# Kiểm tra index thuộc tính JSON (app_data_attributes) với content nằm trong blob store
+import json
+import shutil
+import tempfile
+import pytest
+from flask import Flask
+from config.env import Config
+from config.db import db
+from models.AppData import AppData
+from models.AppDataAttribute import AppDataAttribute
+from models.User import User
+from services.attribute_index_service import AttributeIndexService
+from utils.blob_store import blob_store
+
+@pytest.fixture
+def app(monkeypatch):
+    directory = tempfile.mkdtemp(prefix='attribute-index-')
+    monkeypatch.setattr(blob_store, 'root', f"{directory}/blobs")
+    monkeypatch.setattr(blob_store, 'threshold', 1024)
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{directory}/database.db"
+    app.config['SQLALCHEMY_ECHO'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(User('testuser', 'test@example.com', 'hash'))
+        db.session.commit()
+        AttributeIndexService('customer.phone').ensure_index()
+        yield app
+        db.session.remove()
+    shutil.rmtree(directory, ignore_errors=True)
+
+def indexed_values(data_id):
+    return {
+        (row.path, row.value)
+        for row in AppDataAttribute.query.filter_by(data_id=data_id).all()
+    }
+
+def test_blob_content_is_indexed(app):
+    item = AppData(1, 'customer', json.dumps({'phone': '0901111111', 'photo': 'x' * 4096}))
+    db.session.add(item)
+    db.session.commit()
+
+    # Cột content chỉ còn tham chiếu blob nhưng thuộc tính vẫn được index
+    assert db.session.execute(
+        db.text("SELECT content_blob IS NOT NULL FROM app_data WHERE id = :id"), {'id': item.id}
+    ).scalar() == 1
+    assert indexed_values(item.id) == {('phone', '0901111111')}
+
+    item.content = json.dumps({'phone': '0903333333', 'photo': 'y' * 4096})
+    db.session.commit()
+    assert indexed_values(item.id) == {('phone', '0903333333')}
+
+def test_rebuild_indexes_blob_content(app):
+    item = AppData(1, 'customer', json.dumps({'phone': '0902222222', 'photo': 'x' * 4096}))
+    db.session.add(item)
+    db.session.commit()
+
+    assert AttributeIndexService('customer.phone').rebuild() == 1
+    assert indexed_values(item.id) == {('phone', '0902222222')}
@@ -0,0 +1,67 @@
+# Kiểm tra EXPLAIN QUERY PLAN của các finder trên database tạm tạo bằng init_db
+import shutil
+import tempfile
+import pytest
+from flask import Flask
+from config.env import Config
+from config.db import db, init_db, get_query_plan_checks, verify_query_plans
+
+# Đăng ký các model trước khi init_db gọi create_all()
+import models.User  # noqa: F401
+import models.AppData  # noqa: F401
+import models.AppDataAttribute  # noqa: F401
+import models.ChangeLog  # noqa: F401
+import models.UserStats  # noqa: F401
+import models.IdempotencyKey  # noqa: F401
+import models.RevokedToken  # noqa: F401
+
+# Tên các access path (tĩnh: không cần database lúc collect test)
+CHECK_NAMES = [name for name, _, _ in get_query_plan_checks()]
+
+def create_test_app(path):
+    """Flask app tối thiểu dùng database SQLite tại path"""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    app.config['SQLALCHEMY_ECHO'] = False
+    db.init_app(app)
+    return app
+
+@pytest.fixture(scope='module')
+def plan_app():
+    """Database tạm tạo bằng init_db (một lần cho cả module)"""
+    directory = tempfile.mkdtemp(prefix='query-plans-')
+    app = create_test_app(f"{directory}/database.db")
+    with app.app_context():
+        init_db()
+        db.session.remove()
+    yield app
+    shutil.rmtree(directory, ignore_errors=True)
+
+@pytest.fixture(scope='module')
+def plan_results(plan_app):
+    with plan_app.app_context():
+        results = {result['name']: result for result in verify_query_plans()}
+        db.session.remove()
+    return results
+
+@pytest.mark.parametrize('name', CHECK_NAMES)
+def test_query_plan(plan_results, name):
+    result = plan_results[name]
+    assert result['ok'], f"{name}: {'; '.join(result['problems'])} | plan: {result['plan']}"
+
+def test_verify_query_plans_passes_on_init_db(plan_app):
+    with plan_app.app_context():
+        results = verify_query_plans(raise_on_failure=True)
+        db.session.remove()
+    assert [result['name'] for result in results] == CHECK_NAMES
+
+def test_verify_query_plans_raises_on_regression():
+    app = create_test_app(':memory:')
+    with app.app_context():
+        db.create_all()
+        # Database không có index phụ: verify phải báo lỗi
+        db.session.execute(db.text("DROP INDEX ix_app_data_user_created"))
+        with pytest.raises(AssertionError):
+            verify_query_plans(raise_on_failure=True)
+        db.session.remove()
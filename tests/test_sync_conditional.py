@@ -0,0 +1,83 @@
+# Kiểm tra conditional GET của /api/sync cho client đi theo cursor được trả về
+import shutil
+import tempfile
+import time
+from types import SimpleNamespace
+import pytest
+from flask import Flask
+from config.env import Config
+from config.db import db
+from controllers.sync_controller import SyncController
+from middlewares.conditional import conditional_get
+from models.ChangeLog import ChangeLog
+from services.change_log_service import ChangeLogService
+
+# Đăng ký các model trước khi gọi create_all()
+import models.User  # noqa: F401
+import models.AppData  # noqa: F401
+import models.UserStats  # noqa: F401
+
+USER = SimpleNamespace(id=1)
+
+@pytest.fixture(scope='module')
+def app():
+    directory = tempfile.mkdtemp(prefix='sync-conditional-')
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{directory}/database.db"
+    app.config['SQLALCHEMY_ECHO'] = False
+    app.socketio = None
+    db.init_app(app)
+
+    controller = SyncController()
+    app.add_url_rule(
+        '/api/sync/',
+        'get_sync_data',
+        lambda: conditional_get(controller.get_sync_data)(USER)
+    )
+
+    with app.app_context():
+        db.create_all()
+    yield app
+    shutil.rmtree(directory, ignore_errors=True)
+
+def record_change(app, data_id):
+    with app.app_context():
+        ChangeLogService().record_changes(USER.id, [(ChangeLog.OP_CREATE, data_id, 'note')])
+        db.session.commit()
+
+def test_unchanged_delta_poll_returns_304_when_following_cursor(app):
+    client = app.test_client()
+    record_change(app, 1)
+
+    first = client.get('/api/sync/')
+    assert first.status_code == 200
+    assert not first.get_json()['data']['has_more']
+
+    # Cursor client nhận được từ một phút trước
+    with app.app_context():
+        change_log = ChangeLogService()
+        seq, _, _ = change_log.parse_cursor(first.get_json()['data']['cursor'])
+        cursor = change_log.make_cursor(seq, time.time() - 60)
+
+    # Không có thay đổi: server trả lại đúng cursor nên URL poll tiếp theo không đổi
+    poll = client.get('/api/sync/', query_string={'cursor': cursor})
+    assert poll.status_code == 200
+    assert poll.get_json()['data']['cursor'] == cursor
+
+    unchanged = client.get(
+        '/api/sync/',
+        query_string={'cursor': cursor},
+        headers={'If-None-Match': poll.headers['ETag']}
+    )
+    assert unchanged.status_code == 304
+
+    # Có thay đổi mới: ETag cũ không còn khớp, cursor tiến lên
+    record_change(app, 2)
+    changed = client.get(
+        '/api/sync/',
+        query_string={'cursor': cursor},
+        headers={'If-None-Match': poll.headers['ETag']}
+    )
+    assert changed.status_code == 200
+    assert changed.get_json()['data']['cursor'] != cursor
@@ -0,0 +1,225 @@
+# Blob store theo nội dung (content-addressed, sha256) trên đĩa cho content lớn của AppData
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from sqlalchemy import Text
+from sqlalchemy.types import TypeDecorator
+from config.env import Config
+from utils.logger import logger
+
+# Giá trị lưu trong cột thay cho nội dung: '@blob:sha256:<hash>:<số byte>'
+BLOB_MARKER_PREFIX = '@blob:sha256:'
+HASH_LENGTH = 64
+
+class BlobNotFoundError(LookupError):
+    """Row tham chiếu tới blob không còn trên đĩa"""
+
+def make_marker(digest, length):
+    return f"{BLOB_MARKER_PREFIX}{digest}:{length}"
+
+def parse_marker(value):
+    """Trả về (hash, length) nếu value là tham chiếu blob, ngược lại None"""
+    if not isinstance(value, str) or not value.startswith(BLOB_MARKER_PREFIX):
+        return None
+    digest, _, length = value[len(BLOB_MARKER_PREFIX):].partition(':')
+    if len(digest) != HASH_LENGTH or not length.isdigit():
+        return None
+    return digest, int(length)
+
+class BlobStore:
+    """Lưu nội dung theo sha256 (mỗi nội dung một file, tự loại trùng)
+
+    File nằm ở <root>/<2 ký tự đầu của hash>/<hash>, được ghi vào file tạm
+    rồi rename nên không bao giờ thấy file ghi dở. Nội dung lớn hơn
+    `threshold` byte (UTF-8) được đưa ra blob; threshold = 0 tắt tính năng.
+    """
+
+    def __init__(self, root=None, threshold=None):
+        self.root = os.path.abspath(root or Config.CONTENT_BLOB_DIR)
+        self.threshold = Config.CONTENT_BLOB_THRESHOLD if threshold is None else threshold
+
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._dedup_hits = 0
+        self._reads = 0
+        self._bytes_written = 0
+        self._bytes_read = 0
+
+    # ===== Ghi =====
+
+    def put(self, data):
+        """Lưu bytes, trả về hash sha256 (hex)"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+
+        if os.path.exists(path):
+            # Đã có (trùng nội dung): cập nhật mtime để GC không xóa trong thời gian ân hạn
+            try:
+                os.utime(path)
+                with self._lock:
+                    self._dedup_hits += 1
+                return digest
+            except FileNotFoundError:
+                pass  # GC vừa xóa, ghi lại
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as blob_file:
+                blob_file.write(data)
+                blob_file.flush()
+                # Row tham chiếu blob được commit sau đó, nên blob phải bền trước
+                os.fsync(blob_file.fileno())
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._writes += 1
+            self._bytes_written += len(data)
+        return digest
+
+    def externalize(self, value):
+        """Giá trị lưu vào cột: nội dung gốc, hoặc tham chiếu blob nếu lớn hơn threshold byte
+
+        Nội dung tự bắt đầu bằng BLOB_MARKER_PREFIX luôn được đưa ra blob để
+        giá trị trong cột không bao giờ bị nhầm (hoặc giả mạo) thành tham chiếu.
+        """
+        if value is None:
+            return value
+
+        forced = value.startswith(BLOB_MARKER_PREFIX)
+        # Mỗi ký tự tối đa 4 byte UTF-8 => chuỗi ngắn chắc chắn không vượt threshold
+        if not forced and (self.threshold <= 0 or len(value) <= self.threshold // 4):
+            return value
+
+        data = value.encode('utf-8')
+        if not forced and len(data) <= self.threshold:
+            return value
+        return make_marker(self.put(data), len(data))
+
+    # ===== Đọc =====
+
+    def path(self, digest):
+        """Đường dẫn file của blob"""
+        return os.path.join(self.root, digest[:2], digest)
+
+    def read_text(self, digest):
+        """Đọc blob qua mmap và decode thẳng từ vùng nhớ được map (không đọc vào bytes trung gian)"""
+        try:
+            with open(self.path(digest), 'rb') as blob_file:
+                size = os.fstat(blob_file.fileno()).st_size
+                if size == 0:
+                    return ''
+                with mmap.mmap(blob_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    text = str(mapped, 'utf-8')
+        except FileNotFoundError:
+            logger.error(f"Blob {digest} referenced but missing in {self.root}")
+            raise BlobNotFoundError(f"Blob {digest} not found")
+
+        with self._lock:
+            self._reads += 1
+            self._bytes_read += size
+        return text
+
+    def resolve(self, value):
+        """Giá trị đọc từ cột -> nội dung gốc"""
+        reference = parse_marker(value)
+        if reference is None:
+            return value
+        return self.read_text(reference[0])
+
+    # ===== Dọn dẹp =====
+
+    def iter_blobs(self):
+        """Duyệt (hash, path, mtime) của các blob trên đĩa"""
+        if not os.path.isdir(self.root):
+            return
+        for prefix in os.listdir(self.root):
+            directory = os.path.join(self.root, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                try:
+                    mtime = os.stat(path).st_mtime
+                except FileNotFoundError:
+                    continue
+                yield name, path, mtime
+
+    def collect_garbage(self, referenced, grace_seconds=0):
+        """Xóa các blob không còn được tham chiếu và cũ hơn grace_seconds
+
+        Blob vừa ghi (hoặc vừa được dùng lại) có thể thuộc một transaction chưa
+        commit nên được giữ lại trong thời gian ân hạn; mtime được kiểm tra lại
+        ngay trước khi xóa. File tạm bị bỏ dở cũng được dọn.
+        Trả về (số file đã xóa, số byte giải phóng).
+        """
+        cutoff = time.time() - grace_seconds
+        removed = 0
+        freed = 0
+        for name, path, mtime in list(self.iter_blobs()):
+            if name in referenced or mtime > cutoff:
+                continue
+            try:
+                stat = os.stat(path)
+                if stat.st_mtime > cutoff:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+            freed += stat.st_size
+        return removed, freed
+
+    def stats(self):
+        """Thống kê ghi / đọc blob của process"""
+        with self._lock:
+            return {
+                'threshold': self.threshold,
+                'writes': self._writes,
+                'dedup_hits': self._dedup_hits,
+                'reads': self._reads,
+                'bytes_written': self._bytes_written,
+                'bytes_read': self._bytes_read
+            }
+
+blob_store = BlobStore()
+
+def resolve_json_sql(value):
+    """Hàm SQL blob_json(content): nội dung JSON gốc của tham chiếu blob cho trigger / view index
+
+    Trả về '{}' nếu blob không đọc được hoặc không phải JSON để thao tác ghi
+    kích hoạt trigger không bị hỏng (giống cách view xử lý content không hợp lệ).
+    """
+    try:
+        content = blob_store.resolve(value)
+        json.loads(content)
+        return content
+    except (BlobNotFoundError, TypeError, ValueError):
+        return '{}'
+
+class ExternalText(TypeDecorator):
+    """Kiểu cột Text tự đưa giá trị lớn ra blob_store khi ghi và đọc lại khi select
+
+    Áp dụng cho cả ORM lẫn Core (insert / update executemany, select cột),
+    nên các luồng ghi / đọc hiện có không cần thay đổi.
+    """
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return blob_store.externalize(value)
+
+    def process_result_value(self, value, dialect):
+        return blob_store.resolve(value)
+
+__all__ = [
+    'BLOB_MARKER_PREFIX', 'HASH_LENGTH', 'BlobNotFoundError', 'BlobStore', 'ExternalText',
+    'blob_store', 'make_marker', 'parse_marker', 'resolve_json_sql'
+]
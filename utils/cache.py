@@ -0,0 +1,211 @@
+# Cache in-process (LRU + TTL, giới hạn theo bộ nhớ) với interface backend thay thế được
+import json
+import threading
+import time
+from collections import OrderedDict
+
+class CacheBackend:
+    """Interface cho backend cache (in-process, hoặc sau này Redis / memcached...)
+
+    Mỗi entry thuộc một namespace (ví dụ một user) và có thể gắn tag để
+    invalidate theo nhóm. Generation của namespace tăng sau mỗi lần
+    invalidate; set() với generation cũ bị bỏ qua để không ghi đè dữ liệu
+    mới bằng kết quả đọc trước khi invalidate.
+    """
+
+    def get(self, namespace, key):
+        """Trả về (hit, value)"""
+        raise NotImplementedError
+
+    def set(self, namespace, key, value, ttl=None, tags=(), generation=None):
+        """Lưu value; trả về False nếu không lưu (generation cũ, quá lớn...)"""
+        raise NotImplementedError
+
+    def generation(self, namespace):
+        """Generation hiện tại của namespace"""
+        raise NotImplementedError
+
+    def invalidate_tags(self, namespace, tags):
+        """Xóa các entry của namespace có một trong các tag; trả về số entry bị xóa"""
+        raise NotImplementedError
+
+    def invalidate_namespace(self, namespace):
+        """Xóa toàn bộ entry của namespace"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Xóa toàn bộ cache"""
+        raise NotImplementedError
+
+    def stats(self):
+        """Thống kê hit/miss và dung lượng"""
+        raise NotImplementedError
+
+class NullCacheBackend(CacheBackend):
+    """Backend không cache gì (dùng khi tắt cache)"""
+
+    def __init__(self):
+        self._misses = 0
+
+    def get(self, namespace, key):
+        self._misses += 1
+        return False, None
+
+    def set(self, namespace, key, value, ttl=None, tags=(), generation=None):
+        return False
+
+    def generation(self, namespace):
+        return 0
+
+    def invalidate_tags(self, namespace, tags):
+        return 0
+
+    def invalidate_namespace(self, namespace):
+        return 0
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {'backend': 'none', 'hits': 0, 'misses': self._misses}
+
+class MemoryCacheBackend(CacheBackend):
+    """Cache LRU + TTL trong bộ nhớ process, giới hạn số entry và tổng số byte
+
+    Kích thước entry được ước lượng bằng độ dài JSON của value.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, default_ttl=60, max_entry_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.max_entry_bytes = max_entry_bytes or max_bytes
+
+        self._lock = threading.Lock()
+        # (namespace, key) -> (value, size, expires_at, tags)
+        self._entries = OrderedDict()
+        # (namespace, tag) -> set((namespace, key))
+        self._tags = {}
+        self._generations = {}
+        self._bytes = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._sets = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, namespace, key):
+        entry_key = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is None:
+                self._misses += 1
+                return False, None
+
+            if entry[2] is not None and entry[2] <= time.monotonic():
+                self._remove(entry_key)
+                self._expirations += 1
+                self._misses += 1
+                return False, None
+
+            self._entries.move_to_end(entry_key)
+            self._hits += 1
+            return True, entry[0]
+
+    def set(self, namespace, key, value, ttl=None, tags=(), generation=None):
+        size = len(json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str))
+        if size > self.max_entry_bytes:
+            return False
+
+        if ttl is None:
+            ttl = self.default_ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        entry_key = (namespace, key)
+
+        with self._lock:
+            if generation is not None and generation != self._generations.get(namespace, 0):
+                # Đã có invalidate trong lúc đọc dữ liệu => value có thể đã cũ
+                return False
+
+            if entry_key in self._entries:
+                self._remove(entry_key)
+
+            self._entries[entry_key] = (value, size, expires_at, tuple(tags))
+            self._bytes += size
+            for tag in tags:
+                self._tags.setdefault((namespace, tag), set()).add(entry_key)
+            self._sets += 1
+
+            # Evict entry ít dùng nhất khi vượt giới hạn
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._evictions += 1
+            return True
+
+    def generation(self, namespace):
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def invalidate_tags(self, namespace, tags):
+        removed = 0
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            for tag in tags:
+                for entry_key in list(self._tags.get((namespace, tag), ())):
+                    if entry_key in self._entries:
+                        self._remove(entry_key)
+                        removed += 1
+            self._invalidations += removed
+        return removed
+
+    def invalidate_namespace(self, namespace):
+        removed = 0
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            for entry_key in [entry_key for entry_key in self._entries if entry_key[0] == namespace]:
+                self._remove(entry_key)
+                removed += 1
+            self._invalidations += removed
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+            for namespace in self._generations:
+                self._generations[namespace] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'backend': 'memory',
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else None,
+                'sets': self._sets,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes
+            }
+
+    def _remove(self, entry_key):
+        """Xóa entry và tag index của nó (gọi khi đang giữ lock)"""
+        value, size, expires_at, tags = self._entries.pop(entry_key)
+        self._bytes -= size
+        for tag in tags:
+            keys = self._tags.get((entry_key[0], tag))
+            if keys is not None:
+                keys.discard(entry_key)
+                if not keys:
+                    del self._tags[(entry_key[0], tag)]
+
+__all__ = ['CacheBackend', 'NullCacheBackend', 'MemoryCacheBackend']
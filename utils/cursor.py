@@ -0,0 +1,26 @@
+# Mã hóa / giải mã cursor (opaque token) cho sync và phân trang
+import base64
+import json
+
+def encode_cursor(payload):
+    """Mã hóa dict thành cursor dạng base64url (không padding)"""
+    raw = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """Giải mã cursor thành dict, raise ValueError nếu cursor không hợp lệ"""
+    if not token or not isinstance(token, str):
+        raise ValueError("Cursor không hợp lệ")
+    
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError("Cursor không hợp lệ")
+    
+    if not isinstance(payload, dict):
+        raise ValueError("Cursor không hợp lệ")
+    
+    return payload
+
+__all__ = ['encode_cursor', 'decode_cursor']
@@ -0,0 +1,166 @@
+# Áp dụng JSON Patch (RFC 6902) và JSON Merge Patch (RFC 7386)
+import copy
+import json
+
+PATCH_TYPE_JSON = 'json-patch'
+PATCH_TYPE_MERGE = 'merge-patch'
+
+# Content-Type tương ứng với từng loại patch
+PATCH_MIMETYPES = {
+    'application/json-patch+json': PATCH_TYPE_JSON,
+    'application/merge-patch+json': PATCH_TYPE_MERGE,
+}
+
+class JsonPatchError(ValueError):
+    """Lỗi khi patch không hợp lệ hoặc không áp dụng được"""
+    pass
+
+def apply_merge_patch(target, patch):
+    """Áp dụng JSON Merge Patch (RFC 7386), trả về document mới"""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+
+    result = copy.deepcopy(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+def apply_json_patch(document, operations):
+    """Áp dụng JSON Patch (RFC 6902), trả về document mới (không sửa document gốc)"""
+    if not isinstance(operations, list):
+        raise JsonPatchError("JSON Patch phải là một mảng các operation")
+
+    result = copy.deepcopy(document)
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or 'op' not in operation or 'path' not in operation:
+            raise JsonPatchError(f"Operation #{index} không hợp lệ")
+
+        op = operation['op']
+        path = _parse_pointer(operation['path'])
+
+        if op == 'add':
+            result = _add(result, path, copy.deepcopy(_require(operation, 'value', index)))
+        elif op == 'remove':
+            result, _ = _remove(result, path)
+        elif op == 'replace':
+            _resolve(result, path)
+            result, _ = _remove(result, path)
+            result = _add(result, path, copy.deepcopy(_require(operation, 'value', index)))
+        elif op == 'move':
+            from_path = _parse_pointer(_require(operation, 'from', index))
+            if path[:len(from_path)] == from_path and path != from_path:
+                raise JsonPatchError(f"Operation #{index}: không thể move vào chính con của nó")
+            result, value = _remove(result, from_path)
+            result = _add(result, path, value)
+        elif op == 'copy':
+            from_path = _parse_pointer(_require(operation, 'from', index))
+            result = _add(result, path, copy.deepcopy(_resolve(result, from_path)))
+        elif op == 'test':
+            if _resolve(result, path) != _require(operation, 'value', index):
+                raise JsonPatchError(f"Operation #{index}: test thất bại tại '{operation['path']}'")
+        else:
+            raise JsonPatchError(f"Operation #{index}: op '{op}' không được hỗ trợ")
+
+    return result
+
+def apply_patch(document, patch, patch_type=PATCH_TYPE_MERGE):
+    """Áp dụng patch theo loại (json-patch hoặc merge-patch)"""
+    if patch_type == PATCH_TYPE_JSON:
+        return apply_json_patch(document, patch)
+    if patch_type == PATCH_TYPE_MERGE:
+        return apply_merge_patch(document, patch)
+    raise JsonPatchError(f"Loại patch '{patch_type}' không được hỗ trợ")
+
+def patch_json_text(text, patch, patch_type=PATCH_TYPE_MERGE):
+    """Áp dụng patch lên nội dung JSON dạng chuỗi (AppData.content), trả về chuỗi mới"""
+    try:
+        document = json.loads(text) if text else None
+    except (TypeError, ValueError):
+        raise JsonPatchError("Nội dung hiện tại không phải JSON, không thể áp dụng patch")
+
+    result = apply_patch(document, patch, patch_type)
+    return json.dumps(result, ensure_ascii=False, separators=(',', ':'))
+
+def normalize_patch_type(patch_type):
+    """Chuẩn hóa tên loại patch ('json', 'merge', mimetype...)"""
+    if patch_type in PATCH_MIMETYPES:
+        return PATCH_MIMETYPES[patch_type]
+    if patch_type in ('json', 'json-patch', PATCH_TYPE_JSON):
+        return PATCH_TYPE_JSON
+    if patch_type in (None, '', 'merge', PATCH_TYPE_MERGE):
+        return PATCH_TYPE_MERGE
+    raise JsonPatchError(f"Loại patch '{patch_type}' không được hỗ trợ")
+
+def _require(operation, key, index):
+    if key not in operation:
+        raise JsonPatchError(f"Operation #{index}: thiếu trường '{key}'")
+    return operation[key]
+
+def _parse_pointer(pointer):
+    """Tách JSON Pointer (RFC 6901) thành danh sách token"""
+    if not isinstance(pointer, str):
+        raise JsonPatchError("JSON Pointer phải là chuỗi")
+    if pointer == '':
+        return []
+    if not pointer.startswith('/'):
+        raise JsonPatchError(f"JSON Pointer không hợp lệ: '{pointer}'")
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+def _list_index(container, token, allow_end=False):
+    if allow_end and token == '-':
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith('0')):
+        raise JsonPatchError(f"Chỉ số mảng không hợp lệ: '{token}'")
+    index = int(token)
+    limit = len(container) if allow_end else len(container) - 1
+    if index > limit:
+        raise JsonPatchError(f"Chỉ số mảng vượt quá giới hạn: {index}")
+    return index
+
+def _resolve(document, path):
+    current = document
+    for token in path:
+        if isinstance(current, dict):
+            if token not in current:
+                raise JsonPatchError(f"Không tìm thấy đường dẫn '/{'/'.join(path)}'")
+            current = current[token]
+        elif isinstance(current, list):
+            current = current[_list_index(current, token)]
+        else:
+            raise JsonPatchError(f"Không tìm thấy đường dẫn '/{'/'.join(path)}'")
+    return current
+
+def _add(document, path, value):
+    if not path:
+        return value
+    parent = _resolve(document, path[:-1])
+    token = path[-1]
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_list_index(parent, token, allow_end=True), value)
+    else:
+        raise JsonPatchError(f"Không thể thêm vào đường dẫn '/{'/'.join(path)}'")
+    return document
+
+def _remove(document, path):
+    if not path:
+        return None, document
+    parent = _resolve(document, path[:-1])
+    token = path[-1]
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"Không tìm thấy đường dẫn '/{'/'.join(path)}'")
+        return document, parent.pop(token)
+    if isinstance(parent, list):
+        return document, parent.pop(_list_index(parent, token))
+    raise JsonPatchError(f"Không tìm thấy đường dẫn '/{'/'.join(path)}'")
+
+__all__ = [
+    'JsonPatchError', 'apply_patch', 'apply_json_patch', 'apply_merge_patch',
+    'patch_json_text', 'normalize_patch_type',
+    'PATCH_TYPE_JSON', 'PATCH_TYPE_MERGE', 'PATCH_MIMETYPES'
+]
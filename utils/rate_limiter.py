@@ -0,0 +1,275 @@
+# Giới hạn tần suất request bằng token bucket: state gọn theo key, lock chia shard, tự dọn key rảnh
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+# '100 per hour', '10 per 5 minutes', '20/minute'
+RATE_LIMIT_PATTERN = re.compile(
+    r'^\s*(\d+)\s*(?:per|/)\s*(\d+)?\s*(second|minute|hour|day)s?\s*$', re.IGNORECASE
+)
+PERIOD_SECONDS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+class RateLimit(namedtuple('RateLimit', ['limit', 'period'])):
+    """Tối đa `limit` request trong `period` giây (bucket đầy = limit, hồi limit/period token mỗi giây)"""
+    __slots__ = ()
+
+    @property
+    def rate(self):
+        return self.limit / self.period
+
+    def __str__(self):
+        return f"{self.limit} per {self.period}s"
+
+# Kết quả một lần kiểm tra: remaining = số request còn lại, retry_after = giây chờ khi bị từ chối
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'limit', 'remaining', 'retry_after'])
+
+def parse_rate_limit(text):
+    """'100 per hour' -> RateLimit(100, 3600); raise ValueError nếu sai cú pháp"""
+    match = RATE_LIMIT_PATTERN.match(text or '')
+    if not match:
+        raise ValueError(f"Invalid rate limit '{text}' (expected e.g. '100 per hour')")
+    limit = int(match.group(1))
+    period = int(match.group(2) or 1) * PERIOD_SECONDS[match.group(3).lower()]
+    if limit <= 0:
+        raise ValueError(f"Invalid rate limit '{text}' (limit must be positive)")
+    return RateLimit(limit, period)
+
+def parse_rate_limit_map(spec):
+    """'key=limit; key=limit' -> list [(key, RateLimit)] theo thứ tự khai báo"""
+    policies = []
+    for entry in (spec or '').split(';'):
+        entry = entry.strip()
+        if not entry:
+            continue
+        key, separator, limit = entry.rpartition('=')
+        if not separator or not key.strip():
+            raise ValueError(f"Invalid rate limit policy '{entry}' (expected key=limit)")
+        policies.append((key.strip(), parse_rate_limit(limit)))
+    return policies
+
+def _take(tokens, updated_at, limit, now, cost=1):
+    """Một bước token bucket: trả về (allowed, tokens mới)"""
+    if tokens is None:
+        tokens = float(limit.limit)
+    else:
+        tokens = min(float(limit.limit), tokens + (now - updated_at) * limit.rate)
+    if tokens >= cost:
+        return True, tokens - cost
+    return False, tokens
+
+def _result(allowed, tokens, limit, cost=1):
+    retry_after = 0 if allowed else math.ceil((cost - tokens) / limit.rate)
+    return RateLimitResult(allowed, limit.limit, max(int(tokens), 0), retry_after)
+
+class MemoryRateLimitBackend:
+    """Bucket trong bộ nhớ process, chia thành các shard có lock riêng
+
+    Mỗi key chỉ giữ (tokens, thời điểm cập nhật, thời điểm bucket đầy lại).
+    Dict của shard giữ thứ tự truy cập gần nhất nên key rảnh nằm ở đầu và được
+    dọn dần khi bucket đã đầy lại (xóa key = bucket đầy, không đổi kết quả).
+    Vượt max_keys thì bỏ key cũ nhất (key đó được tính lại từ bucket đầy).
+    """
+
+    def __init__(self, shards=64, max_keys=100000):
+        self._shard_count = shards
+        self._max_keys_per_shard = max(1, max_keys // shards)
+        self._shards = [(threading.Lock(), {}) for _ in range(shards)]
+        self._evictions = 0
+
+    def hit(self, key, limit, cost=1):
+        lock, buckets = self._shards[hash(key) % self._shard_count]
+        now = time.monotonic()
+        with lock:
+            state = buckets.pop(key, None)
+            if state is None:
+                allowed, tokens = _take(None, None, limit, now, cost)
+            else:
+                allowed, tokens = _take(state[0], state[1], limit, now, cost)
+            # Thời điểm bucket hồi đầy: sau đó key có thể xóa
+            buckets[key] = (tokens, now, now + (limit.limit - tokens) / limit.rate)
+            self._evict(buckets, now)
+        return _result(allowed, tokens, limit, cost)
+
+    def refund(self, key, limit, cost=1):
+        """Trả lại token đã lấy bằng hit() (không vượt quá bucket đầy)"""
+        lock, buckets = self._shards[hash(key) % self._shard_count]
+        now = time.monotonic()
+        with lock:
+            state = buckets.pop(key, None)
+            if state is None:
+                return  # Key đã bị dọn = bucket đầy
+            tokens = min(float(limit.limit), state[0] + (now - state[1]) * limit.rate + cost)
+            buckets[key] = (tokens, now, now + (limit.limit - tokens) / limit.rate)
+
+    def _evict(self, buckets, now):
+        """Dọn các key rảnh ở đầu shard (gọi khi đang giữ lock); O(1) khấu hao"""
+        for _ in range(2):
+            oldest = next(iter(buckets))
+            if buckets[oldest][2] > now and len(buckets) <= self._max_keys_per_shard:
+                return
+            del buckets[oldest]
+            self._evictions += 1
+
+    def reset(self):
+        for lock, buckets in self._shards:
+            with lock:
+                buckets.clear()
+
+    def stats(self):
+        return {
+            'backend': 'memory',
+            'keys': sum(len(buckets) for _, buckets in self._shards),
+            'shards': self._shard_count,
+            'evictions': self._evictions
+        }
+
+class SQLiteRateLimitBackend:
+    """Bucket lưu trong file SQLite riêng để các worker process dùng chung giới hạn
+
+    Mỗi lần kiểm tra là một câu UPSERT ... RETURNING (nguyên tử trong SQLite),
+    không đọc-rồi-ghi. File tách khỏi database chính để không tranh lock ghi
+    với dữ liệu app; state không quan trọng nên dùng synchronous=OFF.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            full_at REAL NOT NULL,
+            allowed INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """
+
+    # Bucket hồi token theo thời gian đã trôi qua rồi trừ cost nếu đủ
+    # (mọi biểu thức trong SET đều đọc giá trị cũ của row)
+    AVAILABLE = "min(:capacity, tokens + (:now - updated_at) * :rate)"
+    HIT_SQL = f"""
+        INSERT INTO rate_limit_buckets(key, tokens, updated_at, full_at, allowed)
+        VALUES (:key, :capacity - :cost, :now, :now + :cost / :rate, 1)
+        ON CONFLICT(key) DO UPDATE SET
+            allowed = {AVAILABLE} >= :cost,
+            tokens = {AVAILABLE} - ({AVAILABLE} >= :cost) * :cost,
+            full_at = :now + (:capacity - {AVAILABLE} + ({AVAILABLE} >= :cost) * :cost) / :rate,
+            updated_at = :now
+        RETURNING tokens, allowed
+    """
+    REFUND_SQL = f"""
+        UPDATE rate_limit_buckets SET
+            tokens = min(:capacity, {AVAILABLE} + :cost),
+            full_at = :now + (:capacity - min(:capacity, {AVAILABLE} + :cost)) / :rate,
+            updated_at = :now
+        WHERE key = :key
+    """
+
+    # Giây giữa hai lần dọn bucket đã đầy lại
+    PURGE_INTERVAL = 60
+
+    def __init__(self, path, timeout=1.0):
+        self.path = os.path.abspath(path)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._purge_lock = threading.Lock()
+        self._purged_at = 0.0
+        with self._connect() as conn:
+            conn.execute(self.SCHEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_full_at ON rate_limit_buckets(full_at)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        return conn
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def hit(self, key, limit, cost=1):
+        # Thời gian thực (không phải monotonic) vì được so sánh giữa các process
+        now = time.time()
+        conn = self._connection()
+        tokens, allowed = conn.execute(self.HIT_SQL, {
+            'key': key, 'capacity': float(limit.limit), 'cost': float(cost), 'rate': limit.rate, 'now': now
+        }).fetchone()
+        self._maybe_purge(conn, now)
+        return _result(bool(allowed), tokens, limit, cost)
+
+    def refund(self, key, limit, cost=1):
+        """Trả lại token đã lấy bằng hit() (không vượt quá bucket đầy)"""
+        self._connection().execute(self.REFUND_SQL, {
+            'key': key, 'capacity': float(limit.limit), 'cost': float(cost), 'rate': limit.rate, 'now': time.time()
+        })
+
+    def _maybe_purge(self, conn, now):
+        """Xóa bucket đã đầy lại (định kỳ, chỉ một thread làm)"""
+        if now - self._purged_at < self.PURGE_INTERVAL or not self._purge_lock.acquire(blocking=False):
+            return
+        try:
+            self._purged_at = now
+            conn.execute("DELETE FROM rate_limit_buckets WHERE full_at <= :now", {'now': now})
+        finally:
+            self._purge_lock.release()
+
+    def reset(self):
+        self._connection().execute("DELETE FROM rate_limit_buckets")
+
+    def stats(self):
+        keys = self._connection().execute("SELECT count(*) FROM rate_limit_buckets").fetchone()[0]
+        return {'backend': 'sqlite', 'path': self.path, 'keys': keys}
+
+class RateLimiter:
+    """Kiểm tra và đếm request theo key trên một backend"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryRateLimitBackend()
+        self._lock = threading.Lock()
+        self._allowed = 0
+        self._rejected = 0
+
+    def hit(self, key, limit, cost=1):
+        result = self.backend.hit(key, limit, cost)
+        with self._lock:
+            if result.allowed:
+                self._allowed += 1
+            else:
+                self._rejected += 1
+        return result
+
+    def hit_all(self, hits, cost=1):
+        """Lấy token từ nhiều bucket [(key, RateLimit)] theo thứ tự, dừng ở bucket đầu tiên từ chối
+
+        Khi một bucket từ chối, token đã lấy ở các bucket trước được trả lại để
+        request bị từ chối không làm tốn lượt của giới hạn khác. Trả về list kết quả.
+        """
+        results = []
+        for key, limit in hits:
+            result = self.hit(key, limit, cost)
+            results.append(result)
+            if not result.allowed:
+                for refund_key, refund_limit in hits[:len(results) - 1]:
+                    self.backend.refund(refund_key, refund_limit, cost)
+                with self._lock:
+                    self._allowed -= len(results) - 1
+                break
+        return results
+
+    def reset(self):
+        self.backend.reset()
+
+    def stats(self):
+        with self._lock:
+            stats = {'allowed': self._allowed, 'rejected': self._rejected}
+        stats.update(self.backend.stats())
+        return stats
+
+__all__ = [
+    'RateLimit', 'RateLimitResult', 'RateLimiter', 'MemoryRateLimitBackend', 'SQLiteRateLimitBackend',
+    'parse_rate_limit', 'parse_rate_limit_map'
+]
@@ -1,6 +1,7 @@
 # Response wrapper để chuẩn hóa API response
-from flask import jsonify
+from flask import jsonify, Response, stream_with_context
 from datetime import datetime
+from utils.serializer import format_datetime
 import json
 
 class ResponseWrapper:
@@ -41,6 +42,32 @@ class ResponseWrapper:
         
         return jsonify(response_data), status_code
     
+    def stream_ndjson(self, chunks, status_code=200, headers=None):
+        """Tạo streaming response NDJSON (mỗi dòng một JSON object)
+
+        `chunks` là iterable các list dict; mỗi list được ghi và flush ngay
+        nên bộ nhớ không phụ thuộc vào tổng số dòng.
+        """
+        def generate():
+            for records in chunks:
+                if not records:
+                    continue
+                yield ''.join(
+                    json.dumps(record, separators=(',', ':')) + '\n'
+                    for record in records
+                )
+        
+        response = Response(
+            stream_with_context(generate()),
+            status=status_code,
+            mimetype='application/x-ndjson'
+        )
+        # Không để reverse proxy buffer toàn bộ response
+        response.headers['X-Accel-Buffering'] = 'no'
+        if headers:
+            response.headers.update(headers)
+        return response
+    
     def paginated_success(self, data, page, per_page, total, message="Lấy dữ liệu thành công"):
         """Tạo success response với pagination"""
         total_pages = (total + per_page - 1) // per_page  # Ceiling division
@@ -255,8 +282,8 @@ class ResponseFormatter:
             "type": data_item.type,
             "title": data_item.title,
             "content": data_item.content,
-            "created_at": data_item.created_at.isoformat() if data_item.created_at else None,
-            "updated_at": data_item.updated_at.isoformat() if data_item.updated_at else None
+            "created_at": format_datetime(data_item.created_at),
+            "updated_at": format_datetime(data_item.updated_at)
         }
     
     @staticmethod
@@ -0,0 +1,71 @@
+# Serialize row Core (tuple) thành dict JSON, không hydrate ORM
+from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
+from sqlalchemy import DateTime, String, type_coerce
+
+# Số giá trị datetime giữ trong cache định dạng
+DATETIME_CACHE_SIZE = 65536
+
+@lru_cache(maxsize=DATETIME_CACHE_SIZE)
+def _format_datetime_text(value):
+    """'YYYY-MM-DD HH:MM:SS[.ffffff]' (cách SQLite lưu DateTime) -> ISO 8601"""
+    text = value.replace(' ', 'T', 1)
+    # datetime.isoformat() bỏ phần microsecond khi bằng 0
+    if text.endswith('.000000'):
+        text = text[:-7]
+    return text
+
+@lru_cache(maxsize=DATETIME_CACHE_SIZE)
+def _format_datetime_object(value):
+    return value.isoformat()
+
+def format_datetime(value):
+    """Định dạng datetime (hoặc text datetime đọc thẳng từ SQLite) giống datetime.isoformat()"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return _format_datetime_object(value)
+    return _format_datetime_text(value)
+
+def select_columns(columns):
+    """Các cột để select: cột DateTime được đọc dưới dạng text gốc của SQLite
+
+    Bỏ qua bước parse text -> datetime của SQLAlchemy rồi isoformat() lại;
+    format_datetime chỉ cần đổi dấu cách thành 'T'. Tên cột giữ nguyên nên
+    row.created_at vẫn dùng được (nhưng là str).
+    """
+    return [
+        type_coerce(column, String).label(column.key) if isinstance(column.type, DateTime) else column
+        for column in columns
+    ]
+
+class RowSerializer:
+    """Chuyển row của một câu select (theo thứ tự cột `names`) thành dict các field `output`"""
+
+    def __init__(self, names, output=None, datetime_names=()):
+        names = tuple(names)
+        self.output = tuple(output or names)
+        positions = [names.index(name) for name in self.output]
+        getter = itemgetter(*positions)
+        self._getter = getter if len(positions) > 1 else lambda row: (getter(row),)
+        self._datetime_names = tuple(name for name in self.output if name in datetime_names)
+
+    def serialize(self, row):
+        item = dict(zip(self.output, self._getter(row)))
+        for name in self._datetime_names:
+            value = item[name]
+            if value is not None:
+                item[name] = format_datetime(value)
+        return item
+
+    def serialize_all(self, rows):
+        serialize = self.serialize
+        return [serialize(row) for row in rows]
+
+@lru_cache(maxsize=256)
+def get_row_serializer(names, output=None, datetime_names=()):
+    """RowSerializer dùng chung cho mỗi bộ (names, output, datetime_names)"""
+    return RowSerializer(names, output, datetime_names)
+
+__all__ = ['format_datetime', 'select_columns', 'RowSerializer', 'get_row_serializer']